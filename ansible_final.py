@@ -1,6 +1,14 @@
+import atexit
+import os
+import select
 import subprocess
+import sys
+import threading
+import time
 from typing import Optional
 import json
+import metrics
+import tenants
 
 ALLOWED_IPS = {
     "10.0.15.61",
@@ -10,38 +18,234 @@ ALLOWED_IPS = {
     "10.0.15.65",
 }
 
-def showrun(ip: Optional[str] = None) -> str:
-    if not ip:
-        return "Error: No IP specified"
-    if ip not in ALLOWED_IPS:
-        return f"Error: IP not allowed ({ip})"
+# "warm": run playbooks in long-lived ansible_worker.py processes (default)
+# "subprocess": spawn ansible-playbook for every run
+RUNNER_MODE = os.environ.get("ANSIBLE_RUNNER_MODE", "warm")
+WARM_WORKERS = int(os.environ.get("ANSIBLE_WARM_WORKERS", "2"))
+WORKER_START_TIMEOUT = 60  # seconds to import Ansible and parse the inventory
+RUN_TIMEOUT = 180  # seconds per playbook run
+ACQUIRE_TIMEOUT = 30  # seconds to wait for a free warm worker before running cold
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ansible_worker.py")
+
+
+# --------------------------------------------------------------
+# Playbook runners (both return the same structured result)
+#   {"rc": int, "stats": {host: {ok, changed, failures, unreachable, ...}},
+#    "tasks": [{host, task, status, rc, msg, stdout, stderr}], "error": str|None}
+# --------------------------------------------------------------
 
+class _WarmWorker:
+    def __init__(self):
+        self.proc = subprocess.Popen(
+            [sys.executable, WORKER_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+        ready = self._read_line(WORKER_START_TIMEOUT)
+        if not ready.get("ready"):
+            self.close()
+            raise RuntimeError("Ansible worker did not start")
+
+    def _read_line(self, timeout: float) -> dict:
+        readable, _, _ = select.select([self.proc.stdout], [], [], timeout)
+        if not readable:
+            raise TimeoutError("Ansible worker did not answer in time")
+        line = self.proc.stdout.readline()
+        if not line:
+            raise RuntimeError("Ansible worker exited")
+        return json.loads(line)
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def run(self, playbook: str, extra_vars: dict) -> dict:
+        request = {"playbook": playbook, "extra_vars": extra_vars}
+        self.proc.stdin.write(json.dumps(request) + "\n")
+        self.proc.stdin.flush()
+        return self._read_line(RUN_TIMEOUT)
+
+    def close(self):
+        try:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=5)
+        except Exception:
+            self.proc.kill()
+
+
+class WarmRunnerPool:
+    """
+    Small pool of warm Ansible workers. Each worker runs one playbook at a
+    time; a worker that times out or dies is discarded, and its slot goes to
+    the next caller, who starts a replacement. A caller that finds no free
+    worker within ACQUIRE_TIMEOUT gets TimeoutError (run_playbook then runs
+    the playbook cold).
+    """
+
+    def __init__(self, size: int = WARM_WORKERS, acquire_timeout: float = ACQUIRE_TIMEOUT):
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self._idle = []
+        self._cond = threading.Condition()
+        self._started = 0
+
+    def _acquire(self) -> _WarmWorker:
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._cond:
+            while not self._idle and self._started >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("No warm Ansible worker became free")
+                self._cond.wait(remaining)
+            if self._idle:
+                return self._idle.pop()
+            self._started += 1
+        try:
+            return _WarmWorker()
+        except Exception:
+            self._free_slot()
+            raise
+
+    def _free_slot(self):
+        with self._cond:
+            self._started -= 1
+            self._cond.notify()
+
+    def _discard(self, worker: _WarmWorker):
+        worker.close()
+        self._free_slot()
+
+    def _release(self, worker: _WarmWorker):
+        with self._cond:
+            self._idle.append(worker)
+            self._cond.notify()
+
+    def run(self, playbook: str, extra_vars: dict) -> dict:
+        worker = self._acquire()
+        if not worker.alive():
+            self._discard(worker)
+            worker = self._acquire()
+        try:
+            result = worker.run(playbook, extra_vars)
+        except Exception:
+            self._discard(worker)
+            raise
+        self._release(worker)
+        return result
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.close()
+
+
+_warm_pool = WarmRunnerPool()
+atexit.register(_warm_pool.close)
+
+
+def _run_subprocess(playbook: str, extra_vars: dict) -> dict:
     cmd = [
         "ansible-playbook",
         "-i",
         "hosts",
-        "playbook.yml",
+        playbook,
         "--extra-vars",
-        f"router_ip={ip}",
+        json.dumps(extra_vars),
     ]
+    # The json stdout callback gives us the recap without scraping text
+    env = dict(os.environ, ANSIBLE_STDOUT_CALLBACK="json")
+    result = subprocess.run(
+        cmd, capture_output=True, text=True, check=False, env=env, timeout=RUN_TIMEOUT
+    )
+    try:
+        data = json.loads(result.stdout or "{}")
+    except ValueError:
+        print("ansible-playbook failed rc=", result.returncode)
+        print("STDERR:\n", (result.stderr or "")[:2000])
+        return {"rc": result.returncode, "stats": {}, "tasks": [], "error": "Unparsable output"}
+
+    tasks = []
+    for play in data.get("plays", []):
+        for task in play.get("tasks", []):
+            for host, res in task.get("hosts", {}).items():
+                if res.get("unreachable"):
+                    status = "unreachable"
+                elif res.get("failed"):
+                    status = "failed"
+                elif res.get("skipped"):
+                    status = "skipped"
+                else:
+                    status = "changed" if res.get("changed") else "ok"
+                tasks.append(
+                    {
+                        "host": host,
+                        "task": task.get("task", {}).get("name", ""),
+                        "status": status,
+                        "rc": res.get("rc"),
+                        "msg": str(res.get("msg", ""))[:2000],
+                        "stdout": str(res.get("stdout", ""))[:2000],
+                        "stderr": str(res.get("stderr", ""))[:2000],
+                    }
+                )
+    return {"rc": result.returncode, "stats": data.get("stats", {}), "tasks": tasks, "error": None}
+
+
+def run_playbook(playbook: str, extra_vars: dict) -> dict:
+    """Run a playbook with the configured runner and return a structured result."""
+    with metrics.stage("rpc", method="ansible"):
+        if RUNNER_MODE == "warm":
+            try:
+                return _warm_pool.run(playbook, extra_vars)
+            except Exception as e:
+                print("Warm Ansible runner unavailable, falling back to subprocess:", e)
+        return _run_subprocess(playbook, extra_vars)
+
+
+def _succeeded(result: dict) -> bool:
+    if result.get("error") or result.get("rc") != 0:
+        return False
+    stats = result.get("stats") or {}
+    if not stats:
+        return False
+    return all(
+        host.get("failures", 0) == 0 and host.get("unreachable", 0) == 0
+        for host in stats.values()
+    )
+
+
+def _log_failure(result: dict):
+    print("Ansible run failed rc=", result.get("rc"), result.get("error") or "")
+    for task in result.get("tasks", []):
+        if task.get("status") in ("failed", "unreachable"):
+            print(f"  {task['task']}: {task.get('msg')} {task.get('stderr')}".rstrip())
+
+
+def showrun_filename(ip: str) -> str:
+    # One file per router so concurrent showruns never overwrite each other
+    return f"show_run_{tenants.student_id()}_{ip}.txt"
+
+
+def showrun(ip: Optional[str] = None) -> str:
+    if not ip:
+        return "Error: No IP specified"
+    if ip not in ALLOWED_IPS:
+        return f"Error: IP not allowed ({ip})"
+
+    filename = showrun_filename(ip)
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=False)
-        stdout = result.stdout or ""
-        stderr = result.stderr or ""
-
-        if result.returncode != 0:
-            print("ansible-playbook failed rc=", result.returncode)
-            print("STDOUT:\n", stdout[:2000])
-            print("STDERR:\n", stderr[:2000])
-
-        if "ok=" in stdout:
-            return "show_run_66070101_Router-Exam.txt"
-        else:
-            return "Error: Ansible"
+        result = run_playbook("playbook.yml", {"router_ip": ip, "output_file": filename})
     except Exception as e:
         print("Error running ansible-playbook:", e)
         return "Error: Ansible"
 
+    if _succeeded(result):
+        return filename
+    _log_failure(result)
+    return "Error: Ansible"
+
 
 def motd_set(ip: Optional[str], message: Optional[str]) -> str:
     """
@@ -67,30 +271,16 @@ def motd_set(ip: Optional[str], message: Optional[str]) -> str:
         "motd_message": motd_text,
     }
 
-    cmd = [
-        "ansible-playbook",
-        "-i",
-        "hosts",
-        "playbook_motd.yml",
-        "--extra-vars",
-        json.dumps(extra_vars),
-    ]
-
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=False)
-        stdout = result.stdout or ""
-
-        if result.returncode != 0:
-            return "Error: Ansible"
-
-        # Consider success if Ansible ran without failures
-        # and made changes or at least executed the task
-        if "failed=0" in stdout:
-            return "Ok: success"
-
-        return "Error: Ansible"
-
+        result = run_playbook("playbook_motd.yml", extra_vars)
     except FileNotFoundError:
         return "Error: Ansible (ansible-playbook not found)"
     except Exception as e:
         return f"Error: {type(e).__name__}: {e}"
+
+    # Success when every task ran without failures on every host
+    if _succeeded(result):
+        return "Ok: success"
+
+    _log_failure(result)
+    return "Error: Ansible"
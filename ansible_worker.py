@@ -0,0 +1,156 @@
+"""
+Long-lived Ansible worker used by ansible_final in "warm" mode.
+
+Ansible is imported, its plugins loaded and the inventory parsed once when
+the worker starts; every request then only runs the playbook. The worker
+speaks JSON lines:
+
+  stdin : {"playbook": "playbook.yml", "extra_vars": {...}}
+  stdout: {"rc": 0, "stats": {...}, "tasks": [...], "error": null}
+
+Anything Ansible itself prints is redirected to stderr so stdout carries
+only protocol messages.
+"""
+import json
+import os
+import sys
+
+# Keep a private handle on the real stdout, then point fd 1 at stderr
+_protocol_out = os.fdopen(os.dup(1), "w", buffering=1)
+os.dup2(2, 1)
+
+from ansible import context  # noqa: E402
+from ansible.executor.playbook_executor import PlaybookExecutor  # noqa: E402
+from ansible.inventory.manager import InventoryManager  # noqa: E402
+from ansible.module_utils.common.collections import ImmutableDict  # noqa: E402
+from ansible.parsing.dataloader import DataLoader  # noqa: E402
+from ansible.plugins.callback import CallbackBase  # noqa: E402
+from ansible.plugins.loader import init_plugin_loader  # noqa: E402
+from ansible.utils.vars import load_extra_vars  # noqa: E402
+from ansible.vars.manager import VariableManager  # noqa: E402
+
+INVENTORY = os.environ.get("ANSIBLE_WORKER_INVENTORY", "hosts")
+
+# Same defaults ansible-playbook uses when no CLI options are given
+BASE_CLIARGS = dict(
+    connection="ssh",
+    module_path=None,
+    forks=5,
+    become=False,
+    become_method="sudo",
+    become_user=None,
+    check=False,
+    diff=False,
+    syntax=False,
+    listhosts=False,
+    listtasks=False,
+    listtags=False,
+    start_at_task=None,
+    verbosity=0,
+    tags=("all",),
+    skip_tags=(),
+    subset=None,
+    extra_vars=(),
+)
+
+# Keep task output in replies short; showrun writes the config to a file
+MAX_OUTPUT = 2000
+
+
+class ResultCollector(CallbackBase):
+    """Collects per-task results and the final play recap as plain dicts."""
+
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = "stdout"
+    CALLBACK_NAME = "ipa_result_collector"
+
+    def __init__(self):
+        super().__init__()
+        self.tasks = []
+        self.stats = {}
+
+    def _record(self, result, status):
+        res = result._result
+        self.tasks.append(
+            {
+                "host": result._host.get_name(),
+                "task": result._task.get_name(),
+                "status": status,
+                "rc": res.get("rc"),
+                "msg": str(res.get("msg", ""))[:MAX_OUTPUT],
+                "stdout": str(res.get("stdout", ""))[:MAX_OUTPUT],
+                "stderr": str(res.get("stderr", ""))[:MAX_OUTPUT],
+            }
+        )
+
+    def v2_runner_on_ok(self, result):
+        self._record(result, "changed" if result._result.get("changed") else "ok")
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._record(result, "ignored" if ignore_errors else "failed")
+
+    def v2_runner_on_unreachable(self, result):
+        self._record(result, "unreachable")
+
+    def v2_runner_on_skipped(self, result):
+        self._record(result, "skipped")
+
+    def v2_playbook_on_stats(self, stats):
+        for host in sorted(stats.processed.keys()):
+            self.stats[host] = stats.summarize(host)
+
+
+class WarmRunner:
+    def __init__(self, inventory: str = INVENTORY):
+        context.CLIARGS = ImmutableDict(BASE_CLIARGS)
+        # Same plugin/collection loader setup ansible-playbook does at startup
+        init_plugin_loader([])
+        self.loader = DataLoader()
+        self.inventory = InventoryManager(loader=self.loader, sources=[inventory])
+
+    def run(self, playbook: str, extra_vars: dict) -> dict:
+        # Extra vars are read from CLIARGS by VariableManager, as with -e.
+        # Ansible memoizes them for the process lifetime, so drop the cache.
+        context.CLIARGS = ImmutableDict(
+            BASE_CLIARGS, extra_vars=(json.dumps(extra_vars or {}),)
+        )
+        load_extra_vars.extra_vars = None
+        variable_manager = VariableManager(loader=self.loader, inventory=self.inventory)
+        collector = ResultCollector()
+        collector._init_callback_methods()
+
+        executor = PlaybookExecutor(
+            playbooks=[playbook],
+            inventory=self.inventory,
+            variable_manager=variable_manager,
+            loader=self.loader,
+            passwords={},
+        )
+        # A pre-populated callback list replaces the stdout callback lookup
+        executor._tqm._callback_plugins = [collector]
+        try:
+            rc = executor.run()
+        finally:
+            executor._tqm.cleanup()
+            self.loader.cleanup_all_tmp_files()
+
+        return {"rc": rc, "stats": collector.stats, "tasks": collector.tasks, "error": None}
+
+
+def main():
+    runner = WarmRunner()
+    _protocol_out.write(json.dumps({"ready": True}) + "\n")
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+            reply = runner.run(request["playbook"], request.get("extra_vars") or {})
+        except Exception as e:
+            reply = {"rc": -1, "stats": {}, "tasks": [], "error": f"{type(e).__name__}: {e}"}
+        _protocol_out.write(json.dumps(reply) + "\n")
+
+
+if __name__ == "__main__":
+    main()
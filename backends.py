@@ -0,0 +1,316 @@
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional
+
+import metrics
+import netconf_final
+import netmiko_final
+import restconf_final
+
+# Part-1 operations every backend provides: fn(ip=...) -> reply text
+OPERATIONS = ("create", "delete", "enable", "disable", "status")
+# Operation "auto" uses to try out a backend in the background
+PROBE_OPERATION = "status"
+
+# "auto" selection tuning
+MIN_SAMPLES = 3  # try every backend this often per router before trusting stats
+EXPLORE_RATE = 0.05  # occasionally re-measure a backend that is not the best
+PROBE_WORKERS = 4
+EWMA_ALPHA = 0.3  # weight of the newest sample in latency/success averages
+LATENCY_WINDOW = 100  # recent latencies kept per backend/router (for percentiles)
+FAILURE_PENALTY = 5.0  # seconds added to the score for a fully failing backend
+
+# Hedged reads
+HEDGE_PAIRS = {"restconf": "netconf", "netconf": "restconf"}
+DEFAULT_HEDGE_DELAY = 1.0  # seconds, used until a percentile can be measured
+HEDGE_WORKERS = 16
+
+
+class Backend:
+    """
+    A transport that implements the part-1 operations under one name.
+    `bulk(ip, action, names) -> {name: outcome}` is optional and handles
+    create/delete/enable/disable of many loopbacks in one request.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        label: str,
+        operations: Dict[str, Callable],
+        bulk: Optional[Callable] = None,
+    ):
+        missing = [op for op in OPERATIONS if op not in operations]
+        if missing:
+            raise ValueError(f"Backend {name} is missing {', '.join(missing)}")
+        self.name = name
+        self.label = label
+        self.operations = dict(operations)
+        self.bulk = bulk
+
+    def call(self, op: str, ip: str) -> str:
+        return self.operations[op](ip=ip)
+
+
+class _Stats:
+    def __init__(self):
+        self.samples = 0
+        self.latency = None  # EWMA seconds
+        self.success = 1.0  # EWMA of 1 (ok) / 0 (failed)
+        self.recent = deque(maxlen=LATENCY_WINDOW)
+
+    def add(self, seconds: float, ok: bool):
+        self.samples += 1
+        self.recent.append(seconds)
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += EWMA_ALPHA * (seconds - self.latency)
+        self.success += EWMA_ALPHA * ((1.0 if ok else 0.0) - self.success)
+
+    def score(self) -> float:
+        # Lower is better: slow or unreliable backends are penalised, and a
+        # backend that fails fast must not look better than a working one
+        latency = (self.latency or 0.0) + FAILURE_PENALTY * (1.0 - self.success)
+        return latency / max(self.success, 0.05)
+
+
+_registry = {}  # name -> Backend
+_stats = {}  # (name, ip) -> _Stats
+_lock = threading.Lock()
+
+
+def register_backend(backend: Backend):
+    with _lock:
+        _registry[backend.name] = backend
+
+
+def get_backend(name: str) -> Optional[Backend]:
+    return _registry.get(name)
+
+
+def backend_names() -> list:
+    return list(_registry)
+
+
+def bulk_backend_names() -> list:
+    return [name for name, backend in _registry.items() if backend.bulk is not None]
+
+
+def _is_failure(msg: str) -> bool:
+    # "Cannot create" etc. are valid answers (the device refused); transports
+    # raise on connection errors, and these replies mean the read failed
+    return msg.startswith("Error:") or "Cannot read status" in msg or "failed to read" in msg
+
+
+def record(name: str, ip: str, seconds: float, ok: bool):
+    with _lock:
+        _stats.setdefault((name, ip), _Stats()).add(seconds, ok)
+
+
+def call(name: str, op: str, ip: str) -> str:
+    """Run `op` on backend `name`, recording latency and success for `auto`."""
+    backend = _registry[name]
+    start = time.perf_counter()
+    try:
+        # Stages timed inside are labelled with the backend actually used
+        with metrics.labels(method=name):
+            msg = backend.call(op, ip)
+    except Exception:
+        record(name, ip, time.perf_counter() - start, False)
+        raise
+    record(name, ip, time.perf_counter() - start, not _is_failure(msg))
+    return msg
+
+
+def call_bulk(name: str, action: str, ip: str, names: list) -> dict:
+    """
+    Run a bulk loopback action on backend `name`. Successes are not
+    recorded in the latency stats (one bulk request is not comparable to a
+    single op), transport errors are, as failures.
+    """
+    backend = _registry[name]
+    if backend.bulk is None:
+        raise ValueError(f"{backend.label} does not support bulk operations")
+    start = time.perf_counter()
+    try:
+        with metrics.labels(method=name):
+            return backend.bulk(ip, action, names)
+    except Exception:
+        record(name, ip, time.perf_counter() - start, False)
+        raise
+
+
+def _samples(stats: dict, name: str) -> int:
+    return stats[name].samples if stats[name] else 0
+
+
+def choose(ip: str, candidates: Optional[list] = None) -> str:
+    """
+    Pick the backend for `ip` with the best recent latency and success rate
+    among those with MIN_SAMPLES samples for this router; while none has
+    them yet, the one with the most samples, or the first candidate.
+
+    Commands never explore: explore() measures the other backends with
+    background reads, so a user's reply always comes from the best known one.
+    """
+    names = list(candidates or _registry)
+    with _lock:
+        stats = {name: _stats.get((name, ip)) for name in names}
+    proven = [n for n in names if _samples(stats, n) >= MIN_SAMPLES]
+    if not proven:
+        return max(names, key=lambda n: _samples(stats, n))
+    return min(proven, key=lambda n: stats[n].score())
+
+
+_probe_executor = ThreadPoolExecutor(max_workers=PROBE_WORKERS, thread_name_prefix="probe")
+_probing = set()  # (name, ip) with a probe queued or running
+
+
+def explore(ip: str, candidates: Optional[list] = None):
+    """
+    Queue a background status read on `ip` for every backend with fewer
+    than MIN_SAMPLES samples, and now and then on one that is not the best.
+    Probes only feed the stats; their replies and errors are never posted.
+    """
+    names = list(candidates or _registry)
+    if len(names) < 2:
+        return
+    with _lock:
+        stats = {name: _stats.get((name, ip)) for name in names}
+    targets = [n for n in names if _samples(stats, n) < MIN_SAMPLES]
+    if not targets and random.random() < EXPLORE_RATE:
+        best = choose(ip, names)
+        targets = [random.choice([n for n in names if n != best])]
+    for name in targets:
+        with _lock:
+            if (name, ip) in _probing:
+                continue
+            _probing.add((name, ip))
+        _probe_executor.submit(_in_context(_probe), name, ip)
+
+
+def _probe(name: str, ip: str):
+    try:
+        msg = call(name, PROBE_OPERATION, ip)
+        if _is_failure(msg):
+            print(f"Probe of {name} on {ip} failed: {msg}")
+    except Exception as e:
+        print(f"Probe of {name} on {ip} failed:", type(e).__name__, e)
+    finally:
+        with _lock:
+            _probing.discard((name, ip))
+
+
+def latency_percentile(name: str, ip: str, pct: float) -> Optional[float]:
+    """Recent latency percentile (0-100) of a backend on a router, None if unknown."""
+    with _lock:
+        entry = _stats.get((name, ip))
+        recent = sorted(entry.recent) if entry else []
+    if not recent:
+        return None
+    index = min(len(recent) - 1, int(round(pct / 100 * (len(recent) - 1))))
+    return recent[index]
+
+
+def stats(ip: Optional[str] = None) -> dict:
+    with _lock:
+        return {
+            f"{name}@{router}": {
+                "samples": s.samples,
+                "latency_ms": round((s.latency or 0.0) * 1000, 1),
+                "success": round(s.success, 3),
+            }
+            for (name, router), s in _stats.items()
+            if ip is None or router == ip
+        }
+
+
+_hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+
+
+def hedge_delay(name: str, ip: str, delay=None) -> float:
+    """
+    Resolve a hedge delay: a number of seconds, "pNN" for that percentile of
+    the backend's recent latency on this router, or None for p95.
+    """
+    if isinstance(delay, (int, float)):
+        return float(delay)
+    pct = 95.0
+    if isinstance(delay, str) and delay.lower().startswith("p"):
+        pct = float(delay[1:])
+    measured = latency_percentile(name, ip, pct)
+    return measured if measured is not None else DEFAULT_HEDGE_DELAY
+
+
+def hedged_call(primary: str, op: str, ip: str, delay=None, secondary: Optional[str] = None):
+    """
+    Run a read-only `op` on `primary`; if it has not answered validly after
+    the hedge delay, also issue it on `secondary` (default: the other of
+    RESTCONF/NETCONF). The first valid answer wins.
+
+    Returns (reply, backend_name). The loser is cancelled if it has not
+    started yet; a call already on the wire cannot be interrupted, so its
+    result is simply discarded (its latency is still recorded).
+    """
+    secondary = secondary or HEDGE_PAIRS.get(primary)
+    if secondary is None or secondary not in _registry:
+        return call(primary, op, ip), primary
+
+    futures = {_hedge_executor.submit(_in_context(call), primary, op, ip): primary}
+    done, _ = wait(futures, timeout=hedge_delay(primary, ip, delay))
+
+    fallback = None
+    for future in done:
+        outcome = _outcome(future)
+        if outcome is not None and not _is_failure(outcome):
+            return outcome, primary
+        fallback = (outcome, primary)
+    if done:
+        # Primary already failed: no need to keep waiting on it
+        futures = {}
+
+    futures[_hedge_executor.submit(_in_context(call), secondary, op, ip)] = secondary
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            outcome = _outcome(future)
+            if outcome is not None and not _is_failure(outcome):
+                for loser in pending:
+                    loser.cancel()
+                return outcome, futures[future]
+            if fallback is None or futures[future] == primary:
+                fallback = (outcome, futures[future])
+
+    if fallback and fallback[0] is not None:
+        return fallback
+    raise RuntimeError(f"{op} failed on {primary} and {secondary}")
+
+
+def _in_context(fn):
+    # Carry the caller's metric labels into the hedge worker thread
+    context = contextvars.copy_context()
+    return lambda *args: context.run(fn, *args)
+
+
+def _outcome(future) -> Optional[str]:
+    try:
+        return future.result()
+    except Exception as e:
+        print("Hedged call failed:", type(e).__name__, e)
+        return None
+
+
+def _module_backend(name: str, label: str, module) -> Backend:
+    operations = {op: getattr(module, op) for op in OPERATIONS}
+    return Backend(name, label, operations, bulk=getattr(module, "bulk_apply", None))
+
+
+register_backend(_module_backend("restconf", "Restconf", restconf_final))
+register_backend(_module_backend("netconf", "Netconf", netconf_final))
+register_backend(_module_backend("netmiko", "Netmiko", netmiko_final))
@@ -0,0 +1,101 @@
+"""
+Offline check of webhook mode against the local Webex stand-in.
+
+Runs the bot's webhook listener, lets it register itself with the mock
+Webex API, then has the mock post callbacks to it:
+
+  - a correctly signed callback: the bot fetches the message and replies
+  - the same callback again (a Webex redelivery): nothing is fetched or
+    posted a second time
+  - a callback signed with the wrong secret: rejected with 401, the
+    message is never fetched
+
+    python -m bench.check_webhook
+"""
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+from bench.mock_webex import MockWebexServer, WebexRoom
+
+SECRET = "bench-webhook-secret"
+QUIET_PERIOD = 0.5  # seconds to wait for a reply that must not come
+REPLY_TIMEOUT = 10
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def main(argv=None) -> bool:
+    workdir = tempfile.mkdtemp(prefix="ipa2025-webhook-")
+    room = WebexRoom()
+    webex = MockWebexServer(room).start()
+
+    # The bot reads its configuration at import time
+    os.environ["ACCESS_TOKEN"] = "bench-token"
+    os.environ["WEBEX_API_URL"] = webex.api_url
+    os.environ["WEBEX_CURSOR_FILE"] = os.path.join(workdir, "cursor.json")
+    os.environ["JOBS_DB"] = os.path.join(workdir, "jobs.sqlite3")
+    os.environ["WEBHOOK_SECRET"] = SECRET
+    os.environ["WEBEX_COALESCE"] = "0"
+    import ipa2025_final as bot
+
+    room.room_id = bot.tenant_registry.default.room_id
+    port = _free_port()
+    threading.Thread(
+        target=bot.run_webhook,
+        args=(bot.open_cursors(), "127.0.0.1", port, f"http://127.0.0.1:{port}"),
+        daemon=True,
+    ).start()
+
+    deadline = time.monotonic() + REPLY_TIMEOUT
+    while not room.webhooks and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    failures = []
+
+    def check(ok: bool, what: str):
+        print(("ok    " if ok else "FAIL  ") + what)
+        if not ok:
+            failures.append(what)
+
+    check(
+        [webhook.get("secret") for webhook in room.webhooks] == [SECRET],
+        "webhook registered with the shared secret",
+    )
+
+    try:
+        message = room.inject(f"/{bot.STUDENT_ID} queue")
+        check(room.post_callback(message) == [204], "signed callback accepted")
+        replies = room.wait_replies(1, REPLY_TIMEOUT)
+        check(replies[0][1].startswith("Queue:"), "message fetched and answered")
+        check(room.fetches[message["id"]] == 1, "message fetched once")
+
+        check(room.post_callback(message) == [204], "redelivery acknowledged")
+        time.sleep(QUIET_PERIOD)
+        check(room.fetches[message["id"]] == 1, "redelivery not fetched again")
+        check(len(room.replies) == 1, "redelivery not answered again")
+
+        forged = room.inject(f"/{bot.STUDENT_ID} queue")
+        check(room.post_callback(forged, secret="wrong") == [401], "bad signature rejected")
+        time.sleep(QUIET_PERIOD)
+        check(room.fetches[forged["id"]] == 0, "rejected message not fetched")
+        check(len(room.replies) == 1, "rejected message not answered")
+    except TimeoutError as e:
+        check(False, f"reply received ({e})")
+    finally:
+        bot.outbox.close()
+        webex.shutdown()
+
+    print("webhook check", "failed" if failures else "passed")
+    return not failures
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
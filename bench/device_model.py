@@ -0,0 +1,43 @@
+import threading
+import time
+
+
+class RouterModel:
+    """
+    In-memory ietf-interfaces state of one stand-in router, shared by its
+    mock RESTCONF and NETCONF servers so both transports see the same data.
+    """
+
+    def __init__(self, name: str, latency: float = 0.0):
+        self.name = name
+        self.latency = latency  # seconds added to every device operation
+        self.lock = threading.RLock()
+        self.version = 1  # bumped on every change, used as ETag
+        self.changed_at = time.time()
+        self.interfaces = {}
+        for index in (1, 2, 3):
+            self.interfaces[f"GigabitEthernet{index}"] = {
+                "name": f"GigabitEthernet{index}",
+                "type": "iana-if-type:ethernetCsmacd",
+                "enabled": index != 3,
+            }
+
+    def delay(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def touch(self):
+        self.version += 1
+        self.changed_at = time.time()
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.version}"'
+
+    def oper_status(self, iface: dict) -> str:
+        if not iface.get("enabled", True):
+            return "down"
+        # Only Gi1/Gi2 have a cable in this lab
+        if iface["name"].startswith("GigabitEthernet") and iface["name"] != "GigabitEthernet3":
+            return "up"
+        return "up" if iface["name"].startswith("Loopback") else "down"
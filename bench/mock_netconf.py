@@ -0,0 +1,242 @@
+"""
+Stand-in NETCONF server (SSH subsystem "netconf", base:1.0 framing) that
+answers the RPCs netconf_final and netconf_subscriber send:
+
+  get-config / edit-config on ietf-interfaces (nc:operation create, delete,
+  merge; default-operation none), get on interfaces-state, close-session.
+  create-subscription is rejected so subscribers fall back to polling.
+"""
+import socket
+import threading
+import xml.etree.ElementTree as ET
+
+import paramiko
+
+from bench.device_model import RouterModel
+
+NC_NS = "urn:ietf:params:xml:ns:netconf:base:1.0"
+IF_NS = "urn:ietf:params:xml:ns:yang:ietf-interfaces"
+DELIM = b"]]>]]>"
+
+HELLO = f"""<?xml version="1.0" encoding="UTF-8"?>
+<hello xmlns="{NC_NS}">
+  <capabilities>
+    <capability>urn:ietf:params:netconf:base:1.0</capability>
+  </capabilities>
+  <session-id>{{session_id}}</session-id>
+</hello>"""
+
+
+def _q(ns: str, tag: str) -> str:
+    return f"{{{ns}}}{tag}"
+
+
+def _local(tag: str) -> str:
+    return tag.split("}")[-1]
+
+
+def _child(elem, name: str):
+    # ncclient sends some children (config, default-operation) unqualified
+    for child in elem:
+        if _local(child.tag) == name:
+            return child
+    return None
+
+
+def _reply(message_id: str, body: str) -> str:
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>'
+        f'<rpc-reply xmlns="{NC_NS}" message-id="{message_id}">{body}</rpc-reply>'
+    )
+
+
+def _rpc_error(tag: str, message: str) -> str:
+    return (
+        "<rpc-error><error-type>application</error-type>"
+        f"<error-tag>{tag}</error-tag><error-severity>error</error-severity>"
+        f"<error-message>{message}</error-message></rpc-error>"
+    )
+
+
+class _RpcError(Exception):
+    def __init__(self, tag: str, message: str):
+        super().__init__(message)
+        self.tag = tag
+
+
+class _ServerInterface(paramiko.ServerInterface):
+    def __init__(self):
+        self.subsystem = threading.Event()
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_subsystem_request(self, channel, name):
+        if name == "netconf":
+            self.subsystem.set()
+            return True
+        return False
+
+
+class MockNetconfServer:
+    def __init__(self, model: RouterModel, host_key: paramiko.PKey, host="127.0.0.1", port=0):
+        self.model = model
+        self.host_key = host_key
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, port))
+        self._sock.listen(64)
+        self._running = False
+        self._session_ids = iter(range(1, 1 << 30))
+        self._lock = threading.Lock()
+
+    @property
+    def endpoint(self):
+        return self._sock.getsockname()[:2]
+
+    def start(self):
+        self._running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        return self
+
+    def shutdown(self):
+        self._running = False
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+
+    # ---------------------------------------
+    # SSH / framing
+    # ---------------------------------------
+    def _accept_loop(self):
+        while self._running:
+            try:
+                client, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve_client, args=(client,), daemon=True).start()
+
+    def _serve_client(self, client):
+        transport = paramiko.Transport(client)
+        transport.add_server_key(self.host_key)
+        server = _ServerInterface()
+        try:
+            transport.start_server(server=server)
+            channel = transport.accept(timeout=10)
+            if channel is None or not server.subsystem.wait(timeout=10):
+                return
+            with self._lock:
+                session_id = next(self._session_ids)
+            channel.sendall(HELLO.format(session_id=session_id).encode() + DELIM)
+            self._serve_channel(channel)
+        except Exception:
+            pass
+        finally:
+            transport.close()
+
+    def _serve_channel(self, channel):
+        buffer = b""
+        while True:
+            while DELIM not in buffer:
+                chunk = channel.recv(65536)
+                if not chunk:
+                    return
+                buffer += chunk
+            message, buffer = buffer.split(DELIM, 1)
+            root = ET.fromstring(message.strip())
+            if _local(root.tag) == "hello":
+                continue
+            reply, close = self._handle_rpc(root)
+            channel.sendall(reply.encode() + DELIM)
+            if close:
+                return
+
+    # ---------------------------------------
+    # RPCs
+    # ---------------------------------------
+    def _handle_rpc(self, rpc):
+        message_id = rpc.get("message-id", "")
+        operation = next(iter(rpc), None)
+        name = _local(operation.tag) if operation is not None else ""
+        try:
+            if name == "close-session":
+                return _reply(message_id, "<ok/>"), True
+            if name == "create-subscription":
+                raise _RpcError("operation-not-supported", "notifications are not supported")
+            self.model.delay()
+            if name == "get-config":
+                return _reply(message_id, self._get_config()), False
+            if name == "get":
+                return _reply(message_id, self._get_state(operation)), False
+            if name == "edit-config":
+                self._edit_config(operation)
+                return _reply(message_id, "<ok/>"), False
+            raise _RpcError("operation-not-supported", f"{name} is not supported")
+        except _RpcError as e:
+            return _reply(message_id, _rpc_error(e.tag, str(e))), False
+
+    def _get_config(self) -> str:
+        with self.model.lock:
+            items = "".join(
+                f"<interface><name>{i['name']}</name>"
+                f"<enabled>{'true' if i.get('enabled', True) else 'false'}</enabled></interface>"
+                for i in self.model.interfaces.values()
+            )
+        return f'<data><interfaces xmlns="{IF_NS}">{items}</interfaces></data>'
+
+    def _get_state(self, operation) -> str:
+        wanted = {
+            e.text for e in operation.iter(_q(IF_NS, "name")) if e.text
+        }
+        with self.model.lock:
+            items = "".join(
+                f"<interface><name>{i['name']}</name>"
+                f"<admin-status>{'up' if i.get('enabled', True) else 'down'}</admin-status>"
+                f"<oper-status>{self.model.oper_status(i)}</oper-status></interface>"
+                for i in self.model.interfaces.values()
+                if not wanted or i["name"] in wanted
+            )
+        if not items:
+            return "<data/>"
+        return f'<data><interfaces-state xmlns="{IF_NS}">{items}</interfaces-state></data>'
+
+    def _edit_config(self, operation):
+        default_element = _child(operation, "default-operation")
+        default_op = default_element.text if default_element is not None else "merge"
+        config = _child(operation, "config")
+        if config is None:
+            raise _RpcError("missing-element", "config is required")
+        op_attr = _q(NC_NS, "operation")
+
+        with self.model.lock:
+            for iface in config.iter(_q(IF_NS, "interface")):
+                name = iface.findtext(_q(IF_NS, "name"))
+                op = iface.get(op_attr, default_op)
+                exists = name in self.model.interfaces
+                if op == "create" and exists:
+                    raise _RpcError("data-exists", f"{name} already exists")
+                if op == "delete" and not exists:
+                    raise _RpcError("data-missing", f"{name} does not exist")
+                if op in ("delete", "remove"):
+                    self.model.interfaces.pop(name, None)
+                    self.model.touch()
+                    continue
+
+                enabled = iface.find(_q(IF_NS, "enabled"))
+                leaf_op = enabled.get(op_attr, op) if enabled is not None else op
+                if op == "none" and not exists:
+                    raise _RpcError("data-missing", f"{name} does not exist")
+                if op in ("create", "merge", "replace") and not exists:
+                    self.model.interfaces[name] = {"name": name, "enabled": True}
+                if enabled is not None and leaf_op in ("merge", "replace", "create"):
+                    self.model.interfaces[name]["enabled"] = enabled.text.strip() == "true"
+                self.model.touch()
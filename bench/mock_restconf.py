@@ -0,0 +1,189 @@
+"""
+Stand-in RESTCONF server for the ietf-interfaces paths used by restconf_final:
+
+  /restconf/data/ietf-interfaces:interfaces                 GET, PATCH (merge or YANG Patch delete)
+  /restconf/data/ietf-interfaces:interfaces/interface=<n>   GET, PUT, PATCH, DELETE
+
+Responses carry ETag/Last-Modified, and If-Match / If-None-Match are honoured,
+so the conditional-write path of restconf_final is exercised too.
+"""
+import json
+import ssl
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+from bench.device_model import RouterModel
+
+BASE = "/restconf/data/ietf-interfaces:interfaces"
+YANG_PATCH = "application/yang-patch+json"
+
+
+def _to_json(iface: dict) -> dict:
+    return {key: value for key, value in iface.items() if not key.startswith("_")}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    model: RouterModel = None
+
+    def log_message(self, format, *args):
+        pass
+
+    # ---------------------------------------
+    # Helpers
+    # ---------------------------------------
+    def _send(self, code: int, body=None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.send_response(code)
+        self.send_header("ETag", self.model.etag)
+        self.send_header("Last-Modified", formatdate(self.model.changed_at, usegmt=True))
+        if payload:
+            self.send_header("Content-Type", "application/yang-data+json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if payload:
+            self.wfile.write(payload)
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        return json.loads(raw or b"{}")
+
+    def _target(self):
+        """(is_collection, interface name or None) or None for unknown paths."""
+        path = unquote(self.path.split("?", 1)[0])
+        if path == BASE:
+            return True, None
+        prefix = f"{BASE}/interface="
+        if path.startswith(prefix):
+            return False, path[len(prefix):]
+        return None
+
+    def _precondition_failed(self) -> bool:
+        if_match = self.headers.get("If-Match")
+        if if_match and if_match != self.model.etag:
+            self._send(412)
+            return True
+        return False
+
+    # ---------------------------------------
+    # Methods
+    # ---------------------------------------
+    def do_GET(self):
+        target = self._target()
+        if target is None:
+            return self._send(404)
+        self.model.delay()
+        with self.model.lock:
+            if self.headers.get("If-None-Match") == self.model.etag:
+                return self._send(304)
+            collection, name = target
+            if collection:
+                items = [_to_json(i) for i in self.model.interfaces.values()]
+                return self._send(200, {"ietf-interfaces:interfaces": {"interface": items}})
+            iface = self.model.interfaces.get(name)
+            if iface is None:
+                return self._send(404)
+            body = dict(_to_json(iface), **{"oper-status": self.model.oper_status(iface)})
+            return self._send(200, {"ietf-interfaces:interface": body})
+
+    def do_PUT(self):
+        target = self._target()
+        if target is None or target[0]:
+            return self._send(405)
+        body = self._body().get("ietf-interfaces:interface", {})
+        self.model.delay()
+        with self.model.lock:
+            if self._precondition_failed():
+                return
+            name = target[1]
+            existed = name in self.model.interfaces
+            iface = {"name": name, "enabled": True}
+            iface.update(body)
+            self.model.interfaces[name] = iface
+            self.model.touch()
+            return self._send(204 if existed else 201)
+
+    def do_PATCH(self):
+        target = self._target()
+        if target is None:
+            return self._send(404)
+        body = self._body()
+        self.model.delay()
+        with self.model.lock:
+            if self._precondition_failed():
+                return
+            collection, name = target
+            if collection and self.headers.get("Content-Type", "").startswith(YANG_PATCH):
+                return self._yang_patch(body)
+            if collection:
+                items = body.get("ietf-interfaces:interfaces", {}).get("interface", [])
+                for item in items:
+                    current = self.model.interfaces.setdefault(
+                        item["name"], {"name": item["name"], "enabled": True}
+                    )
+                    current.update(item)
+            else:
+                iface = self.model.interfaces.get(name)
+                if iface is None:
+                    return self._send(404)
+                iface.update(body.get("ietf-interfaces:interface", {}))
+            self.model.touch()
+            return self._send(204)
+
+    def _yang_patch(self, body: dict):
+        # RFC 8072, delete edits only; all-or-nothing like a real datastore
+        edits = body.get("ietf-yang-patch:yang-patch", {}).get("edit", [])
+        names = []
+        for edit in edits:
+            target = unquote(edit.get("target", ""))
+            if edit.get("operation") != "delete" or not target.startswith("/interface="):
+                return self._send(400)
+            names.append(target[len("/interface="):])
+        if any(name not in self.model.interfaces for name in names):
+            return self._send(409)
+        for name in names:
+            del self.model.interfaces[name]
+        self.model.touch()
+        return self._send(200, {"ietf-yang-patch:yang-patch-status": {"ok": [None]}})
+
+    def do_DELETE(self):
+        target = self._target()
+        if target is None or target[0]:
+            return self._send(405)
+        self.model.delay()
+        with self.model.lock:
+            if self._precondition_failed():
+                return
+            if self.model.interfaces.pop(target[1], None) is None:
+                return self._send(404)
+            self.model.touch()
+            return self._send(204)
+
+
+class MockRestconfServer:
+    def __init__(self, model: RouterModel, certfile: str, keyfile: str, host="127.0.0.1", port=0):
+        handler = type("Handler", (_Handler,), {"model": model})
+        self._httpd = ThreadingHTTPServer((host, port), handler)
+        self._httpd.daemon_threads = True
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile, keyfile)
+        self._httpd.socket = context.wrap_socket(self._httpd.socket, server_side=True)
+        self._thread = None
+
+    @property
+    def address(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def shutdown(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
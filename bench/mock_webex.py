@@ -0,0 +1,210 @@
+"""
+Stand-in for the parts of the Webex messages API the bot uses:
+
+  GET  /v1/messages?roomId=&max=&beforeMessage=   newest first
+  GET  /v1/messages/<id>
+  POST /v1/messages                               JSON or multipart (file)
+  POST /v1/webhooks
+
+Messages are added with inject(); every POST /v1/messages is recorded as a
+reply together with its arrival time. Webhooks registered through the API
+receive "messages/created" callbacks from post_callback(), signed like
+Webex does (HMAC-SHA1 of the body in X-Spark-Signature).
+"""
+import hashlib
+import hmac
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class WebexRoom:
+    def __init__(self, latency: float = 0.0, room_id: str = "bench-room"):
+        self.latency = latency  # seconds added to every API call
+        self.room_id = room_id
+        self.cond = threading.Condition()
+        self.messages = []  # oldest first
+        self.replies = []  # (perf_counter timestamp, text)
+        self.webhooks = []  # bodies of POST /v1/webhooks
+        self.fetches = Counter()  # message id -> GET /v1/messages/<id> count
+        self._seq = 0
+        self._last_created = None
+
+    def _next_created(self) -> str:
+        now = datetime.now(timezone.utc)
+        if self._last_created and now <= self._last_created:
+            now = self._last_created + timedelta(microseconds=1)
+        self._last_created = now
+        return now.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+    def inject(self, text: str) -> dict:
+        with self.cond:
+            self._seq += 1
+            message = {
+                "id": f"msg-{self._seq}",
+                "roomId": self.room_id,
+                "text": text,
+                "created": self._next_created(),
+            }
+            self.messages.append(message)
+            return message
+
+    def add_reply(self, text: str):
+        with self.cond:
+            self.replies.append((time.perf_counter(), text))
+            self.cond.notify_all()
+
+    def wait_replies(self, count: int, timeout: float = 60.0) -> list:
+        """Block until at least `count` replies were posted; returns them all."""
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while len(self.replies) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"Got {len(self.replies)} of {count} replies")
+                self.cond.wait(remaining)
+            return list(self.replies)
+
+    def page(self, max_items: int, before_id=None) -> list:
+        with self.cond:
+            newest_first = list(reversed(self.messages))
+        if before_id:
+            ids = [m["id"] for m in newest_first]
+            if before_id not in ids:
+                return []
+            newest_first = newest_first[ids.index(before_id) + 1 :]
+        return newest_first[:max_items]
+
+    def get(self, message_id: str):
+        with self.cond:
+            self.fetches[message_id] += 1
+            for message in self.messages:
+                if message["id"] == message_id:
+                    return message
+        return None
+
+    def add_webhook(self, body: dict) -> dict:
+        with self.cond:
+            webhook = dict(body, id=f"webhook-{len(self.webhooks) + 1}")
+            self.webhooks.append(webhook)
+            return webhook
+
+    def post_callback(self, message: dict, secret: str = None) -> list:
+        """
+        Send a messages/created callback for `message` to every registered
+        webhook; call it again with the same message to simulate Webex
+        redelivering it. The body is signed with the webhook's secret, or
+        with `secret` to test rejection. Returns the HTTP status codes.
+        """
+        with self.cond:
+            webhooks = list(self.webhooks)
+        statuses = []
+        for webhook in webhooks:
+            body = json.dumps(
+                {
+                    "id": webhook["id"],
+                    "resource": "messages",
+                    "event": "created",
+                    "data": {"id": message["id"], "roomId": message["roomId"]},
+                }
+            ).encode()
+            request = urllib.request.Request(
+                webhook["targetUrl"], data=body, headers={"Content-Type": "application/json"}
+            )
+            key = secret if secret is not None else webhook.get("secret")
+            if key:
+                signature = hmac.new(key.encode(), body, hashlib.sha1).hexdigest()
+                request.add_header("X-Spark-Signature", signature)
+            try:
+                with urllib.request.urlopen(request, timeout=5) as response:
+                    statuses.append(response.status)
+            except urllib.error.HTTPError as e:
+                statuses.append(e.code)
+        return statuses
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    room: WebexRoom = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, code: int, body=None):
+        payload = json.dumps(body if body is not None else {}).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def do_GET(self):
+        if self.room.latency:
+            time.sleep(self.room.latency)
+        url = urlparse(self.path)
+        if url.path == "/v1/messages":
+            query = parse_qs(url.query)
+            max_items = int(query.get("max", ["50"])[0])
+            before = query.get("beforeMessage", [None])[0]
+            return self._send(200, {"items": self.room.page(max_items, before)})
+        if url.path.startswith("/v1/messages/"):
+            message = self.room.get(url.path.rsplit("/", 1)[1])
+            if message is None:
+                return self._send(404, {"message": "Not found"})
+            return self._send(200, message)
+        return self._send(404, {"message": "Not found"})
+
+    def do_POST(self):
+        if self.room.latency:
+            time.sleep(self.room.latency)
+        body = self._read_body()
+        url = urlparse(self.path)
+        if url.path == "/v1/webhooks":
+            return self._send(200, self.room.add_webhook(json.loads(body or b"{}")))
+        if url.path != "/v1/messages":
+            return self._send(404, {"message": "Not found"})
+
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.startswith("multipart/"):
+            text = "[file]"
+            # The text field is enough for the benchmark; skip the file part
+            marker = b'name="text"\r\n\r\n'
+            if marker in body:
+                text = body.split(marker, 1)[1].split(b"\r\n--", 1)[0].decode(errors="replace")
+        else:
+            data = json.loads(body or b"{}")
+            text = data.get("markdown") or data.get("text") or ""
+        self.room.add_reply(text)
+        return self._send(200, {"id": "reply", "text": text})
+
+
+class MockWebexServer:
+    def __init__(self, room: WebexRoom, host="127.0.0.1", port=0):
+        handler = type("Handler", (_Handler,), {"room": room})
+        self.room = room
+        self._httpd = ThreadingHTTPServer((host, port), handler)
+        self._httpd.daemon_threads = True
+
+    @property
+    def api_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def shutdown(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
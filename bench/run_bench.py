@@ -0,0 +1,275 @@
+"""
+Offline end-to-end benchmark of the bot.
+
+Starts local stand-ins for every router (RESTCONF over HTTPS and NETCONF over
+SSH, sharing one interface model per router) and for the Webex messages API,
+points the bot at them, then drives real chat messages through
+poll_once -> parse_command -> handler -> backend -> reply.
+
+For every transport it reports, per command type, the number of samples and
+p50/p95/p99 latency from ingestion to the posted reply, plus throughput.
+
+    python -m bench.run_bench --iterations 20 --device-latency 0.01
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import paramiko
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+from bench.device_model import RouterModel
+from bench.mock_netconf import MockNetconfServer
+from bench.mock_restconf import MockRestconfServer
+from bench.mock_webex import MockWebexServer, WebexRoom
+
+ROUTERS = ["10.0.15.61", "10.0.15.62", "10.0.15.63", "10.0.15.64", "10.0.15.65"]
+
+# netmiko needs an IOS CLI, which has no stand-in here; "auto" still probes it
+# with a few background status reads per router, which fail without reaching
+# a reply
+TRANSPORTS = ["restconf", "netconf", "auto"]
+
+# One round per iteration; each step is sent to every router at once,
+# "all ..." steps are a single fan-out message
+ROUND = [
+    "create",
+    "status",
+    "status fresh",
+    "disable",
+    "status fresh",
+    "enable",
+    "all status fresh",
+    "delete",
+    "status fresh",
+    "create 1000-1099",
+    "disable 1000-1099",
+    "delete 1000-1099",
+]
+
+REPLY_TIMEOUT = 60  # seconds to wait for the bot's replies to one step
+
+
+def _write_self_signed_cert(directory: str):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "bench-router")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    certfile = os.path.join(directory, "cert.pem")
+    keyfile = os.path.join(directory, "key.pem")
+    with open(certfile, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(keyfile, "wb") as f:
+        f.write(
+            key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.TraditionalOpenSSL,
+                serialization.NoEncryption(),
+            )
+        )
+    return certfile, keyfile
+
+
+def start_lab(workdir: str, device_latency: float, webex_latency: float):
+    """Start every stand-in; returns (room, webex api url, servers, restconf map, netconf map)."""
+    certfile, keyfile = _write_self_signed_cert(workdir)
+    host_key = paramiko.RSAKey.generate(2048)
+
+    servers = []
+    restconf_endpoints = {}
+    netconf_endpoints = {}
+    for ip in ROUTERS:
+        model = RouterModel(ip, latency=device_latency)
+        restconf = MockRestconfServer(model, certfile, keyfile).start()
+        netconf = MockNetconfServer(model, host_key).start()
+        servers += [restconf, netconf]
+        restconf_endpoints[ip] = restconf.address
+        netconf_endpoints[ip] = netconf.endpoint
+
+    room = WebexRoom(latency=webex_latency)
+    webex = MockWebexServer(room).start()
+    servers.append(webex)
+    return room, webex.api_url, servers, restconf_endpoints, netconf_endpoints
+
+
+def _percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def _is_failure(reply: str) -> bool:
+    # Fan-out replies carry one "<ip>: <reply>" line per router
+    for line in reply.splitlines() or [reply]:
+        ip, sep, text = line.partition(": ")
+        if sep and ip in ROUTERS:
+            line = text
+        # Bulk replies report "Loopback<n>-<m>: Cannot ..." per run
+        if line.startswith("Error") or "Cannot " in line:
+            return True
+    return False
+
+
+class Bench:
+    def __init__(self, bot, room: WebexRoom, cursor, quiet: bool = True):
+        self.bot = bot
+        self.room = room
+        self.cursor = cursor
+        self.quiet = quiet
+        self.samples = {}  # (transport, command) -> [ms, ...]
+        self.errors = {}  # (transport, command) -> replies that did not succeed
+
+    def _send(self, texts: list, expect: int) -> tuple:
+        """Inject messages, ingest them once and wait for `expect` replies."""
+        before = len(self.room.replies)
+        start = time.perf_counter()
+        for text in texts:
+            self.room.inject(f"/{self.bot.STUDENT_ID} {text}")
+        sink = io.StringIO() if self.quiet else None
+        with contextlib.redirect_stdout(sink) if sink else contextlib.nullcontext():
+            self.bot.poll_once(self.cursor)
+            replies = self.room.wait_replies(before + expect, REPLY_TIMEOUT)
+        return start, replies[before:]
+
+    def step(self, transport: str, command: str):
+        if command.startswith("all "):
+            start, replies = self._send([command], expect=1)
+        else:
+            start, replies = self._send([f"{ip} {command}" for ip in ROUTERS], len(ROUTERS))
+        latencies = [(at - start) * 1000 for at, _ in replies]
+        self.samples.setdefault((transport, command), []).extend(latencies)
+        # Every step of a round is expected to succeed from a clean start
+        failed = sum(1 for _, text in replies if _is_failure(text))
+        self.errors[(transport, command)] = self.errors.get((transport, command), 0) + failed
+        return replies
+
+    def run_transport(self, transport: str, iterations: int) -> float:
+        """Run the rounds for one transport; returns commands per second."""
+        self._send([transport], expect=1)
+        # Start every router from a known state, outside of the measurement
+        self._send([f"{ip} delete" for ip in ROUTERS], len(ROUTERS))
+
+        count = 0
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for command in ROUND:
+                self.step(transport, command)
+                count += len(ROUTERS)
+        return count / (time.perf_counter() - start)
+
+    def report(self, throughput: dict) -> dict:
+        results = {}
+        for (transport, command), values in self.samples.items():
+            results.setdefault(transport, {"throughput": round(throughput[transport], 1)})
+            results[transport][command] = {
+                "n": len(values),
+                "errors": self.errors.get((transport, command), 0),
+                "p50_ms": round(_percentile(values, 50), 2),
+                "p95_ms": round(_percentile(values, 95), 2),
+                "p99_ms": round(_percentile(values, 99), 2),
+            }
+        return results
+
+
+def print_table(results: dict):
+    print(
+        f"{'transport':<10} {'command':<18} {'n':>5} {'errors':>6} "
+        f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    )
+    for transport, rows in results.items():
+        for command, row in rows.items():
+            if command == "throughput":
+                continue
+            print(
+                f"{transport:<10} {command:<18} {row['n']:>5} {row['errors']:>6} "
+                f"{row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f}"
+            )
+        print(f"{transport:<10} {'throughput':<18} {rows['throughput']:>5} commands/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark of the IPA2025 bot")
+    parser.add_argument("--iterations", type=int, default=10, help="rounds per transport")
+    parser.add_argument(
+        "--device-latency", type=float, default=0.0, help="seconds added per device call"
+    )
+    parser.add_argument(
+        "--webex-latency", type=float, default=0.0, help="seconds added per Webex API call"
+    )
+    parser.add_argument(
+        "--transports", default=",".join(TRANSPORTS), help="comma separated, in order"
+    )
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="keep the bot's own output")
+    args = parser.parse_args(argv)
+
+    # Sessions torn down at exit make paramiko log tracebacks; they are noise here
+    logging.getLogger("paramiko").setLevel(logging.CRITICAL)
+
+    workdir = tempfile.mkdtemp(prefix="ipa2025-bench-")
+    room, api_url, servers, restconf_endpoints, netconf_endpoints = start_lab(
+        workdir, args.device_latency, args.webex_latency
+    )
+
+    # The bot reads its configuration at import time
+    os.environ["ACCESS_TOKEN"] = "bench-token"
+    os.environ["WEBEX_API_URL"] = api_url
+    os.environ["WEBEX_CURSOR_FILE"] = os.path.join(workdir, "cursor.json")
+    os.environ["CONFIG_ARCHIVE_DIR"] = os.path.join(workdir, "config_archive")
+    os.environ["JOBS_DB"] = os.path.join(workdir, "jobs.sqlite3")
+    # One reply per command, so replies can be matched to what was sent
+    os.environ["WEBEX_COALESCE"] = "0"
+    import ipa2025_final as bot
+    import netconf_final
+    import restconf_final
+    from message_cursor import MessageCursor
+
+    restconf_final.ENDPOINTS.update(restconf_endpoints)
+    netconf_final.ENDPOINTS.update(netconf_endpoints)
+
+    # The first poll only sets the cursor, so give it a message to start from
+    room.inject("bench start")
+    cursor = MessageCursor(os.environ["WEBEX_CURSOR_FILE"])
+    bot.poll_once(cursor)
+
+    bench = Bench(bot, room, cursor, quiet=not args.verbose)
+    throughput = {}
+    try:
+        for transport in args.transports.split(","):
+            throughput[transport] = bench.run_transport(transport, args.iterations)
+    finally:
+        bot.dispatcher.shutdown()
+        bot.outbox.close()
+        for server in servers:
+            server.shutdown()
+
+    results = bench.report(throughput)
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        print_table(results)
+    return results
+
+
+if __name__ == "__main__":
+    main()
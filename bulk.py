@@ -0,0 +1,141 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Most loopbacks one bulk command may touch
+MAX_INTERFACES = 1000
+MAX_LOOPBACK = 2147483647
+
+ACTIONS = ("create", "delete", "enable", "disable")
+
+# Per-interface outcomes
+OK = "ok"
+EXISTS = "exists"  # create: already there
+MISSING = "missing"  # delete/enable/disable: not there
+UNCHANGED = "unchanged"  # enable/disable: already in that state
+FAILED = "failed"  # the device rejected the change
+
+_SPEC = re.compile(r"^\d+(-\d+)?(,\d+(-\d+)?)*$")
+
+_MESSAGES = {
+    "create": {OK: "created successfully", EXISTS: "Cannot create (already exists)"},
+    "delete": {OK: "deleted successfully", MISSING: "Cannot delete (not found)"},
+    "enable": {
+        OK: "enabled successfully",
+        MISSING: "Cannot enable (not found)",
+        UNCHANGED: "Cannot enable (already enabled)",
+    },
+    "disable": {
+        OK: "shutdowned successfully",
+        MISSING: "Cannot shutdown (not found)",
+        UNCHANGED: "Cannot shutdown (already shut down)",
+    },
+}
+
+
+def is_spec(token: str) -> bool:
+    """True if `token` looks like a loopback number list/range (100-199,205)."""
+    return bool(_SPEC.match(token))
+
+
+def parse_numbers(spec: str) -> List[int]:
+    """'100-103,110' -> [100, 101, 102, 103, 110]; ValueError if unusable."""
+    if not is_spec(spec):
+        raise ValueError(f"Invalid loopback list {spec} (e.g. 100-199 or 100,105,110-120)")
+    numbers = []
+    for item in spec.split(","):
+        first, _, last = item.partition("-")
+        start, end = int(first), int(last or first)
+        if start > end:
+            raise ValueError(f"Invalid range {item}")
+        if end > MAX_LOOPBACK:
+            raise ValueError(f"Loopback number too large ({end})")
+        if len(numbers) + (end - start + 1) > MAX_INTERFACES:
+            raise ValueError(f"Too many interfaces (at most {MAX_INTERFACES} per command)")
+        numbers.extend(range(start, end + 1))
+    return sorted(set(numbers))
+
+
+def loopback_name(number: int) -> str:
+    return f"Loopback{number}"
+
+
+def plan(action: str, current: Dict[str, bool], names: List[str]) -> Tuple[List[str], Dict[str, str]]:
+    """
+    Decide what to send from the current state (name -> enabled, for the
+    interfaces that exist). Returns (names to change, outcomes of the rest).
+    """
+    changes = []
+    outcomes = {}
+    for name in names:
+        exists = name in current
+        if action == "create":
+            if exists:
+                outcomes[name] = EXISTS
+            else:
+                changes.append(name)
+        elif not exists:
+            outcomes[name] = MISSING
+        elif action == "delete":
+            changes.append(name)
+        elif current[name] == (action == "enable"):
+            outcomes[name] = UNCHANGED
+        else:
+            changes.append(name)
+    return changes, outcomes
+
+
+def finish(outcomes: Dict[str, str], changes: List[str], ok: bool) -> Dict[str, str]:
+    """Record the result of the single change request for every changed name."""
+    for name in changes:
+        outcomes[name] = OK if ok else FAILED
+    return outcomes
+
+
+def _runs(numbers: List[int], outcomes: Dict[str, str]):
+    """Group consecutive loopback numbers with the same outcome."""
+    runs = []
+    for number in numbers:
+        outcome = outcomes.get(loopback_name(number), FAILED)
+        if runs and runs[-1][2] == outcome and runs[-1][1] == number - 1:
+            runs[-1][1] = number
+        else:
+            runs.append([number, number, outcome])
+    return runs
+
+
+def summarize(action: str, numbers: List[int], outcomes: Dict[str, str], label: str) -> str:
+    """
+    One line per run of interfaces with the same outcome, e.g.
+      Bulk create of 100 loopbacks using Restconf: 98 ok, 2 not changed
+      Loopback100-197: created successfully
+      Loopback198-199: Cannot create (already exists)
+    """
+    messages = _MESSAGES[action]
+    ok_count = sum(1 for n in numbers if outcomes.get(loopback_name(n)) == OK)
+    failed = sum(1 for n in numbers if outcomes.get(loopback_name(n), FAILED) == FAILED)
+    skipped = len(numbers) - ok_count - failed
+    head = f"Bulk {action} of {len(numbers)} loopbacks using {label}: {ok_count} ok"
+    if skipped:
+        head += f", {skipped} not changed"
+    if failed:
+        head += f", {failed} failed"
+
+    lines = [head]
+    for first, last, outcome in _runs(numbers, outcomes):
+        names = loopback_name(first) if first == last else f"{loopback_name(first)}-{last}"
+        text = messages.get(outcome, f"Cannot {action} (failed)")
+        lines.append(f"{names}: {text}")
+    return "\n".join(lines)
+
+
+def failed_all(names: List[str]) -> Dict[str, str]:
+    return {name: FAILED for name in names}
+
+
+def enabled_value(value: Optional[object]) -> bool:
+    """ietf-interfaces 'enabled' defaults to true when the leaf is absent."""
+    if value is None:
+        return True
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() == "true"
@@ -0,0 +1,103 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+ARCHIVE_DIR = os.environ.get("CONFIG_ARCHIVE_DIR", "config_archive")
+MAX_HISTORY = 500  # snapshots kept in the index per router
+
+
+class ConfigArchive:
+    """
+    Running-config snapshots per router.
+
+    Contents are stored once per SHA-256 under objects/<hash>.gz, so repeated
+    fetches of an unchanged config cost no extra disk. index.json lists the
+    snapshots of every router (oldest first) and is kept in memory, so the
+    latest snapshot of a router is a dictionary lookup.
+
+      <root>/index.json        {"routers": {ip: [{"ts", "hash", "size"}, ...]}}
+      <root>/objects/ab/abcd...gz
+    """
+
+    def __init__(self, root: str = ARCHIVE_DIR):
+        self.root = root
+        self.index_path = os.path.join(root, "index.json")
+        self._lock = threading.Lock()
+        self._index = self._load_index()
+
+    def _load_index(self) -> dict:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"routers": {}}
+        except (OSError, ValueError) as e:
+            print("Cannot read archive index, starting a new one:", e)
+            return {"routers": {}}
+
+    def _save_index(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], f"{digest}.gz")
+
+    # ---------------------------------------
+    # Write
+    # ---------------------------------------
+    def put(self, router: str, content: str, ts: Optional[float] = None) -> dict:
+        """Store a snapshot of `router` and return its index entry."""
+        data = content.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        entry = {"ts": ts if ts is not None else time.time(), "hash": digest, "size": len(data)}
+        with self._lock:
+            history = self._index["routers"].setdefault(router, [])
+            history.append(entry)
+            del history[:-MAX_HISTORY]
+            self._save_index()
+        return entry
+
+    def put_file(self, router: str, filename: str) -> dict:
+        with open(filename, "r", encoding="utf-8", errors="replace") as f:
+            return self.put(router, f.read())
+
+    # ---------------------------------------
+    # Read
+    # ---------------------------------------
+    def history(self, router: str) -> list:
+        with self._lock:
+            return list(self._index["routers"].get(router, []))
+
+    def latest(self, router: str, max_age: Optional[float] = None) -> Optional[dict]:
+        """Newest snapshot of `router`, optionally only if younger than max_age seconds."""
+        with self._lock:
+            history = self._index["routers"].get(router)
+            entry = dict(history[-1]) if history else None
+        if entry and max_age is not None and time.time() - entry["ts"] > max_age:
+            return None
+        return entry
+
+    def read(self, entry: dict) -> str:
+        with gzip.open(self._object_path(entry["hash"]), "rb") as f:
+            return f.read().decode("utf-8")
+
+    def export(self, entry: dict, filename: str) -> str:
+        """Write a snapshot to a plain text file (e.g. for upload) and return its name."""
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(self.read(entry))
+        return filename
@@ -0,0 +1,447 @@
+import hashlib
+import heapq
+import itertools
+import os
+import re
+import socket
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Set it to something stable when state files are per instance (instance_path):
+# the hostname:pid fallback changes on every restart
+INSTANCE_ID = os.environ.get("INSTANCE_ID") or f"{socket.gethostname()}:{os.getpid()}"
+
+LEASE_TTL = 30.0  # seconds a claim or heartbeat lasts without renewal
+HANDOFF_DELAY = 20.0  # seconds other instances leave a message to its owner
+DONE_TTL = 24 * 3600  # seconds a finished message stays claimed
+BUSY_TIMEOUT_MS = 5000
+COLLECT_INTERVAL = 0.5  # seconds between checks for results finished elsewhere
+
+# Results of acquire()
+NEW = "new"  # nobody had claimed the key (or we already held it)
+TAKEOVER = "takeover"  # another instance held it and let the lease expire
+
+
+def instance_path(path: str, instance_id: str = INSTANCE_ID) -> str:
+    """Per-instance variant of a state file: jobs.sqlite3 -> jobs.<instance>.sqlite3"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{re.sub(r'[^A-Za-z0-9_.-]+', '-', instance_id)}{ext}"
+
+
+def rendezvous_owner(key: str, instances: List[str]) -> str:
+    """
+    Highest-random-weight choice of the instance responsible for `key`:
+    every instance computes the same answer from the same member list, and
+    when one leaves only the keys it owned move to someone else.
+    """
+
+    def weight(instance: str) -> bytes:
+        return hashlib.blake2b(f"{instance}|{key}".encode(), digest_size=8).digest()
+
+    return max(instances, key=weight)
+
+
+# ---------------------------------------
+# Lease stores
+#   acquire(key, owner, ttl) -> NEW / TAKEOVER / None
+#   renew(keys, owner, ttl), complete(key, owner, ttl, result)
+#   holder(key) -> (owner, expires_at, done) or None
+#   results(keys) -> {key: result} of the completed ones that left a result
+#   heartbeat(instance, ttl), live_instances() -> [instance, ...]
+# ---------------------------------------
+class MemoryLeaseStore:
+    """In-process stand-in: one instance, same semantics as the shared store."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._leases = {}  # key -> [owner, expires_at, done, result]
+        self._instances = {}  # instance -> expires_at
+
+    def acquire(self, key: str, owner: str, ttl: float) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            lease = self._leases.get(key)
+            if lease is None or lease[0] == owner:
+                result = NEW
+            elif lease[1] < now:
+                result = TAKEOVER
+            else:
+                return None
+            if lease is not None and lease[2] and lease[1] >= now:
+                return None
+            self._leases[key] = [owner, now + ttl, False, None]
+            return result
+
+    def renew(self, keys: List[str], owner: str, ttl: float):
+        expires_at = time.time() + ttl
+        with self._lock:
+            for key in keys:
+                lease = self._leases.get(key)
+                if lease and lease[0] == owner and not lease[2]:
+                    lease[1] = expires_at
+
+    def complete(
+        self, key: str, owner: str, ttl: float = DONE_TTL, result: Optional[str] = None
+    ):
+        with self._lock:
+            lease = self._leases.get(key)
+            if lease and lease[0] == owner:
+                self._leases[key] = [owner, time.time() + ttl, True, result]
+
+    def holder(self, key: str) -> Optional[Tuple[str, float, bool]]:
+        with self._lock:
+            lease = self._leases.get(key)
+            return tuple(lease[:3]) if lease else None
+
+    def results(self, keys: List[str]) -> Dict[str, str]:
+        with self._lock:
+            leases = [(key, self._leases.get(key)) for key in keys]
+        return {
+            key: lease[3] for key, lease in leases if lease and lease[2] and lease[3] is not None
+        }
+
+    def heartbeat(self, instance: str, ttl: float):
+        now = time.time()
+        with self._lock:
+            self._instances[instance] = now + ttl
+            for key in [k for k, lease in self._leases.items() if lease[1] < now - ttl]:
+                del self._leases[key]
+
+    def live_instances(self) -> List[str]:
+        now = time.time()
+        with self._lock:
+            return sorted(i for i, expires_at in self._instances.items() if expires_at >= now)
+
+
+_LEASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    key        TEXT PRIMARY KEY,
+    owner      TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    done       INTEGER NOT NULL DEFAULT 0,
+    result     TEXT
+);
+CREATE TABLE IF NOT EXISTS instances (
+    id         TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class SqliteLeaseStore:
+    """
+    Leases in a SQLite file shared by the bot processes of one host. Each
+    acquire runs in its own IMMEDIATE transaction, so two processes can
+    never both win the same key.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        db = self._connect()
+        db.executescript(_LEASE_SCHEMA)
+        # Files created before results were kept with the leases
+        if "result" not in {row[1] for row in db.execute("PRAGMA table_info(leases)")}:
+            db.execute("ALTER TABLE leases ADD COLUMN result TEXT")
+
+    def _connect(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(
+                self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None
+            )
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _transaction(self, work):
+        db = self._connect()
+        with self._write_lock:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(db)
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+            return result
+
+    def acquire(self, key: str, owner: str, ttl: float) -> Optional[str]:
+        def work(db):
+            now = time.time()
+            row = db.execute(
+                "SELECT owner, expires_at, done FROM leases WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[0] == owner:
+                result = NEW
+            elif row[1] < now:
+                result = TAKEOVER
+            else:
+                return None
+            if row is not None and row[2] and row[1] >= now:
+                return None
+            db.execute(
+                "INSERT OR REPLACE INTO leases (key, owner, expires_at, done, result)"
+                " VALUES (?, ?, ?, 0, NULL)",
+                (key, owner, now + ttl),
+            )
+            return result
+
+        return self._transaction(work)
+
+    def renew(self, keys: List[str], owner: str, ttl: float):
+        if not keys:
+            return
+        expires_at = time.time() + ttl
+        self._transaction(
+            lambda db: db.executemany(
+                "UPDATE leases SET expires_at = ? WHERE key = ? AND owner = ? AND done = 0",
+                [(expires_at, key, owner) for key in keys],
+            )
+        )
+
+    def complete(
+        self, key: str, owner: str, ttl: float = DONE_TTL, result: Optional[str] = None
+    ):
+        self._transaction(
+            lambda db: db.execute(
+                "UPDATE leases SET expires_at = ?, done = 1, result = ?"
+                " WHERE key = ? AND owner = ?",
+                (time.time() + ttl, result, key, owner),
+            )
+        )
+
+    def holder(self, key: str) -> Optional[Tuple[str, float, bool]]:
+        row = self._connect().execute(
+            "SELECT owner, expires_at, done FROM leases WHERE key = ?", (key,)
+        ).fetchone()
+        return (row[0], row[1], bool(row[2])) if row else None
+
+    def results(self, keys: List[str]) -> Dict[str, str]:
+        if not keys:
+            return {}
+        rows = self._connect().execute(
+            "SELECT key, result FROM leases WHERE done = 1 AND result IS NOT NULL"
+            f" AND key IN ({', '.join('?' * len(keys))})",
+            list(keys),
+        )
+        return dict(rows.fetchall())
+
+    def heartbeat(self, instance: str, ttl: float):
+        def work(db):
+            now = time.time()
+            db.execute(
+                "INSERT OR REPLACE INTO instances (id, expires_at) VALUES (?, ?)",
+                (instance, now + ttl),
+            )
+            db.execute("DELETE FROM instances WHERE expires_at < ?", (now - ttl,))
+            db.execute("DELETE FROM leases WHERE expires_at < ?", (now - ttl,))
+
+        self._transaction(work)
+
+    def live_instances(self) -> List[str]:
+        rows = self._connect().execute(
+            "SELECT id FROM instances WHERE expires_at >= ? ORDER BY id", (time.time(),)
+        )
+        return [row[0] for row in rows]
+
+
+# ---------------------------------------
+# Coordinator
+# ---------------------------------------
+class Coordinator:
+    """
+    Decides which bot instance runs each message.
+
+    Every instance sends a heartbeat to the lease store; the live ones
+    split routers (and messages without a router) among themselves by
+    rendezvous hashing. The owner claims a message lease at once and
+    keeps renewing it while the command runs; the others only try after
+    `handoff_delay`, which matters when the owner is gone, and again
+    whenever a lease they could not get expires without being completed.
+    A finished message keeps its lease for DONE_TTL so nobody runs it again,
+    together with its result when another instance is going to collect it.
+    """
+
+    def __init__(
+        self,
+        store,
+        instance_id: str = INSTANCE_ID,
+        ttl: float = LEASE_TTL,
+        handoff_delay: float = HANDOFF_DELAY,
+    ):
+        self.store = store
+        self.instance_id = instance_id
+        self.ttl = ttl
+        self.handoff_delay = handoff_delay
+        self._cond = threading.Condition()
+        self._held = set()  # lease keys of messages being worked on here
+        self._instances = [instance_id]
+        self._pending = []  # heap of (due, seq, message_id, callback)
+        self._seq = itertools.count()
+        self._listeners = []  # called with the new member list when it changes
+        self._collectors = []  # [lease keys, callback, deadline]
+        self._thread = None
+
+    def start(self):
+        self._heartbeat()
+        self._thread = threading.Thread(target=self._run, name="coordinator", daemon=True)
+        self._thread.start()
+        return self
+
+    # ---------------------------------------
+    # Ownership
+    # ---------------------------------------
+    def instances(self) -> List[str]:
+        with self._cond:
+            return list(self._instances)
+
+    def owner(self, key: str) -> str:
+        return rendezvous_owner(key, self.instances())
+
+    def is_owner(self, key: str) -> bool:
+        return self.owner(key) == self.instance_id
+
+    def on_membership_change(self, callback: Callable[[List[str]], None]):
+        """Call `callback(instances)` whenever an instance joins or leaves."""
+        with self._cond:
+            self._listeners.append(callback)
+
+    # ---------------------------------------
+    # Message leases
+    # ---------------------------------------
+    @staticmethod
+    def _key(message_id: str) -> str:
+        return f"msg:{message_id}"
+
+    def claim(self, message_id: str) -> Optional[str]:
+        """NEW or TAKEOVER if this instance now runs the message, else None."""
+        key = self._key(message_id)
+        result = self.store.acquire(key, self.instance_id, self.ttl)
+        if result:
+            with self._cond:
+                self._held.add(key)
+        return result
+
+    def done(self, message_id: str, result: Optional[str] = None):
+        """
+        The message was handled: keep it claimed so nobody runs it again.
+        `result` is kept with the lease for collect() on any instance.
+        """
+        key = self._key(message_id)
+        with self._cond:
+            self._held.discard(key)
+        self.store.complete(key, self.instance_id, result=result)
+        if result is not None:
+            self._collect(time.monotonic())
+
+    def collect(
+        self,
+        message_ids: List[str],
+        callback: Callable[[Dict[str, str]], None],
+        timeout: float,
+    ):
+        """
+        Call `callback({message_id: result})` once every message has been
+        done() with a result, on whichever instance, or after `timeout`
+        seconds with the results there are.
+        """
+        keys = {self._key(message_id): message_id for message_id in message_ids}
+        with self._cond:
+            self._collectors.append([keys, callback, time.monotonic() + timeout])
+            self._cond.notify()
+        self._collect(time.monotonic())
+
+    def _collect(self, now: float):
+        # Runs where a result is stored here and periodically for the others
+        with self._cond:
+            collectors = list(self._collectors)
+        for collector in collectors:
+            keys, callback, deadline = collector
+            found = self.store.results(list(keys))
+            if len(found) < len(keys) and now < deadline:
+                continue
+            with self._cond:
+                if not any(c is collector for c in self._collectors):
+                    continue  # another thread got there first
+                self._collectors = [c for c in self._collectors if c is not collector]
+            callback({keys[key]: result for key, result in found.items()})
+
+    def defer(self, message_id: str, callback: Callable[[str], None], delay: float = None):
+        """Try to claim later; callback(NEW or TAKEOVER) runs if it works out."""
+        due = time.monotonic() + (self.handoff_delay if delay is None else delay)
+        with self._cond:
+            heapq.heappush(self._pending, (due, next(self._seq), message_id, callback))
+            self._cond.notify()
+
+    def _retry(self, message_id: str, callback):
+        claim = self.claim(message_id)
+        if claim:
+            callback(claim)
+            return
+        lease = self.store.holder(self._key(message_id))
+        if lease is None or lease[2]:
+            return  # handled by someone else
+        # Still being worked on: look again once that lease could expire
+        self.defer(message_id, callback, max(lease[1] - time.time(), 0) + 1.0)
+
+    # ---------------------------------------
+    # Background: heartbeats, renewals, deferred claims
+    # ---------------------------------------
+    def _heartbeat(self):
+        self.store.heartbeat(self.instance_id, self.ttl)
+        with self._cond:
+            held = list(self._held)
+        self.store.renew(held, self.instance_id, self.ttl)
+        instances = self.store.live_instances()
+        if self.instance_id not in instances:
+            instances.append(self.instance_id)
+        instances = sorted(instances)
+        with self._cond:
+            changed = instances != self._instances
+            self._instances = instances
+            listeners = list(self._listeners) if changed else []
+        for callback in listeners:
+            callback(list(instances))
+
+    def _run(self):
+        next_beat = time.monotonic() + self.ttl / 3
+        next_collect = time.monotonic()
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                wake = min(next_beat, self._pending[0][0]) if self._pending else next_beat
+                if self._collectors:
+                    wake = min(wake, next_collect)
+                if wake > now:
+                    self._cond.wait(wake - now)
+                    continue
+                collect = bool(self._collectors) and now >= next_collect
+                due = []
+                while self._pending and self._pending[0][0] <= now:
+                    due.append(heapq.heappop(self._pending))
+            try:
+                if now >= next_beat:
+                    next_beat = now + self.ttl / 3
+                    self._heartbeat()
+                for _, _, message_id, callback in due:
+                    self._retry(message_id, callback)
+                if collect:
+                    next_collect = now + COLLECT_INTERVAL
+                    self._collect(now)
+            except Exception as e:
+                print("Coordinator error:", type(e).__name__, e)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "instance": self.instance_id,
+                "instances": len(self._instances),
+                "held": len(self._held),
+                "deferred": len(self._pending),
+                "collecting": len(self._collectors),
+            }
@@ -0,0 +1,111 @@
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+DEFAULT_WORKERS = 8
+
+
+class CommandDispatcher:
+    """
+    Runs commands on a shared worker pool with one FIFO queue per key
+    (the router IP). Different routers run in parallel; commands for the
+    same router run one at a time in the order they were submitted, so
+    create/enable sequences keep their meaning.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="dispatch"
+        )
+        self._lock = threading.Lock()
+        self._queues = {}  # key -> deque of (future, fn, args, kwargs)
+        self._running = set()  # keys that currently own a worker
+        self._in_flight = 0
+
+    def submit(self, key, fn, *args, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs) behind earlier work for the same key."""
+        future = Future()
+        with self._lock:
+            self._queues.setdefault(key, deque()).append((future, fn, args, kwargs))
+            start = key not in self._running
+            if start:
+                self._running.add(key)
+        if start:
+            self._executor.submit(self._run_next, key)
+        return future
+
+    def _run_next(self, key):
+        with self._lock:
+            queue = self._queues.get(key)
+            if not queue:
+                self._queues.pop(key, None)
+                self._running.discard(key)
+                return
+            future, fn, args, kwargs = queue.popleft()
+            self._in_flight += 1
+
+        try:
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                more = bool(self._queues.get(key))
+                if not more:
+                    self._queues.pop(key, None)
+                    self._running.discard(key)
+            # Re-queue instead of looping so one busy router cannot hog a worker
+            if more:
+                self._executor.submit(self._run_next, key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            per_key = {key: len(queue) for key, queue in self._queues.items() if queue}
+            return {
+                "queue_depth": sum(per_key.values()),
+                "in_flight": self._in_flight,
+                "per_router": per_key,
+                "workers": self.max_workers,
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+def when_all(futures) -> Future:
+    """
+    Return a Future that resolves to the list of results (or exceptions) of
+    `futures`, in the same order, once every one of them has finished.
+    Nothing blocks while waiting, so it is safe to call from a worker.
+    """
+    combined = Future()
+    futures = list(futures)
+    if not futures:
+        combined.set_result([])
+        return combined
+
+    lock = threading.Lock()
+    remaining = [len(futures)]
+
+    def _done(_):
+        with lock:
+            remaining[0] -= 1
+            finished = remaining[0] == 0
+        if finished:
+            results = []
+            for future in futures:
+                if future.cancelled():
+                    results.append(None)
+                elif future.exception() is not None:
+                    results.append(future.exception())
+                else:
+                    results.append(future.result())
+            combined.set_result(results)
+
+    for future in futures:
+        future.add_done_callback(_done)
+    return combined
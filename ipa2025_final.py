@@ -1,20 +1,38 @@
+import atexit
 import os
+import threading
 import time
-import json
+import uuid
+import argparse
+import functools
+import difflib
 import requests
 import dotenv
-from requests_toolbelt.multipart.encoder import MultipartEncoder
-import restconf_final as restconf
-import netconf_final as netconf
 import netmiko_final as netmiko
+import backends
+import bulk
+import coordination
+import metrics
+import tenants
+from profiler import CommandProfiler
+from tenants import Tenant
 import ansible_final as ansible
+from message_cursor import MessageCursor
+from webhook_server import WebhookServer
+from webex_outbox import WebexOutbox, retry_after
+from poll_schedule import PollSchedule
+from dispatcher import CommandDispatcher
+from job_store import JOBS_DB, QUEUED, RUNNING, JobStore
+from config_archive import ConfigArchive
+from state_cache import ABSENT, DISABLED, ENABLED, InterfaceStateCache
+from netconf_subscriber import InterfaceStateTable, InterfaceSubscriber
 
 dotenv.load_dotenv()
 
 # ---------------------------------------
 # 1) Config and helpers
 # ---------------------------------------
-STUDENT_ID = "66070101"
+STUDENT_ID = tenants.DEFAULT_STUDENT_ID
 
 # Allowed routers
 ALLOWED_IPS = {
@@ -25,18 +43,32 @@ ALLOWED_IPS = {
     "10.0.15.65",
 }
 
-# Methods
+# Commands that accept several routers at once ("all", comma list or range)
+FANOUT_TYPES = {"part1", "bulk", "gigabit_status", "motd_set", "motd_get"}
+
+# Commands whose backend follows the selected method (pinned when received)
+METHOD_TYPES = {"part1", "bulk"}
+
+# Methods: every registered backend, plus "auto" which picks the backend
+# with the best recent latency/success per router
 METHOD_RESTCONF = "restconf"
 METHOD_NETCONF = "netconf"
-METHOD_LABEL = {
-    METHOD_RESTCONF: "Restconf",
-    METHOD_NETCONF: "Netconf",
-}
-
-# Maintain selected method across commands
-current_method = None  # one of None, "restconf", "netconf"
+METHOD_NETMIKO = "netmiko"
+METHOD_AUTO = "auto"
+METHOD_LABEL = {name: backends.get_backend(name).label for name in backends.backend_names()}
+METHOD_LABEL[METHOD_AUTO] = "Auto"
+
+# Hedged status reads: also ask the other transport (RESTCONF <-> NETCONF)
+# when the first has not answered after STATUS_HEDGE_DELAY
+# (seconds, or a latency percentile like "p95"). STATUS_HEDGING is where every
+# tenant starts; "hedge on|off" changes it for one tenant
+STATUS_HEDGING = os.environ.get("STATUS_HEDGING", "0") == "1"
+STATUS_HEDGE_DELAY = os.environ.get("STATUS_HEDGE_DELAY", "p95")
+if STATUS_HEDGE_DELAY.replace(".", "", 1).isdigit():
+    STATUS_HEDGE_DELAY = float(STATUS_HEDGE_DELAY)
 
 # Webex
+WEBEX_API_URL = os.environ.get("WEBEX_API_URL", "https://webexapis.com/v1")
 ACCESS_TOKEN = os.environ.get("ACCESS_TOKEN")
 if not ACCESS_TOKEN:
     raise RuntimeError("ACCESS_TOKEN is not set in environment variables.")
@@ -45,32 +77,166 @@ roomIdToGetMessages = (
     "Y2lzY29zcGFyazovL3VybjpURUFNOnVzLXdlc3QtMl9yL1JPT00vYmQwODczMTAtNmMyNi0xMWYwLWE1MWMtNzkzZDM2ZjZjM2Zm"
 )
 
+# Tenants: one per room and "/<student_id>" prefix, each with its own
+# selected method and default router, loaded from the JSON file named by
+# TENANTS_FILE (see tenants.load). Without it the bot serves STUDENT_ID in
+# roomIdToGetMessages. Pools, workers and caches are shared by all tenants.
+TENANTS_FILE = os.environ.get("TENANTS_FILE")
+tenant_registry = tenants.load(
+    TENANTS_FILE, Tenant("default", roomIdToGetMessages, STUDENT_ID, hedging=STATUS_HEDGING)
+)
+
+# Incremental ingestion: remember what was already processed across restarts
+# (one cursor per room; other rooms than the default one get the name of
+# their first tenant added, e.g. .webex_cursor.alice.json)
+CURSOR_FILE = os.environ.get("WEBEX_CURSOR_FILE", ".webex_cursor.json")
+MESSAGES_PAGE_SIZE = 50
+
+# Polling: POLL_MIN_INTERVAL while the room is active, backing off to
+# POLL_MAX_INTERVAL when idle (seconds)
+POLL_MIN_INTERVAL = float(os.environ.get("POLL_MIN_INTERVAL", "1"))
+POLL_MAX_INTERVAL = float(os.environ.get("POLL_MAX_INTERVAL", "10"))
+
+# Keep-alive session for reads from the Webex API (replies go via the outbox)
+WEBEX_TIMEOUT = (5, 15)  # connect, read seconds
+webex_session = requests.Session()
+webex_session.headers["Authorization"] = f"Bearer {ACCESS_TOKEN}"
+
+# Worker pool for device commands (parallel across routers, ordered per router)
+DISPATCH_WORKERS = int(os.environ.get("DISPATCH_WORKERS", "8"))
+dispatcher = CommandDispatcher(max_workers=DISPATCH_WORKERS)
+
+# Scale-out (opt-in): bot processes that share COORDINATION_DB, a SQLite file
+# on this host, split the work. Routers are partitioned among the live
+# instances (a command on several routers is split into one part per
+# router); the owner claims a message with a lease and the others take it
+# over only if it is not claimed within HANDOFF_DELAY (keep it above the
+# polling lag) or the claim expires (LEASE_TTL). Every instance keeps its own
+# cursor and job files, named after INSTANCE_ID: it must be set, and kept
+# across restarts, so a restarted instance finds its unfinished jobs again.
+COORDINATION_DB = os.environ.get("COORDINATION_DB")
+LEASE_TTL = float(os.environ.get("LEASE_TTL", coordination.LEASE_TTL))
+HANDOFF_DELAY = float(os.environ.get("HANDOFF_DELAY", 2 * POLL_MAX_INTERVAL))
+if COORDINATION_DB:
+    if not os.environ.get("INSTANCE_ID"):
+        raise RuntimeError("INSTANCE_ID must be set (and stay the same) with COORDINATION_DB.")
+    lease_store = coordination.SqliteLeaseStore(COORDINATION_DB)
+    CURSOR_FILE = coordination.instance_path(CURSOR_FILE)
+    JOBS_DB = coordination.instance_path(JOBS_DB)
+else:
+    # Single instance: it owns every router and wins every claim
+    lease_store = coordination.MemoryLeaseStore()
+coordinator = coordination.Coordinator(lease_store, ttl=LEASE_TTL, handoff_delay=HANDOFF_DELAY)
+# Commands that change session state: applied by every instance, answered by one
+SESSION_TYPES = {"set_method", "hedge", "set_router"}
+# Seconds a multi-router command waits for every router's result before replying
+FANOUT_TIMEOUT = float(os.environ.get("FANOUT_TIMEOUT", "300"))
+
+# Every received command is a job in a SQLite queue (JOBS_DB), so what was
+# running or not yet replied when the bot stopped is known after a restart
+jobs = JobStore(JOBS_DB)
+WORKER_ID = coordination.INSTANCE_ID
+INTERRUPTED_REPLY = "Error: Interrupted by a restart; check the current state before retrying"
+
+# Interface state cache for status (write-through from our own changes)
+STATE_CACHE_TTL = float(os.environ.get("STATE_CACHE_TTL", "30"))
+state_cache = InterfaceStateCache(ttl=STATE_CACHE_TTL)
+
+# Live interface state kept current by per-router NETCONF subscribers
+# (opt-in: NETCONF_SUBSCRIBE=1; poll interval in seconds when notifications don't cover it)
+NETCONF_SUBSCRIBE = os.environ.get("NETCONF_SUBSCRIBE", "0") == "1"
+NETCONF_SUBSCRIBE_INTERVAL = float(os.environ.get("NETCONF_SUBSCRIBE_INTERVAL", "10"))
+interface_table = InterfaceStateTable(stale_after=3 * NETCONF_SUBSCRIBE_INTERVAL)
+subscribers = {}  # ip -> InterfaceSubscriber, only for routers this instance owns
+_subscribers_lock = threading.Lock()
+
+# Running-config snapshots (content-addressed, per router)
+archive = ConfigArchive()
+# Longest diff posted inline; bigger diffs are attached as a file
+MAX_INLINE_DIFF = 7000
+
+# Webhook mode (alternative to polling)
+WEBHOOK_HOST = os.environ.get("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.environ.get("WEBHOOK_PORT", "8080"))
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET")
+
+# Per-stage latency histograms, served as Prometheus text on
+# http://METRICS_HOST:METRICS_PORT/metrics (METRICS_PORT=0 turns it off)
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9108"))
+# Sampling profiler: profile this fraction of commands (0 = off) and write
+# one flamegraph-readable file per profiled command into PROFILE_DIR
+PROFILE_RATE = float(os.environ.get("PROFILE_RATE", "0"))
+PROFILE_MODE = os.environ.get("PROFILE_MODE", "sample")  # sample | cprofile
+profiler = CommandProfiler(rate=PROFILE_RATE, mode=PROFILE_MODE)
+
+# Outgoing replies are posted by a background worker (one pooled session,
+# Retry-After and backoff on errors); WEBEX_COALESCE=0 keeps every reply a
+# separate message instead of joining bursts of short ones per room
+WEBEX_COALESCE = os.environ.get("WEBEX_COALESCE", "1") == "1"
+outbox = WebexOutbox(WEBEX_API_URL, ACCESS_TOKEN, coalesce=WEBEX_COALESCE)
+atexit.register(outbox.close)
+
+# Label value per command type that always uses the same tool
+FIXED_METHOD = {
+    "showrun": "ansible",
+    "motd_set": "ansible",
+    "motd_get": "netmiko",
+    "gigabit_status": "netmiko",
+}
+
 
 def post_message_to_webex(room_id: str, message: str):
-    r = requests.post(
-        "https://webexapis.com/v1/messages",
-        headers={
-            "Authorization": f"Bearer {ACCESS_TOKEN}",
-            "Content-Type": "application/json",
-        },
-        data=json.dumps({"roomId": room_id, "markdown": message}),
-    )
-    return r
+    """Queue a reply; returns a Future with the Webex response."""
+    return outbox.send_text(room_id, message)
 
 
 # ---------------------------------------
 # 2) Utility checks and formatters
 # ---------------------------------------
+def _check_tenants():
+    for tenant in tenant_registry:
+        if tenant.method is not None and tenant.method not in METHOD_LABEL:
+            raise RuntimeError(f"Tenant {tenant.name}: unknown method {tenant.method}")
+        if tenant.default_router is not None and tenant.default_router not in ALLOWED_IPS:
+            raise RuntimeError(
+                f"Tenant {tenant.name}: router not allowed ({tenant.default_router})"
+            )
+
+
+def _tenant() -> Tenant:
+    """Tenant of the command being handled (the default one otherwise)."""
+    return tenants.current() or tenant_registry.default
+
+
 def set_method(method_str: str):
-    global current_method
-    if method_str not in (METHOD_RESTCONF, METHOD_NETCONF):
+    if method_str not in METHOD_LABEL:
         return "Error: No method specified"
-    current_method = method_str
-    return f"Ok: {METHOD_LABEL[current_method]}"
+    _tenant().method = method_str
+    return f"Ok: {METHOD_LABEL[method_str]}"
+
+
+def set_default_router(ip: str):
+    """'router <ip>' makes <ip> the target of commands given without one."""
+    if ip == "none":
+        _tenant().default_router = None
+        return "Ok: No default router"
+    err = ensure_ip_provided(ip)
+    if err:
+        return err
+    _tenant().default_router = ip
+    return f"Ok: Default router {ip}"
 
 
-def ensure_method_selected():
-    if not current_method:
+def set_hedging(value: str):
+    if value not in ("on", "off"):
+        return "Error: Use 'hedge on' or 'hedge off'"
+    _tenant().hedging = value == "on"
+    return f"Ok: Hedged status {value}"
+
+
+def ensure_method_selected(method: str | None = None):
+    if not (method or _tenant().method):
         return "Error: No method specified"
     return None
 
@@ -86,8 +252,8 @@ def ensure_ip_provided(ip: str | None):
 def _append_method_suffix(base_msg: str, cmd: str, method_key: str) -> str:
     """
     Append method suffix per requirement:
-      - create/delete/enable/disable: "... using Restconf/Netconf"
-      - status: "... (checked by Restconf/Netconf)"
+      - create/delete/enable/disable: "... using Restconf/Netconf/Netmiko"
+      - status: "... (checked by Restconf/Netconf/Netmiko)"
     Do not duplicate suffix if already present.
     """
     label = METHOD_LABEL.get(method_key, method_key)
@@ -104,64 +270,187 @@ def _append_method_suffix(base_msg: str, cmd: str, method_key: str) -> str:
 # ---------------------------------------
 # 3) Command handlers
 # ---------------------------------------
-def handle_part1_command(cmd: str, ip: str | None) -> str:
+def handle_part1_command(
+    cmd: str, ip: str | None, method: str | None = None, fresh: bool = False
+) -> str:
     """
-    Dispatch create/delete/enable/disable/status to restconf/netconf
-    based on current_method and append the method suffix.
+    Dispatch create/delete/enable/disable/status through the backend
+    registry based on `method` (default: the tenant's method) and append the
+    method suffix.
+    status is answered from the state cache while the entry is fresh,
+    unless `fresh` forces a device read; the suffix then names the backend
+    that produced the cached state, not the selected method.
     """
-    err = ensure_method_selected()
+    err = ensure_method_selected(method)
     if err:
         return err
+    method = method or _tenant().method
 
     err = ensure_ip_provided(ip)
     if err:
         return err
 
-    try:
-        if current_method == METHOD_RESTCONF:
-            if cmd == "create":
-                msg = restconf.create(ip=ip)
-            elif cmd == "delete":
-                msg = restconf.delete(ip=ip)
-            elif cmd == "enable":
-                msg = restconf.enable(ip=ip)
-            elif cmd == "disable":
-                msg = restconf.disable(ip=ip)
-            elif cmd == "status":
-                msg = restconf.status(ip=ip)
-            else:
-                return "Error: No command found."
-            return _append_method_suffix(msg, cmd, current_method)
-
-        elif current_method == METHOD_NETCONF:
-            if cmd == "create":
-                msg = netconf.create(ip=ip)
-            elif cmd == "delete":
-                msg = netconf.delete(ip=ip)
-            elif cmd == "enable":
-                msg = netconf.enable(ip=ip)
-            elif cmd == "disable":
-                msg = netconf.disable(ip=ip)
-            elif cmd == "status":
-                msg = netconf.status(ip=ip)
-            else:
-                return "Error: No command found."
-            return _append_method_suffix(msg, cmd, current_method)
+    if cmd == "status" and not fresh:
+        state, source = state_cache.lookup(ip, _tenant().loopback)
+        if not state:
+            # The subscriber table is fed over NETCONF
+            state, source = _subscribed_state(ip), METHOD_NETCONF
+        if state:
+            return _append_method_suffix(_status_message(state), cmd, source)
 
+    msg, backend_name = _run_part1_command(cmd, ip, method)
+    _update_state_cache(cmd, ip, msg, backend_name)
+    subscriber = subscribers.get(ip)
+    if cmd != "status" and subscriber:
+        subscriber.refresh_soon()
+    return msg
+
+
+def handle_bulk(action: str, ip: str | None, numbers: list, method: str | None = None) -> str:
+    """
+    create/delete/enable/disable a list of loopbacks with one request on
+    the selected backend and report the outcome per interface.
+    """
+    err = ensure_method_selected(method)
+    if err:
+        return err
+    method = method or _tenant().method
+
+    err = ensure_ip_provided(ip)
+    if err:
+        return err
+
+    backend_name = method
+    if method == METHOD_AUTO:
+        backend_name = backends.choose(ip, backends.bulk_backend_names())
+        backends.explore(ip, backends.bulk_backend_names())
+    backend = backends.get_backend(backend_name)
+    if backend is None:
+        return "Error: No method specified"
+    if backend.bulk is None:
+        return f"Error: Bulk operations are not supported by {backend.label}"
+
+    names = [bulk.loopback_name(n) for n in numbers]
+    try:
+        outcomes = backends.call_bulk(backend_name, action, ip, names)
     except Exception as e:
         return f"Error: {type(e).__name__}: {e}"
 
-    return "Error: No command found."
+    # The range may include part-1 loopbacks: don't trust their cached state
+    for name in names:
+        state_cache.invalidate(ip, name)
+    subscriber = subscribers.get(ip)
+    if subscriber:
+        subscriber.refresh_soon()
+    return bulk.summarize(action, numbers, outcomes, backend.label)
+
+
+def _subscribed_state(ip: str) -> str | None:
+    """Loopback state from the subscriber table, None if not tracked/stale."""
+    tracked, iface = interface_table.lookup(ip, _tenant().loopback)
+    if not tracked:
+        return None
+    if iface is None:
+        return ABSENT
+    # Same rule as the status functions: any "down" means disabled
+    if iface.get("admin") == "down" or iface.get("oper") == "down":
+        return DISABLED
+    return ENABLED
+
+
+def _status_message(state: str) -> str:
+    student_id = _tenant().student_id
+    if state == ABSENT:
+        return f"No Interface loopback {student_id}"
+    return f"Interface loopback {student_id} is {state}"
+
+
+def _update_state_cache(cmd: str, ip: str, msg: str, backend_name: str):
+    """Write-through: record the state our own successful calls produced."""
+    new_state = None
+    if "successfully" in msg:
+        new_state = {
+            "create": ENABLED,
+            "delete": ABSENT,
+            "enable": ENABLED,
+            "disable": DISABLED,
+        }.get(cmd)
+    elif cmd == "status":
+        if msg.startswith("No Interface"):
+            new_state = ABSENT
+        elif " is enabled" in msg:
+            new_state = ENABLED
+        elif " is disabled" in msg:
+            new_state = DISABLED
+
+    if new_state:
+        state_cache.put(ip, _tenant().loopback, new_state, backend_name)
+    else:
+        # Failed or unknown outcome: the next status must ask the router
+        state_cache.invalidate(ip, _tenant().loopback)
+
+
+def _run_part1_command(cmd: str, ip: str, method: str) -> tuple:
+    """(reply, backend that answered it)"""
+    if cmd not in backends.OPERATIONS:
+        return "Error: No command found.", method
+
+    # "auto" resolves to a concrete backend per router; report the one used
+    backend_name = method
+    if method == METHOD_AUTO:
+        backend_name = backends.choose(ip)
+        backends.explore(ip)
+    if backends.get_backend(backend_name) is None:
+        return "Error: No method specified", backend_name
+
+    try:
+        if cmd == "status" and _tenant().hedging and backend_name in backends.HEDGE_PAIRS:
+            msg, backend_name = backends.hedged_call(
+                backend_name, cmd, ip, delay=STATUS_HEDGE_DELAY
+            )
+        else:
+            msg = backends.call(backend_name, cmd, ip)
+    except Exception as e:
+        return f"Error: {type(e).__name__}: {e}", backend_name
+    return _append_method_suffix(msg, cmd, backend_name), backend_name
+
+
+def _upload_file(filename: str, text: str) -> bool:
+    """Queue a text file for the room. Returns False if it cannot be read."""
+    try:
+        with open(filename, "rb") as f:
+            content = f.read()
+    except OSError as e:
+        print("Attach file failed:", e)
+        return False
+    outbox.send_file(_tenant().room_id, os.path.basename(filename), text, content)
+    return True
 
 
-def handle_showrun(ip: str | None):
+def handle_showrun(ip: str | None, max_age: float | None = None):
     """
     Call ansible.showrun(ip) which returns:
       - a filename (string) on success
       - or 'Error: ...'
-    If filename, attach it to Webex and return None (since we posted already).
+    The fetched config is stored in the archive. When max_age is given and
+    the archive has a snapshot of this router younger than that, it is
+    served instead of fetching again.
+    If a file was attached to Webex return None (since we posted already).
     If Error, return the error string to be posted as text.
     """
+    err = ensure_ip_provided(ip)
+    if err:
+        return err
+
+    if max_age is not None:
+        entry = archive.latest(ip, max_age=max_age)
+        if entry:
+            filename = archive.export(entry, ansible.showrun_filename(ip))
+            age = int(time.time() - entry["ts"])
+            if _upload_file(filename, f"show running config (snapshot {age}s old)"):
+                return None
+            return "Error: Ansible"
+
     try:
         result = ansible.showrun(ip=ip)
     except Exception as e:
@@ -172,30 +461,62 @@ def handle_showrun(ip: str | None):
 
     filename = result
     try:
-        with open(filename, "rb") as f:
-            m = MultipartEncoder(
-                fields={
-                    "roomId": roomIdToGetMessages,
-                    "text": "show running config",
-                    "files": (os.path.basename(filename), f, "text/plain"),
-                }
-            )
-            headers = {
-                "Authorization": f"Bearer {ACCESS_TOKEN}",
-                "Content-Type": m.content_type,
-            }
-            r = requests.post(
-                "https://webexapis.com/v1/messages",
-                data=m,
-                headers=headers,
-            )
-            if r.status_code != 200:
-                print("Webex POST failed:", r.status_code, r.text)
-                return "Error: Ansible"
+        archive.put_file(ip, filename)
     except Exception as e:
-        print("Attach file failed:", e)
+        print("Archiving running-config failed:", e)
+
+    if not _upload_file(filename, "show running config"):
         return "Error: Ansible"
+    return None
+
 
+def _snapshot_time(entry: dict) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["ts"]))
+
+
+def handle_showrun_diff(ip: str | None):
+    """
+    Fetch the running-config, archive it and reply with a unified diff
+    against the previous snapshot of the same router.
+    """
+    err = ensure_ip_provided(ip)
+    if err:
+        return err
+
+    previous = archive.latest(ip)
+    try:
+        result = ansible.showrun(ip=ip)
+    except Exception as e:
+        result = f"Error: {type(e).__name__}: {e}"
+    if not result or result.startswith("Error:"):
+        return result or "Error: Ansible"
+
+    current = archive.put_file(ip, result)
+
+    if previous is None:
+        if not _upload_file(result, f"No previous snapshot of {ip}; full running config attached"):
+            return "Error: Ansible"
+        return None
+
+    if previous["hash"] == current["hash"]:
+        return f"No changes in running config of {ip} since {_snapshot_time(previous)}"
+
+    diff = "".join(
+        difflib.unified_diff(
+            archive.read(previous).splitlines(keepends=True),
+            archive.read(current).splitlines(keepends=True),
+            fromfile=f"{ip} {_snapshot_time(previous)}",
+            tofile=f"{ip} {_snapshot_time(current)}",
+        )
+    )
+    if len(diff) <= MAX_INLINE_DIFF:
+        return f"Running config changes on {ip}:\n```diff\n{diff}```"
+
+    filename = f"show_run_{_tenant().student_id}_{ip}.diff"
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(diff)
+    if not _upload_file(filename, f"Running config changes on {ip}"):
+        return "Error: Ansible"
     return None
 
 
@@ -227,6 +548,68 @@ def handle_motd_get(ip: str | None) -> str:
 # ---------------------------------------
 # 4) Parser
 # ---------------------------------------
+def _ip_sort_key(ip: str):
+    try:
+        return tuple(int(octet) for octet in ip.split("."))
+    except ValueError:
+        return (ip,)
+
+
+def _parse_duration(token: str) -> float | None:
+    """'300' / '300s' / '5m' / '1h' -> seconds, None if invalid."""
+    units = {"s": 1, "m": 60, "h": 3600}
+    scale = 1
+    if token and token[-1].lower() in units:
+        scale = units[token[-1].lower()]
+        token = token[:-1]
+    if not token.isdigit():
+        return None
+    return float(int(token) * scale)
+
+
+def _expand_targets(token: str) -> list | None:
+    """
+    Expand a multi-router target, or return None for a plain single IP.
+      all                         -> every allowed router
+      10.0.15.61,10.0.15.63       -> listed routers
+      10.0.15.61-63               -> last-octet range
+      10.0.15.61-10.0.15.65       -> full range
+    Raises ValueError when a range is invalid or a target is not an allowed
+    router, so one bad target rejects the whole command.
+    """
+    if token == "all":
+        return sorted(ALLOWED_IPS, key=_ip_sort_key)
+    if "," not in token and "-" not in token:
+        return None
+
+    targets = []
+    for item in token.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if "-" in item:
+            start, end = item.split("-", 1)
+            prefix, _, first = start.rpartition(".")
+            last = end.rpartition(".")[2]
+            if not (prefix and first.isdigit() and last.isdigit()):
+                return None
+            if "." in end and end.rpartition(".")[0] != prefix:
+                return None
+            # Bounds first: a range is at most one octet wide
+            if int(first) > int(last) or int(last) > 255:
+                raise ValueError(f"Invalid range ({item})")
+            for octet in range(int(first), int(last) + 1):
+                targets.append(f"{prefix}.{octet}")
+        else:
+            targets.append(item)
+
+    for ip in targets:
+        if ip not in ALLOWED_IPS:
+            raise ValueError(f"IP not allowed ({ip})")
+    # Keep first occurrence order, drop duplicates
+    return list(dict.fromkeys(targets)) or None
+
+
 def parse_command(text: str):
     """
     After removing leading '/<student_id> ', parse command.
@@ -234,24 +617,65 @@ def parse_command(text: str):
     Supported:
     - restconf
     - netconf
+    - netmiko
+    - auto                    -> best backend per router by recent latency/success
+    - hedge on|off            -> hedge status reads across RESTCONF/NETCONF
+    - router <ip>|none        -> default router for commands given without an IP
     - <ip> <action> where action in {create, delete, enable, disable, status}
     - <action>                -> error: missing IP (handled later)
     - <ip> gigabit_status
     - gigabit_status          -> error: missing IP
     - <ip> showrun
+    - <ip> showrun <max-age>  -> archived snapshot if younger than max-age
+    - <ip> showrun diff       -> unified diff against the previous snapshot
     - showrun                 -> error: missing IP
     - <ip> motd <message...>  -> set motd via ansible
     - <ip> motd               -> get motd via netmiko
-    - lone IP                 -> "Error: No command found."
+    - lone IP or target list  -> "Error: No command found."
+    - <ip> status fresh       -> status read from the device, not the cache
+    - <ip> <create|delete|enable|disable> <100-199|100,105,...>
+                              -> many loopbacks in one request, reported per interface
+    - <create|...> <100-199>  -> same, on the default router (error without one)
+    - queue                   -> dispatcher queue depth / in-flight counts
+    - cache                   -> state cache hit/miss counters
+    - <all|ip,ip|ip-range> <part1 action|gigabit_status|motd ...>
+                              -> same command on several routers, one reply
     """
     parts = text.strip().split()
     if not parts:
         return {"type": "error", "message": "Error: No command or unknown command"}
 
     # Method selection
-    if parts[0] in (METHOD_RESTCONF, METHOD_NETCONF) and len(parts) == 1:
+    if parts[0] in METHOD_LABEL and len(parts) == 1:
         return {"type": "set_method", "method": parts[0]}
 
+    # Hedged status reads on/off
+    if parts[0] == "hedge" and len(parts) == 2:
+        return {"type": "hedge", "value": parts[1]}
+
+    # Default router of this tenant
+    if parts[0] == "router" and len(parts) == 2:
+        return {"type": "set_router", "router": parts[1]}
+
+    # Several routers at once: "<all|ip,ip|ip-range> <command...>"
+    try:
+        targets = _expand_targets(parts[0])
+    except ValueError as e:
+        return {"type": "error", "message": f"Error: {e}"}
+    # Targets only -> same explicit error as a lone IP
+    if targets is not None and len(parts) == 1:
+        return {"type": "error", "message": "Error: No command found."}
+    if targets is not None:
+        command = parse_command(" ".join([targets[0]] + parts[1:]))
+        if command["type"] not in FANOUT_TYPES:
+            if command["type"] == "error":
+                return command
+            return {
+                "type": "error",
+                "message": f"Error: {parts[1]} does not support multiple routers",
+            }
+        return {"type": "fanout", "targets": targets, "command": command}
+
     # Single IP only -> explicit error per requirement
     if len(parts) == 1 and parts[0] in ALLOWED_IPS:
         return {"type": "error", "message": "Error: No command found."}
@@ -259,6 +683,15 @@ def parse_command(text: str):
     # Showrun requires IP now: "<ip> showrun"
     if len(parts) == 2 and parts[1] == "showrun":
         return {"type": "showrun", "ip": parts[0]}
+    # "<ip> showrun diff" -> only what changed since the previous snapshot
+    if len(parts) == 3 and parts[1] == "showrun" and parts[2] == "diff":
+        return {"type": "showrun", "ip": parts[0], "diff": True}
+    # "<ip> showrun <max-age>" -> archived snapshot is fine if young enough
+    if len(parts) == 3 and parts[1] == "showrun":
+        max_age = _parse_duration(parts[2])
+        if max_age is None:
+            return {"type": "error", "message": "Error: Invalid max age (e.g. 300, 90s, 5m, 1h)"}
+        return {"type": "showrun", "ip": parts[0], "max_age": max_age}
     if len(parts) == 1 and parts[0] == "showrun":
         return {"type": "showrun", "ip": None}
 
@@ -271,6 +704,12 @@ def parse_command(text: str):
     if len(parts) == 2 and parts[1] == "motd":
         return {"type": "motd_get", "ip": parts[0]}
 
+    # Dispatcher / state cache statistics
+    if len(parts) == 1 and parts[0] == "queue":
+        return {"type": "queue"}
+    if len(parts) == 1 and parts[0] == "cache":
+        return {"type": "cache"}
+
     # Part1 actions
     part1_actions = {"create", "delete", "enable", "disable", "status"}
 
@@ -278,9 +717,28 @@ def parse_command(text: str):
     if len(parts) == 2 and parts[1] in part1_actions:
         return {"type": "part1", "ip": parts[0], "action": parts[1]}
 
+    # Case: "<ip> <create|delete|enable|disable> <loopback list>" -> bulk
+    if len(parts) == 3 and parts[1] in bulk.ACTIONS and bulk.is_spec(parts[2]):
+        try:
+            numbers = bulk.parse_numbers(parts[2])
+        except ValueError as e:
+            return {"type": "error", "message": f"Error: {e}"}
+        return {"type": "bulk", "ip": parts[0], "action": parts[1], "numbers": numbers}
+
+    # Case: "<ip> status fresh" -> skip the state cache
+    if len(parts) == 3 and parts[1] == "status" and parts[2] == "fresh":
+        return {"type": "part1", "ip": parts[0], "action": "status", "fresh": True}
+
     # Case: "<action>" (missing IP)
     if len(parts) == 1 and parts[0] in part1_actions:
         return {"type": "part1", "ip": None, "action": parts[0]}
+    # Case: "<create|delete|enable|disable> <loopback list>" (missing IP)
+    if len(parts) == 2 and parts[0] in bulk.ACTIONS and bulk.is_spec(parts[1]):
+        try:
+            numbers = bulk.parse_numbers(parts[1])
+        except ValueError as e:
+            return {"type": "error", "message": f"Error: {e}"}
+        return {"type": "bulk", "ip": None, "action": parts[0], "numbers": numbers}
 
     # Netmiko gigabit_status expects IP: "<ip> gigabit_status"
     if len(parts) == 2 and parts[1] == "gigabit_status":
@@ -292,80 +750,594 @@ def parse_command(text: str):
 
 
 # ---------------------------------------
-# 5) Main loop
+# 5) Execution and ingestion
 # ---------------------------------------
-def main():
-    while True:
-        # Rate-limit polling
-        time.sleep(1)
-
-        # GET latest message
-        get_params = {"roomId": roomIdToGetMessages, "max": 1}
-        get_headers = {"Authorization": f"Bearer {ACCESS_TOKEN}"}
-        r = requests.get(
-            "https://webexapis.com/v1/messages",
-            params=get_params,
-            headers=get_headers,
+def execute_command(parsed: dict):
+    """
+    Run a parsed command and return the text reply,
+    or None when the handler already posted to Webex (showrun).
+    """
+    if parsed["type"] == "set_method":
+        return set_method(parsed["method"])
+
+    if parsed["type"] == "hedge":
+        return set_hedging(parsed["value"])
+
+    if parsed["type"] == "set_router":
+        return set_default_router(parsed["router"])
+
+    if parsed["type"] == "part1":
+        return handle_part1_command(
+            parsed["action"],
+            parsed.get("ip"),
+            parsed.get("method"),
+            fresh=parsed.get("fresh", False),
+        )
+
+    if parsed["type"] == "bulk":
+        return handle_bulk(
+            parsed["action"], parsed.get("ip"), parsed["numbers"], parsed.get("method")
+        )
+
+    if parsed["type"] == "cache":
+        stats = state_cache.stats()
+        return (
+            f"Cache: {stats['hits']} hits, {stats['misses']} misses"
+            f" ({stats['entries']} entries, TTL {stats['ttl']:g}s)"
         )
-        if r.status_code != 200:
-            raise Exception(
-                f"Incorrect reply from Webex Teams API. Status code: {r.status_code}"
+
+    if parsed["type"] == "queue":
+        stats = dispatcher.stats()
+        counts = jobs.stats()
+        reply = (
+            f"Queue: {stats['queue_depth']} queued, {stats['in_flight']} in flight"
+            f" ({stats['workers']} workers); jobs: {counts[QUEUED]} queued,"
+            f" {counts[RUNNING]} running"
+        )
+        if COORDINATION_DB:
+            shared = coordinator.stats()
+            reply += (
+                f"; instance {shared['instance']} of {shared['instances']}"
+                f" ({shared['held']} claimed, {shared['deferred']} deferred)"
             )
+        return reply
 
-        json_data = r.json()
-        if len(json_data.get("items", [])) == 0:
-            raise Exception("There are no messages in the room.")
+    if parsed["type"] == "gigabit_status":
+        summary = interface_table.gigabit_summary(parsed.get("ip"))
+        if summary:
+            return summary
+        try:
+            return netmiko.gigabit_status(ip=parsed.get("ip"))
+        except Exception as e:
+            return f"Error: {type(e).__name__}: {e}"
 
-        messages = json_data["items"]
-        message = messages[0].get("text", "")
-        print("Received message: " + str(message))
+    if parsed["type"] == "showrun":
+        if parsed.get("diff"):
+            return handle_showrun_diff(parsed.get("ip"))
+        return handle_showrun(parsed.get("ip"), parsed.get("max_age"))
 
-        prefix = f"/{STUDENT_ID} "
-        if not message.startswith(prefix):
-            continue
+    if parsed["type"] == "motd_set":
+        return handle_motd_set(parsed.get("ip"), parsed.get("message"))
 
-        # Extract the command text after "/<id> "
-        command_text = message[len(prefix) :]
+    if parsed["type"] == "motd_get":
+        return handle_motd_get(parsed.get("ip"))
 
+    if parsed["type"] == "error":
+        return parsed["message"]
+
+    return "Error: No command or unknown command"
+
+
+def process_message(message: str, room_id: str | None = None, message_id: str | None = None):
+    """
+    Handle one chat message from `room_id` (default: the default tenant's
+    room): find the tenant whose "/<student_id> " prefix it starts with,
+    parse it, and run it as a job if this instance gets the claim.
+    A multi-router command becomes one part per router, each claimed by
+    that router's owner, plus a job that posts the combined reply.
+    Returns the dispatcher Future for device commands, otherwise None.
+    """
+    tenant, command_text = tenant_registry.match(
+        room_id or tenant_registry.default.room_id, message
+    )
+    if tenant is None:
+        return
+
+    with tenants.use(tenant):
+        start = time.perf_counter()
         parsed = parse_command(command_text)
-        response_message = None
+        # Commands given without an IP go to the tenant's default router
+        if "ip" in parsed and parsed["ip"] is None and tenant.default_router:
+            parsed["ip"] = tenant.default_router
+        # Pin the method chosen at the time the command was received
+        command = parsed["command"] if parsed["type"] == "fanout" else parsed
+        if command["type"] in METHOD_TYPES:
+            command["method"] = tenant.method
+        metrics.observe("parse", time.perf_counter() - start, **_command_labels(parsed))
+
+        message_id = message_id or f"local-{uuid.uuid4().hex}"
+        if parsed["type"] == "fanout":
+            parsed["message_id"] = message_id
+            for ip in parsed["targets"]:
+                part = dict(parsed["command"], ip=ip, fanout_of=message_id)
+                claim_or_defer(_part_id(message_id, ip), part, tenant)
+        return claim_or_defer(message_id, parsed, tenant)
+
+
+def claim_or_defer(message_id: str, parsed: dict, tenant: Tenant):
+    """
+    Start a job for the message if this instance owns it and gets the
+    claim; otherwise leave it to the owner and try to claim it after the
+    handoff delay, in case the owner is gone.
+    """
+    claim = None
+    if coordinator.is_owner(_owner_key(parsed, message_id)):
+        claim = coordinator.claim(message_id)
+    if claim:
+        return start_job(message_id, parsed, tenant, claim)
+
+    reply = None
+    if parsed["type"] in SESSION_TYPES:
+        # Keep session state in step with the instance that answers
+        reply = execute_command(parsed)
+    coordinator.defer(
+        message_id, functools.partial(start_job, message_id, parsed, tenant, reply=reply)
+    )
+    return None
 
-        if parsed["type"] == "set_method":
-            response_message = set_method(parsed["method"])
 
-        elif parsed["type"] == "part1":
-            response_message = handle_part1_command(
-                parsed["action"], parsed.get("ip")
-            )
+def _owner_key(parsed: dict, message_id: str) -> str:
+    """Device commands belong to their router's owner, the rest are spread by message."""
+    ip = parsed.get("ip")
+    if parsed["type"] != "fanout" and ip in ALLOWED_IPS:
+        return ip
+    return message_id
+
+
+def _part_id(message_id: str, ip: str) -> str:
+    """Message id under which one router's part of a fanout is claimed."""
+    return f"{message_id}@{ip}"
+
+
+def start_job(
+    message_id: str, parsed: dict, tenant: Tenant, claim: str, reply: str | None = None
+):
+    """
+    Store a claimed message as a job and run it. `reply` is passed for
+    session commands that were already applied on arrival: the job only
+    posts it.
+    """
+    with tenants.use(tenant):
+        job_id = jobs.add(
+            message_id, tenant.room_id, tenant.student_id, parsed, router=parsed.get("ip")
+        )
+        if job_id is None:
+            print("Message already has a job, skipped:", message_id)
+            return None
+        if reply is None and claim == coordination.TAKEOVER and not _replayable(parsed):
+            # Claimed by an instance that stopped before finishing it
+            print("Message", message_id, "was interrupted on another instance")
+            reply = INTERRUPTED_REPLY
+        if reply is not None:
+            jobs.claim(job_id, WORKER_ID)
+            close_job(job_id, parsed, tenant.room_id, reply)
+            return None
+        return submit_job(job_id, parsed, tenant)
+
+
+def finish_job(job_id: int, reply: str | None):
+    """Close a job and keep its message claimed so no instance runs it again."""
+    message_id = jobs.finish(job_id, reply)
+    if message_id:
+        coordinator.done(message_id)
+
+
+def close_job(job_id: int, parsed: dict, room_id: str, reply: str | None):
+    """
+    Finish a job with its reply: posted to the room or, for one router's
+    part of a fanout, kept with its lease for the job that posts the
+    combined reply (possibly on another instance).
+    """
+    if parsed.get("fanout_of"):
+        message_id = jobs.finish(job_id, None)
+        if message_id:
+            coordinator.done(message_id, result=reply or "")
+        return
+    finish_job(job_id, reply)
+    if reply:
+        post_reply(job_id, room_id, reply)
+
+
+def submit_job(job_id: int, parsed: dict, tenant: Tenant):
+    """
+    Start a stored job. Device work goes to the dispatcher, keyed by router
+    so commands for the same router stay in order; everything else is
+    answered inline.
+    """
+    if parsed["type"] == "fanout":
+        return dispatch_fanout(job_id, parsed, tenant)
+
+    ip = parsed.get("ip")
+    if ip in ALLOWED_IPS and parsed["type"] != "error":
+        future = dispatcher.submit(ip, run_job, job_id, parsed, tenant)
+        future.add_done_callback(_log_dispatch_failure)
+        return future
+
+    run_job(job_id, parsed, tenant)
+    return None
+
+
+def run_job(job_id: int, parsed: dict, tenant: Tenant):
+    # Only the worker that moves the job to running may execute it
+    if not jobs.claim(job_id, WORKER_ID):
+        return
+    execute_and_reply(job_id, parsed, tenant)
+
 
-        elif parsed["type"] == "gigabit_status":
+def dispatch_fanout(job_id: int, parsed: dict, tenant: Tenant):
+    """
+    Post a single aggregated reply for a command on several routers once
+    every router's part has its result. The parts run as jobs of their
+    own on each router's owner (see process_message); this job only waits.
+    """
+    if not jobs.claim(job_id, WORKER_ID):
+        return None
+    targets = parsed["targets"]
+    parts = [_part_id(parsed["message_id"], ip) for ip in targets]
+
+    def _reply(results: dict):
+        lines = []
+        for ip, part in zip(targets, parts):
+            result = results.get(part)
+            if result is None:
+                result = f"Error: No result from {coordinator.owner(ip)} in {FANOUT_TIMEOUT:g}s"
+            lines.append(f"{ip}: {result}")
+        with tenants.use(tenant), metrics.labels(**_command_labels(parsed)):
+            close_job(job_id, parsed, tenant.room_id, "\n".join(lines))
+
+    coordinator.collect(parts, _reply, FANOUT_TIMEOUT)
+    return None
+
+
+def execute_and_reply(job_id: int, parsed: dict, tenant: Tenant):
+    with tenants.use(tenant):
+        labels = _command_labels(parsed)
+        with metrics.labels(**labels), metrics.stage("total"), _profiled(labels):
             try:
-                response_message = netmiko.gigabit_status(ip=parsed.get("ip"))
+                response_message = execute_command(parsed)
             except Exception as e:
+                print("Command failed:", type(e).__name__, e)
                 response_message = f"Error: {type(e).__name__}: {e}"
+            # Post text reply (if any). When showrun succeeds, response_message is None
+            close_job(job_id, parsed, tenant.room_id, response_message)
 
-        elif parsed["type"] == "showrun":
-            response_message = handle_showrun(parsed.get("ip"))
 
-        elif parsed["type"] == "motd_set":
-            response_message = handle_motd_set(
-                parsed.get("ip"), parsed.get("message")
-            )
+def post_reply(job_id: int, room_id: str, text: str):
+    """
+    Post a job's reply and record in the job store once Webex accepted it,
+    or count the failed attempt (the job fails after MAX_REPLY_ATTEMPTS).
+    """
+
+    def _accepted(future):
+        if future.exception() is None and future.result().status_code == 200:
+            jobs.mark_replied(job_id)
+        elif jobs.reply_failed(job_id):
+            print("Giving up on the reply of job", job_id)
+
+    post_message_to_webex(room_id, text).add_done_callback(_accepted)
+
+
+def _profiled(labels: dict):
+    return profiler.profile(labels["command"], labels["method"])
+
 
-        elif parsed["type"] == "motd_get":
-            response_message = handle_motd_get(parsed.get("ip"))
+def _command_labels(parsed: dict) -> dict:
+    """command/router/method labels of a parsed command for the stage metrics."""
+    kind = parsed["type"]
+    if kind == "fanout":
+        return dict(_command_labels(parsed["command"]), router="fanout")
+    if kind in METHOD_TYPES:
+        command = parsed["action"] if kind == "part1" else f"bulk_{parsed['action']}"
+        method = parsed.get("method") or _tenant().method
+    else:
+        command = kind
+        method = FIXED_METHOD.get(kind)
+    # Only known routers become label values (keeps the series count bounded)
+    ip = parsed.get("ip")
+    return {
+        "command": command,
+        "router": ip if ip in ALLOWED_IPS else None,
+        "method": method,
+    }
+
+
+def _log_dispatch_failure(future):
+    if future.exception() is not None:
+        e = future.exception()
+        print("Command failed:", type(e).__name__, e)
+
+
+class WebexAPIError(Exception):
+    def __init__(self, response):
+        super().__init__(
+            f"Incorrect reply from Webex Teams API. Status code: {response.status_code}"
+        )
+        self.status_code = response.status_code
+        # Seconds the API asked us to wait (429/503), None otherwise
+        self.retry_after = retry_after(response, None)
+
+
+def fetch_messages_page(before_id: str | None = None, room_id: str | None = None) -> list:
+    """GET one page of room messages, newest first."""
+    room_id = room_id or tenant_registry.default.room_id
+    get_params = {"roomId": room_id, "max": MESSAGES_PAGE_SIZE}
+    if before_id:
+        get_params["beforeMessage"] = before_id
+    with metrics.stage("webex_get"):
+        r = webex_session.get(
+            f"{WEBEX_API_URL}/messages",
+            params=get_params,
+            timeout=WEBEX_TIMEOUT,
+        )
+    if r.status_code != 200:
+        raise WebexAPIError(r)
+    return r.json().get("items") or []
+
+
+def fetch_message(message_id: str) -> dict:
+    """GET a single message by ID (webhook callbacks do not carry the text)."""
+    with metrics.stage("webex_get"):
+        r = webex_session.get(
+            f"{WEBEX_API_URL}/messages/{message_id}",
+            timeout=WEBEX_TIMEOUT,
+        )
+    if r.status_code != 200:
+        raise WebexAPIError(r)
+    return r.json()
+
+
+def register_webhook(target_url: str, room_id: str):
+    """Create a messages/created webhook for a room pointing at target_url."""
+    students = ", ".join(t.student_id for t in tenant_registry.rooms()[room_id])
+    body = {
+        "name": f"IPA2025 bot {students}",
+        "targetUrl": target_url,
+        "resource": "messages",
+        "event": "created",
+        "filter": f"roomId={room_id}",
+    }
+    if WEBHOOK_SECRET:
+        body["secret"] = WEBHOOK_SECRET
+    r = webex_session.post(
+        f"{WEBEX_API_URL}/webhooks",
+        json=body,
+        timeout=WEBEX_TIMEOUT,
+    )
+    if r.status_code != 200:
+        print("Webhook registration failed:", r.status_code, r.text)
+    return r
+
+
+# ---------------------------------------
+# 6) Main loops
+# ---------------------------------------
+def _replayable(parsed: dict) -> bool:
+    """Commands that are safe to run again when a crash cut them short."""
+    if parsed["type"] == "fanout":
+        return True  # only gathers the results of its parts
+    if parsed["type"] == "part1":
+        return parsed["action"] == "status"
+    return parsed["type"] != "bulk"
 
-        elif parsed["type"] == "error":
-            response_message = parsed["message"]
 
+def recover_jobs():
+    """
+    Reconcile the job store after a restart:
+      - replies that were stored but never accepted by Webex are posted
+      - jobs that another instance took over meanwhile are closed silently
+      - jobs cut short while running are re-queued when they only read or
+        set a value again (status, showrun, motd, ...); changes that may
+        or may not have reached the router are answered with an error
+        instead of being applied a second time
+      - queued jobs are started again, oldest first
+    """
+    for job in jobs.unreplied():
+        print("Re-posting reply of job", job["id"])
+        post_reply(job["id"], job["room_id"], job["reply"])
+
+    def _lost(job: dict) -> bool:
+        if coordinator.claim(job["message_id"]):
+            return False
+        print("Job", job["id"], "was taken over by another instance")
+        jobs.finish(job["id"], None)
+        return True
+
+    for job in jobs.in_state(RUNNING):
+        if _lost(job):
+            continue
+        if _replayable(job["command"]):
+            jobs.requeue(job["id"])
         else:
-            response_message = "Error: No command or unknown command"
+            print("Job", job["id"], "was interrupted while running")
+            close_job(job["id"], job["command"], job["room_id"], INTERRUPTED_REPLY)
+
+    for job in jobs.in_state(QUEUED):
+        if _lost(job):
+            continue
+        tenant = tenant_registry.get(job["room_id"], job["student_id"])
+        if tenant is None:
+            print("Job", job["id"], "belongs to a tenant that is no longer configured")
+            jobs.claim(job["id"], WORKER_ID)
+            finish_job(job["id"], None)
+            continue
+        print("Resuming job", job["id"])
+        submit_job(job["id"], job["command"], tenant)
+
+    jobs.prune()
+
+
+def open_cursors() -> dict:
+    """room_id -> MessageCursor for every tenant room."""
+    root, ext = os.path.splitext(CURSOR_FILE)
+    cursors = {}
+    for room_id, members in tenant_registry.rooms().items():
+        path = CURSOR_FILE
+        if room_id != tenant_registry.default.room_id:
+            path = f"{root}.{members[0].name}{ext}"
+        cursors[room_id] = MessageCursor(path)
+    return cursors
+
+
+def poll_once(cursor: MessageCursor, room_id: str | None = None) -> int:
+    """Ingest every new message of a room once; returns how many were processed."""
+    room_id = room_id or tenant_registry.default.room_id
+    processed = 0
+    # GET every message posted since the last processed one, oldest first
+    for item in cursor.new_messages(lambda before: fetch_messages_page(before, room_id)):
+        # Mark before running so a command never executes twice
+        if not cursor.mark(item):
+            continue
+        message = item.get("text", "")
+        print("Received message: " + str(message))
+        process_message(message, room_id, item.get("id"))
+        processed += 1
+    return processed
+
+
+def run_polling(cursors: dict):
+    """Poll every room on its own adaptive schedule, one room at a time."""
+    schedules = {
+        room_id: PollSchedule(POLL_MIN_INTERVAL, POLL_MAX_INTERVAL) for room_id in cursors
+    }
+    due = {room_id: time.monotonic() + POLL_MIN_INTERVAL for room_id in cursors}
+    while True:
+        room_id = min(due, key=due.get)
+        time.sleep(max(0.0, due[room_id] - time.monotonic()))
+        schedule = schedules[room_id]
+        try:
+            delay = schedule.success(poll_once(cursors[room_id], room_id))
+        except WebexAPIError as e:
+            delay = schedule.failure(e.retry_after)
+            print(f"Polling failed ({e.status_code}), retrying in {delay:.1f}s")
+            if e.status_code == 429:
+                # The rate limit is per token: hold back every room
+                until = time.monotonic() + delay
+                for other in due:
+                    due[other] = max(due[other], until)
+        except (requests.RequestException, ValueError) as e:
+            delay = schedule.failure()
+            print(f"Polling failed ({type(e).__name__}: {e}), retrying in {delay:.1f}s")
+        due[room_id] = time.monotonic() + delay
+
+
+def run_webhook(cursors: dict, host: str, port: int, public_url: str | None):
+    def on_event(data: dict):
+        room_id = data.get("roomId") or tenant_registry.default.room_id
+        cursor = cursors.get(room_id)
+        if cursor is None:
+            return
+        # Webex may redeliver a callback; the cursor keeps it exactly-once
+        if cursor.seen(data["id"]):
+            return
+        item = fetch_message(data["id"])
+        if not cursor.mark(item):
+            return
+        message = item.get("text", "")
+        print("Received message: " + str(message))
+        # With several instances each registers its own webhook and gets every
+        # callback; one that does not reach the owner is taken over after
+        # HANDOFF_DELAY like any unclaimed message
+        process_message(message, room_id, item.get("id"))
+
+    server = WebhookServer(on_event, host=host, port=port, secret=WEBHOOK_SECRET)
+    print(f"Listening for Webex webhooks on {host}:{port}{server.path}")
+    if public_url:
+        for room_id in cursors:
+            register_webhook(public_url.rstrip("/") + server.path, room_id)
+    server.serve_forever()
 
-        # Post text reply (if any). When showrun succeeds, response_message is None
-        if response_message:
-            reply = post_message_to_webex(roomIdToGetMessages, response_message)
-            if reply.status_code != 200:
-                print("Webex POST failed:", reply.status_code, reply.text)
+
+def sync_subscribers(instances=None):
+    """
+    Keep a NETCONF subscriber running for exactly the routers this instance
+    owns; called at start-up and whenever an instance joins or leaves.
+    """
+    with _subscribers_lock:
+        owned = {ip for ip in ALLOWED_IPS if coordinator.is_owner(ip)}
+        for ip in sorted(set(subscribers) - owned):
+            print(f"Stopping NETCONF subscriber for {ip} (now owned by {coordinator.owner(ip)})")
+            subscribers.pop(ip).stop()
+        for ip in sorted(owned - set(subscribers)):
+            subscriber = InterfaceSubscriber(ip, interface_table, NETCONF_SUBSCRIBE_INTERVAL)
+            subscriber.start()
+            subscribers[ip] = subscriber
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="IPA2025 Webex bot")
+    parser.add_argument(
+        "--mode",
+        choices=("poll", "webhook"),
+        default=os.environ.get("BOT_MODE", "poll"),
+        help="poll the messages API, or receive Webex webhook callbacks",
+    )
+    parser.add_argument("--host", default=WEBHOOK_HOST)
+    parser.add_argument("--port", type=int, default=WEBHOOK_PORT)
+    parser.add_argument(
+        "--public-url",
+        help="register a webhook pointing at this externally reachable base URL",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=METRICS_PORT,
+        help="port of the Prometheus /metrics endpoint (0 disables it)",
+    )
+    parser.add_argument(
+        "--profile",
+        type=float,
+        metavar="RATE",
+        default=PROFILE_RATE,
+        help="profile this fraction of commands, e.g. 0.1 (files go to PROFILE_DIR)",
+    )
+    parser.add_argument(
+        "--profile-mode",
+        choices=("sample", "cprofile"),
+        default=PROFILE_MODE,
+        help="folded stacks from a stack sampler, or cProfile .pstats",
+    )
+    args = parser.parse_args(argv)
+    _check_tenants()
+
+    if args.profile:
+        profiler.rate = min(max(args.profile, 0.0), 1.0)
+        profiler.mode = args.profile_mode
+        print(
+            f"Profiling {profiler.rate:.0%} of commands ({profiler.mode})"
+            f" into {os.path.abspath(profiler.out_dir)}"
+        )
+
+    if args.metrics_port:
+        server = metrics.MetricsServer(METRICS_HOST, args.metrics_port).start()
+        print(f"Metrics on http://{METRICS_HOST}:{args.metrics_port}{server.path}")
+
+    if len(tenant_registry) > 1:
+        print(f"Serving {len(tenant_registry)} tenants in {len(tenant_registry.rooms())} rooms")
+    coordinator.start()
+    if COORDINATION_DB:
+        print(
+            f"Instance {coordinator.instance_id}: {len(coordinator.instances())}"
+            f" live instance(s) share {COORDINATION_DB}"
+        )
+    if NETCONF_SUBSCRIBE:
+        sync_subscribers()
+        coordinator.on_membership_change(sync_subscribers)
+    cursors = open_cursors()
+    recover_jobs()
+    if args.mode == "webhook":
+        run_webhook(cursors, args.host, args.port, args.public_url)
+    else:
+        run_polling(cursors)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,195 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+JOBS_DB = os.environ.get("JOBS_DB", "jobs.sqlite3")
+BUSY_TIMEOUT_MS = 5000  # wait this long for another writer before failing
+RETENTION = 7 * 24 * 3600  # seconds finished jobs are kept
+MAX_REPLY_ATTEMPTS = 3  # posts of a reply (each retried by the outbox) before giving up
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"  # done, but the reply could not be posted
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    message_id  TEXT NOT NULL UNIQUE,
+    room_id     TEXT NOT NULL,
+    student_id  TEXT NOT NULL,
+    router      TEXT,
+    command     TEXT NOT NULL,
+    state       TEXT NOT NULL,
+    worker      TEXT,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    reply       TEXT,
+    replied     INTEGER NOT NULL DEFAULT 0,
+    reply_attempts INTEGER NOT NULL DEFAULT 0,
+    created_at  REAL NOT NULL,
+    started_at  REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id);
+"""
+
+
+class JobStore:
+    """
+    Durable record of every received command in a local SQLite database
+    (WAL mode, so readers never block the writer).
+
+    A job is added when its message arrives (queued), claimed by the
+    worker that runs it (running) and closed with its reply (done).
+    `replied` is set once Webex accepted the reply; a reply that was
+    rejected MAX_REPLY_ATTEMPTS times moves the job to failed instead, so
+    it is not re-posted forever. After a crash the jobs left queued/running
+    and the replies never sent are still there to reconcile. message_id is
+    unique, so a message redelivered by Webex or re-read after a lost cursor
+    never becomes a second job.
+
+    Each thread uses its own connection; claim() is a single conditional
+    UPDATE, so only one worker can ever take a job.
+    """
+
+    def __init__(self, path: str = JOBS_DB):
+        self.path = path
+        self._local = threading.local()
+        # SQLite allows one writer at a time and its busy handler sleeps for
+        # milliseconds when threads collide, so writers queue on a lock here
+        self._write_lock = threading.Lock()
+        db = self._connect()
+        db.executescript(_SCHEMA)
+        # Databases created before reply_attempts existed
+        columns = {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}
+        if "reply_attempts" not in columns:
+            db.execute(
+                "ALTER TABLE jobs ADD COLUMN reply_attempts INTEGER NOT NULL DEFAULT 0"
+            )
+            db.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            # Durable at checkpoints, no fsync per commit (safe with WAL)
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _write(self, sql: str, params: tuple) -> sqlite3.Cursor:
+        db = self._connect()
+        with self._write_lock, db:
+            return db.execute(sql, params)
+
+    @staticmethod
+    def _job(row) -> dict:
+        job = dict(row)
+        job["command"] = json.loads(job["command"])
+        job["replied"] = bool(job["replied"])
+        return job
+
+    # ---------------------------------------
+    # State changes
+    # ---------------------------------------
+    def add(
+        self,
+        message_id: str,
+        room_id: str,
+        student_id: str,
+        command: dict,
+        router: Optional[str] = None,
+    ) -> Optional[int]:
+        """Queue a job; returns its id, or None if the message already has one."""
+        cur = self._write(
+            "INSERT OR IGNORE INTO jobs"
+            " (message_id, room_id, student_id, router, command, state, created_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (message_id, room_id, student_id, router, json.dumps(command), QUEUED, time.time()),
+        )
+        return cur.lastrowid if cur.rowcount == 1 else None
+
+    def claim(self, job_id: int, worker: str) -> bool:
+        """queued -> running for `worker`; False if someone else already has it."""
+        cur = self._write(
+            "UPDATE jobs SET state = ?, worker = ?, attempts = attempts + 1, started_at = ?"
+            " WHERE id = ? AND state = ?",
+            (RUNNING, worker, time.time(), job_id, QUEUED),
+        )
+        return cur.rowcount == 1
+
+    def finish(self, job_id: int, reply: Optional[str]) -> Optional[str]:
+        """
+        running -> done with the reply to post (None: nothing to post).
+        Returns the job's message_id.
+        """
+        db = self._connect()
+        with self._write_lock, db:
+            db.execute(
+                "UPDATE jobs SET state = ?, reply = ?, replied = ?, finished_at = ? WHERE id = ?",
+                (DONE, reply, int(reply is None), time.time(), job_id),
+            )
+            row = db.execute("SELECT message_id FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def mark_replied(self, job_id: int):
+        self._write("UPDATE jobs SET replied = 1 WHERE id = ?", (job_id,))
+
+    def reply_failed(self, job_id: int, max_attempts: int = MAX_REPLY_ATTEMPTS) -> bool:
+        """Count a rejected post of the reply; True once the job gave up (failed)."""
+        db = self._connect()
+        with self._write_lock, db:
+            db.execute(
+                "UPDATE jobs SET reply_attempts = reply_attempts + 1,"
+                " state = CASE WHEN reply_attempts + 1 >= ? THEN ? ELSE state END"
+                " WHERE id = ? AND state = ? AND replied = 0",
+                (max_attempts, FAILED, job_id, DONE),
+            )
+            row = db.execute("SELECT state FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row) and row[0] == FAILED
+
+    def requeue(self, job_id: int):
+        """Put an interrupted job back in the queue to run again."""
+        self._write(
+            "UPDATE jobs SET state = ?, worker = NULL, started_at = NULL WHERE id = ?",
+            (QUEUED, job_id),
+        )
+
+    def prune(self, older_than: float = RETENTION) -> int:
+        """Delete replied or failed jobs finished more than `older_than` seconds ago."""
+        cur = self._write(
+            "DELETE FROM jobs WHERE ((state = ? AND replied = 1) OR state = ?)"
+            " AND finished_at < ?",
+            (DONE, FAILED, time.time() - older_than),
+        )
+        return cur.rowcount
+
+    # ---------------------------------------
+    # Queries
+    # ---------------------------------------
+    def in_state(self, state: str) -> List[dict]:
+        """Jobs in `state`, oldest first."""
+        rows = self._connect().execute(
+            "SELECT * FROM jobs WHERE state = ? ORDER BY id", (state,)
+        ).fetchall()
+        return [self._job(row) for row in rows]
+
+    def unreplied(self) -> List[dict]:
+        """Finished jobs whose reply never reached Webex, oldest first."""
+        rows = self._connect().execute(
+            "SELECT * FROM jobs WHERE state = ? AND replied = 0 ORDER BY id", (DONE,)
+        ).fetchall()
+        return [self._job(row) for row in rows]
+
+    def stats(self) -> dict:
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        rows = self._connect().execute("SELECT state, COUNT(*) FROM jobs GROUP BY state")
+        for state, count in rows:
+            counts[state] = count
+        return counts
@@ -0,0 +1,147 @@
+import json
+import os
+import threading
+from collections import deque
+from typing import Callable, List, Optional
+
+# How many message IDs to remember for de-duplication
+DEDUP_SIZE = 500
+# Upper bound on pages walked back in one poll (protects against a lost cursor)
+MAX_PAGES = 10
+# last_id when the room had no messages at all on the first poll
+EMPTY_ROOM = ""
+
+
+class MessageCursor:
+    """
+    Remembers the last processed Webex message of a room and which message
+    IDs were already handled, so every command runs exactly once.
+
+    State is kept in a small JSON file and survives restarts:
+      {"last_id": ..., "last_created": ..., "seen": [...]}
+    """
+
+    def __init__(self, path: str, dedup_size: int = DEDUP_SIZE):
+        self.path = path
+        self._lock = threading.Lock()
+        self.last_id: Optional[str] = None
+        self.last_created: Optional[str] = None
+        self._seen = deque(maxlen=dedup_size)
+        self._seen_set = set()
+        self._load()
+
+    # ---------------------------------------
+    # Persistence
+    # ---------------------------------------
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print("Cannot read cursor state, starting fresh:", e)
+            return
+
+        self.last_id = state.get("last_id")
+        self.last_created = state.get("last_created")
+        for message_id in state.get("seen", []):
+            self._remember(message_id)
+
+    def _save(self):
+        state = {
+            "last_id": self.last_id,
+            "last_created": self.last_created,
+            "seen": list(self._seen),
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    # ---------------------------------------
+    # Dedup
+    # ---------------------------------------
+    def _remember(self, message_id: str):
+        if message_id in self._seen_set:
+            return
+        if len(self._seen) == self._seen.maxlen:
+            self._seen_set.discard(self._seen[0])
+        self._seen.append(message_id)
+        self._seen_set.add(message_id)
+
+    def seen(self, message_id: str) -> bool:
+        with self._lock:
+            return message_id in self._seen_set
+
+    def mark(self, message: dict) -> bool:
+        """
+        Record a message as processed and advance the cursor.
+        Returns False if it had already been processed.
+        """
+        message_id = message.get("id")
+        created = message.get("created")
+        with self._lock:
+            if not message_id or message_id in self._seen_set:
+                return False
+            self._remember(message_id)
+            if created and (not self.last_created or created >= self.last_created):
+                self.last_id = message_id
+                self.last_created = created
+            self._save()
+        return True
+
+    # ---------------------------------------
+    # Ingestion
+    # ---------------------------------------
+    def new_messages(self, fetch_page: Callable[[Optional[str]], List[dict]]) -> List[dict]:
+        """
+        Return every message newer than the cursor, oldest first.
+
+        fetch_page(before_id) must return one page of messages newest first,
+        like GET /v1/messages (before_id maps to the beforeMessage parameter).
+
+        On the very first run there is no cursor yet: the newest message only
+        becomes the starting point and older history is not replayed. If the
+        room is empty, the cursor records EMPTY_ROOM instead, so everything
+        posted after that is new.
+        """
+        collected = []
+        before = None
+        reached_cursor = False
+
+        for _ in range(MAX_PAGES):
+            page = fetch_page(before)
+            if not page:
+                break
+            for message in page:
+                if self._is_at_or_before_cursor(message):
+                    reached_cursor = True
+                    break
+                collected.append(message)
+            if reached_cursor or self.last_id is None:
+                break
+            before = page[-1].get("id")
+
+        if self.last_id is None:
+            newest = collected[0] if collected else {}
+            with self._lock:
+                self.last_id = newest.get("id", EMPTY_ROOM)
+                self.last_created = newest.get("created")
+                self._save()
+            return []
+
+        if not reached_cursor and collected and self.last_id != EMPTY_ROOM:
+            print(f"Cursor not found within {MAX_PAGES} pages; older messages skipped")
+
+        collected.reverse()
+        return [m for m in collected if not self.seen(m.get("id"))]
+
+    def _is_at_or_before_cursor(self, message: dict) -> bool:
+        if self.last_id is None:
+            return False
+        if message.get("id") == self.last_id:
+            return True
+        created = message.get("created")
+        # Same timestamp as the cursor is left to the dedup set
+        return bool(created and self.last_created and created < self.last_created)
@@ -0,0 +1,157 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PATH = "/metrics"
+
+# Upper bounds in seconds; covers a cached reply (ms) up to an Ansible run
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Labels every stage sample carries
+LABEL_NAMES = ("command", "router", "method")
+UNSET = "none"
+
+# Command/router/method of the work running in the current thread (or task);
+# set once per command so the transport modules don't have to pass them around
+_labels = contextvars.ContextVar("metric_labels", default={})
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with labels, rendered in the Prometheus
+    text format. observe() is a bisect plus a few additions under a lock,
+    cheap enough to leave on for every command.
+    """
+
+    def __init__(self, name: str, help_text: str, label_names: tuple, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, seconds: float, **labels):
+        key = tuple(str(labels.get(name) or UNSET) for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = [0] * (len(self.buckets) + 1) + [0.0]
+                self._series[key] = series
+            series[index] += 1
+            series[-1] += seconds
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            labels = ",".join(
+                f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, key)
+            )
+            sep = "," if labels else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+STAGE_SECONDS = Histogram(
+    "ipa_stage_seconds",
+    "Time spent per stage of handling a chat command",
+    ("stage",) + LABEL_NAMES,
+)
+
+_registry = [STAGE_SECONDS]
+
+
+# ---------------------------------------
+# Recording
+# ---------------------------------------
+@contextmanager
+def labels(**values):
+    """Set command/router/method for every stage timed inside the block."""
+    merged = dict(_labels.get())
+    merged.update({k: v for k, v in values.items() if v is not None})
+    token = _labels.set(merged)
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+
+def observe(stage: str, seconds: float, **extra):
+    values = dict(_labels.get())
+    values.update(extra)
+    STAGE_SECONDS.observe(seconds, stage=stage, **values)
+
+
+@contextmanager
+def stage(name: str, **extra):
+    """Time the block as `name` under the current labels (failures included)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **extra)
+
+
+def render() -> str:
+    return "".join(metric.render() for metric in _registry)
+
+
+# ---------------------------------------
+# Exposition
+# ---------------------------------------
+class MetricsServer:
+    """Serves render() as Prometheus text on GET /metrics."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9108, path: str = METRICS_PATH):
+        self.path = path
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._httpd.server_address
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != server.path:
+                    self.send_error(404)
+                    return
+                body = render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def shutdown(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -1,6 +1,14 @@
+import atexit
+import threading
+import time
+from contextlib import contextmanager
 from ncclient import manager
+from ncclient.operations.rpc import RPCError
 import xmltodict
 from typing import Optional
+import bulk
+import metrics
+import tenants
 
 # Allowed router IPs (match your main)
 ALLOWED_IPS = {
@@ -15,7 +23,16 @@ ALLOWED_IPS = {
 ROUTER_USER = "admin"
 ROUTER_PASS = "cisco"
 
-IF_NAME = "Loopback66070101"
+
+# Base namespace for the nc:operation attribute on edit-config data
+NC_NS = "urn:ietf:params:xml:ns:netconf:base:1.0"
+
+# Session pool tuning
+POOL_MAX_SESSIONS_PER_ROUTER = 2  # concurrent NETCONF sessions per router
+POOL_IDLE_TIMEOUT = 300  # seconds an unused session is kept open
+POOL_HEALTH_CHECK_AFTER = 30  # seconds idle before re-checking a session
+POOL_ACQUIRE_TIMEOUT = 60  # seconds to wait for a free session slot
+SSH_KEEPALIVE_INTERVAL = 15  # seconds between SSH keepalive packets
 
 # --------------------------------------------------------------
 # Helpers
@@ -29,11 +46,17 @@ def _require_ip(ip: Optional[str]):
     return None
 
 
+# Optional per-router address override, e.g. {"10.0.15.61": ("127.0.0.1", 8830)}
+# (used to point the bot at local stand-ins)
+ENDPOINTS = {}
+
+
 def _connect(ip: str):
     # Open a NETCONF over SSH session to the specific device
+    host, port = ENDPOINTS.get(ip, (ip, 830))
     return manager.connect(
-        host=ip,
-        port=830,
+        host=host,
+        port=port,
         username=ROUTER_USER,
         password=ROUTER_PASS,
         hostkey_verify=False,
@@ -43,27 +66,180 @@ def _connect(ip: str):
     )
 
 
-def _netconf_edit_config(mgr, netconf_config: str):
-    return mgr.edit_config(target="running", config=netconf_config)
+def _session_alive(mgr) -> bool:
+    try:
+        return bool(mgr.connected)
+    except Exception:
+        return False
+
+
+def _close_quietly(mgr):
+    try:
+        mgr.close_session()
+    except Exception:
+        pass
+
+
+class _RouterSessions:
+    """Idle sessions and the slot limit for a single router."""
+
+    def __init__(self, max_sessions: int):
+        self.slots = threading.BoundedSemaphore(max_sessions)
+        self.idle = []  # list of (manager, last_used) with most recent last
+
+
+class NetconfSessionPool:
+    """
+    Per-router pool of long-lived ncclient sessions.
+
+    Sessions are reused across commands instead of paying the SSH handshake,
+    authentication and <hello> exchange every time. A session is handed to one
+    caller at a time; idle sessions are health-checked before reuse and closed
+    after POOL_IDLE_TIMEOUT seconds without use.
+    """
+
+    def __init__(
+        self,
+        connect=None,
+        max_sessions_per_router: int = POOL_MAX_SESSIONS_PER_ROUTER,
+        idle_timeout: float = POOL_IDLE_TIMEOUT,
+        health_check_after: float = POOL_HEALTH_CHECK_AFTER,
+        acquire_timeout: float = POOL_ACQUIRE_TIMEOUT,
+    ):
+        self._connect = connect or _connect
+        self._max_sessions = max_sessions_per_router
+        self._idle_timeout = idle_timeout
+        self._health_check_after = health_check_after
+        self._acquire_timeout = acquire_timeout
+        self._lock = threading.Lock()
+        self._routers = {}  # ip -> _RouterSessions
+
+    def _router(self, ip: str) -> _RouterSessions:
+        with self._lock:
+            router = self._routers.get(ip)
+            if router is None:
+                router = _RouterSessions(self._max_sessions)
+                self._routers[ip] = router
+            return router
+
+    def _healthy(self, mgr, last_used: float) -> bool:
+        if not _session_alive(mgr):
+            return False
+        if time.monotonic() - last_used < self._health_check_after:
+            return True
+        # Idle for a while: make sure the SSH transport is still usable
+        try:
+            transport = mgr._session._transport
+            return transport is not None and transport.is_active()
+        except Exception:
+            return False
+
+    def _checkout(self, ip: str, router: _RouterSessions):
+        while True:
+            with self._lock:
+                if not router.idle:
+                    break
+                mgr, last_used = router.idle.pop()
+            if self._healthy(mgr, last_used):
+                return mgr
+            print(f"NETCONF session to {ip} is stale, reconnecting")
+            _close_quietly(mgr)
+
+        with metrics.stage("device_connect"):
+            mgr = self._connect(ip)
+        try:
+            mgr._session._transport.set_keepalive(SSH_KEEPALIVE_INTERVAL)
+        except Exception:
+            pass
+        return mgr
+
+    @contextmanager
+    def session(self, ip: str):
+        """
+        Borrow a connected manager for `ip`. The session returns to the pool
+        afterwards unless it was disconnected while in use.
+        """
+        self.evict_idle()
+        router = self._router(ip)
+        if not router.slots.acquire(timeout=self._acquire_timeout):
+            raise TimeoutError(f"No free NETCONF session for {ip}")
+
+        mgr = None
+        try:
+            mgr = self._checkout(ip, router)
+            yield mgr
+        finally:
+            if mgr is not None:
+                if _session_alive(mgr):
+                    with self._lock:
+                        router.idle.append((mgr, time.monotonic()))
+                else:
+                    _close_quietly(mgr)
+            router.slots.release()
+
+    def evict_idle(self):
+        """Close sessions that have not been used for idle_timeout seconds."""
+        cutoff = time.monotonic() - self._idle_timeout
+        expired = []
+        with self._lock:
+            for router in self._routers.values():
+                keep = []
+                for mgr, last_used in router.idle:
+                    (keep if last_used >= cutoff else expired).append((mgr, last_used))
+                router.idle = keep
+        for mgr, _ in expired:
+            _close_quietly(mgr)
+
+    def close(self, ip: Optional[str] = None):
+        """Close idle sessions for one router, or for every router."""
+        closing = []
+        with self._lock:
+            for router_ip, router in self._routers.items():
+                if ip is None or router_ip == ip:
+                    closing.extend(mgr for mgr, _ in router.idle)
+                    router.idle = []
+        for mgr in closing:
+            _close_quietly(mgr)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {ip: len(router.idle) for ip, router in self._routers.items()}
+
+
+_pool = NetconfSessionPool()
+atexit.register(_pool.close)
+
+
+def _netconf_edit_config(mgr, netconf_config: str, default_operation: Optional[str] = None):
+    with metrics.stage("rpc"):
+        return mgr.edit_config(
+            target="running", config=netconf_config, default_operation=default_operation
+        )
 
 
 def _netconf_get_config(mgr, netconf_filter: str):
-    return mgr.get_config(source="running", filter=netconf_filter)
+    with metrics.stage("rpc"):
+        return mgr.get_config(source="running", filter=netconf_filter)
 
 
-def _check_interface_exist(mgr) -> bool:
-    find_interface = f"""
-        <filter>
-            <interfaces xmlns="urn:ietf:params:xml:ns:yang:ietf-interfaces">
-                <interface><name>{IF_NAME}</name></interface>
-            </interfaces>
-        </filter>
+def _edit(ip: str, netconf_config: str, ok_msg: str, fail_msg: str, default_operation=None):
+    """
+    Send a single edit-config and map the outcome to a reply.
+    The nc:operation attributes make the device do the existence check, so
+    rpc-errors such as data-exists (create) or data-missing (delete, or
+    enable/disable of a missing interface) become the "Cannot ..." reply.
+    Transport errors (connect, session, timeout) are raised instead, so they
+    are reported as errors and count as failures for "auto".
     """
     try:
-        reply_xml = _netconf_get_config(mgr, find_interface).xml
-        return IF_NAME in reply_xml
-    except Exception:
-        return False
+        with _pool.session(ip) as m:
+            reply = _netconf_edit_config(m, netconf_config, default_operation)
+            print(reply.xml)
+            if reply.ok:
+                return ok_msg
+    except RPCError as e:
+        print("Error!", e.tag or e.type, e.message)
+    return fail_msg
 
 
 # --------------------------------------------------------------
@@ -75,12 +251,13 @@ def create(ip: Optional[str] = None):
     if err:
         return err
 
+    # operation="create" fails with data-exists if the interface is there
     netconf_config = f"""
-        <config>
+        <config xmlns:nc="{NC_NS}">
             <interfaces xmlns="urn:ietf:params:xml:ns:yang:ietf-interfaces">
-                <interface>
-                    <name>{IF_NAME}</name>
-                    <description>Created by 66070101</description>
+                <interface nc:operation="create">
+                    <name>{tenants.loopback_name()}</name>
+                    <description>Created by {tenants.student_id()}</description>
                     <type xmlns:ianaift="urn:ietf:params:xml:ns:yang:iana-if-type">ianaift:softwareLoopback</type>
                     <ipv4 xmlns="urn:ietf:params:xml:ns:yang:ietf-ip">
                         <address>
@@ -93,19 +270,12 @@ def create(ip: Optional[str] = None):
         </config>
     """
 
-    try:
-        with _connect(ip) as m:
-            if _check_interface_exist(m):
-                raise Exception("Interface already exists")
-
-            reply = _netconf_edit_config(m, netconf_config)
-            xml_data = reply.xml
-            print(xml_data)
-            if "<ok/>" in xml_data or "<ok />" in xml_data:
-                return "Interface loopback 66070101 is created successfully"
-    except Exception as e:
-        print("Error!", e)
-    return "Cannot create: Interface loopback 66070101"
+    return _edit(
+        ip,
+        netconf_config,
+        f"{tenants.interface_label()} is created successfully",
+        f"Cannot create: {tenants.interface_label()}",
+    )
 
 
 def delete(ip: Optional[str] = None):
@@ -113,61 +283,52 @@ def delete(ip: Optional[str] = None):
     if err:
         return err
 
+    # operation="delete" fails with data-missing if the interface is absent
     netconf_config = f"""
-        <config>
+        <config xmlns:nc="{NC_NS}">
             <interfaces xmlns="urn:ietf:params:xml:ns:yang:ietf-interfaces">
-                <interface operation="delete">
-                    <name>{IF_NAME}</name>
+                <interface nc:operation="delete">
+                    <name>{tenants.loopback_name()}</name>
                 </interface>
             </interfaces>
         </config>
     """
 
-    try:
-        with _connect(ip) as m:
-            if not _check_interface_exist(m):
-                raise Exception("Interface does not exist")
-
-            reply = _netconf_edit_config(m, netconf_config)
-            xml_data = reply.xml
-            print(xml_data)
-            if "<ok/>" in xml_data or "<ok />" in xml_data:
-                return "Interface loopback 66070101 is deleted successfully"
-    except Exception as e:
-        print("Error!", e)
-    return "Cannot delete: Interface loopback 66070101"
-
+    return _edit(
+        ip,
+        netconf_config,
+        f"{tenants.interface_label()} is deleted successfully",
+        f"Cannot delete: {tenants.interface_label()}",
+    )
 
-def enable(ip: Optional[str] = None):
-    err = _require_ip(ip)
-    if err:
-        return err
 
-    netconf_config = f"""
-        <config>
+def _enabled_config(enabled: bool) -> str:
+    # With default-operation "none" nothing is created implicitly: only the
+    # <enabled> leaf is merged, and a missing interface yields data-missing.
+    return f"""
+        <config xmlns:nc="{NC_NS}">
             <interfaces xmlns="urn:ietf:params:xml:ns:yang:ietf-interfaces">
                 <interface>
-                    <name>{IF_NAME}</name>
-                    <type xmlns:ianaift="urn:ietf:params:xml:ns:yang:iana-if-type">ianaift:softwareLoopback</type>
-                    <enabled>true</enabled>
+                    <name>{tenants.loopback_name()}</name>
+                    <enabled nc:operation="merge">{"true" if enabled else "false"}</enabled>
                 </interface>
             </interfaces>
         </config>
     """
 
-    try:
-        with _connect(ip) as m:
-            if not _check_interface_exist(m):
-                raise Exception("Interface does not exist")
-
-            reply = _netconf_edit_config(m, netconf_config)
-            xml_data = reply.xml
-            print(xml_data)
-            if "<ok/>" in xml_data or "<ok />" in xml_data:
-                return "Interface loopback 66070101 is enabled successfully"
-    except Exception as e:
-        print("Error!", e)
-    return "Cannot enable: Interface loopback 66070101"
+
+def enable(ip: Optional[str] = None):
+    err = _require_ip(ip)
+    if err:
+        return err
+
+    return _edit(
+        ip,
+        _enabled_config(True),
+        f"{tenants.interface_label()} is enabled successfully",
+        f"Cannot enable: {tenants.interface_label()}",
+        default_operation="none",
+    )
 
 
 def disable(ip: Optional[str] = None):
@@ -175,31 +336,13 @@ def disable(ip: Optional[str] = None):
     if err:
         return err
 
-    netconf_config = f"""
-        <config>
-            <interfaces xmlns="urn:ietf:params:xml:ns:yang:ietf-interfaces">
-                <interface>
-                    <name>{IF_NAME}</name>
-                    <type xmlns:ianaift="urn:ietf:params:xml:ns:yang:iana-if-type">ianaift:softwareLoopback</type>
-                    <enabled>false</enabled>
-                </interface>
-            </interfaces>
-        </config>
-    """
-
-    try:
-        with _connect(ip) as m:
-            if not _check_interface_exist(m):
-                raise Exception("Interface does not exist")
-
-            reply = _netconf_edit_config(m, netconf_config)
-            xml_data = reply.xml
-            print(xml_data)
-            if "<ok/>" in xml_data or "<ok />" in xml_data:
-                return "Interface loopback 66070101 is shutdowned successfully"
-    except Exception as e:
-        print("Error!", e)
-    return "Cannot shutdown: Interface loopback 66070101"
+    return _edit(
+        ip,
+        _enabled_config(False),
+        f"{tenants.interface_label()} is shutdowned successfully",
+        f"Cannot shutdown: {tenants.interface_label()}",
+        default_operation="none",
+    )
 
 
 def status(ip: Optional[str] = None):
@@ -210,14 +353,15 @@ def status(ip: Optional[str] = None):
     netconf_filter = f"""
         <filter>
             <interfaces-state xmlns="urn:ietf:params:xml:ns:yang:ietf-interfaces">
-                <interface><name>{IF_NAME}</name></interface>
+                <interface><name>{tenants.loopback_name()}</name></interface>
             </interfaces-state>
         </filter>
     """
 
     try:
-        with _connect(ip) as m:
-            netconf_reply = m.get(filter=netconf_filter)
+        with _pool.session(ip) as m:
+            with metrics.stage("rpc"):
+                netconf_reply = m.get(filter=netconf_filter)
             print(netconf_reply)
             netconf_reply_dict = xmltodict.parse(netconf_reply.xml)
 
@@ -230,21 +374,106 @@ def status(ip: Optional[str] = None):
                     oper_status = iface.get("oper-status", "unknown")
 
                     if admin_status == "up" and oper_status == "up":
-                        return "Interface loopback 66070101 is enabled"
+                        return f"{tenants.interface_label()} is enabled"
                     if admin_status == "down" and oper_status == "down":
-                        return "Interface loopback 66070101 is disabled"
+                        return f"{tenants.interface_label()} is disabled"
                     if admin_status == "up" and oper_status == "unknown":
-                        return "Interface loopback 66070101 is enabled"
+                        return f"{tenants.interface_label()} is enabled"
                     if admin_status == "down" and oper_status == "unknown":
-                        return "Interface loopback 66070101 is disabled"
+                        return f"{tenants.interface_label()} is disabled"
                     if admin_status == "down" or oper_status == "down":
-                        return "Interface loopback 66070101 is disabled"
-                    return "Interface loopback 66070101 is enabled"
+                        return f"{tenants.interface_label()} is disabled"
+                    return f"{tenants.interface_label()} is enabled"
                 else:
                     # No single interface dict found
-                    return "No Interface loopback 66070101"
+                    return f"No {tenants.interface_label()}"
             else:
-                return "No Interface loopback 66070101"
+                return f"No {tenants.interface_label()}"
     except Exception as e:
         print("Error!", e)
-        return "Cannot read status: Interface loopback 66070101"
\ No newline at end of file
+        return f"Cannot read status: {tenants.interface_label()}"
+
+# --------------------------------------------------------------
+# Bulk loopback operations
+#   One get-config reads which interfaces exist, then a single
+#   edit-config carries an entry for every loopback that has to change.
+# --------------------------------------------------------------
+INTERFACES_FILTER = """
+    <filter>
+        <interfaces xmlns="urn:ietf:params:xml:ns:yang:ietf-interfaces">
+            <interface>
+                <name/>
+                <enabled/>
+            </interface>
+        </interfaces>
+    </filter>
+"""
+
+
+def _parse_interfaces(xml: str) -> dict:
+    data = xmltodict.parse(xml).get("rpc-reply", {}).get("data") or {}
+    items = (data.get("interfaces") or {}).get("interface") or []
+    if isinstance(items, dict):
+        items = [items]
+    return {
+        item["name"]: bulk.enabled_value(item.get("enabled"))
+        for item in items
+        if item.get("name")
+    }
+
+
+def _bulk_entry(action: str, name: str) -> str:
+    if action == "create":
+        return f"""
+                <interface nc:operation="create">
+                    <name>{name}</name>
+                    <description>Created by {tenants.student_id()}</description>
+                    <type xmlns:ianaift="urn:ietf:params:xml:ns:yang:iana-if-type">ianaift:softwareLoopback</type>
+                    <enabled>true</enabled>
+                </interface>"""
+    if action == "delete":
+        return f"""
+                <interface nc:operation="delete">
+                    <name>{name}</name>
+                </interface>"""
+    enabled = "true" if action == "enable" else "false"
+    return f"""
+                <interface>
+                    <name>{name}</name>
+                    <enabled nc:operation="merge">{enabled}</enabled>
+                </interface>"""
+
+
+def bulk_apply(ip: Optional[str], action: str, names: list) -> dict:
+    """
+    Apply `action` to every loopback in `names`; returns name -> bulk outcome.
+    A rejected edit-config fails the planned changes; transport errors are
+    raised, as in _edit.
+    """
+    err = _require_ip(ip)
+    if err:
+        raise ValueError(err)
+
+    changes, outcomes = list(names), {}
+    try:
+        with _pool.session(ip) as m:
+            current = _parse_interfaces(_netconf_get_config(m, INTERFACES_FILTER).xml)
+            changes, outcomes = bulk.plan(action, current, names)
+            if not changes:
+                return outcomes
+
+            entries = "".join(_bulk_entry(action, name) for name in changes)
+            netconf_config = f"""
+        <config xmlns:nc="{NC_NS}">
+            <interfaces xmlns="urn:ietf:params:xml:ns:yang:ietf-interfaces">{entries}
+            </interfaces>
+        </config>
+    """
+            # enable/disable must not create anything implicitly
+            default_operation = None if action in ("create", "delete") else "none"
+            reply = _netconf_edit_config(m, netconf_config, default_operation)
+            return bulk.finish(outcomes, changes, reply.ok)
+    except RPCError as e:
+        print("Error!", e.tag or e.type, e.message)
+    # The edit-config is all-or-nothing: every planned change failed
+    return bulk.finish(outcomes, changes, False)
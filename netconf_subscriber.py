@@ -0,0 +1,205 @@
+import threading
+import time
+from typing import Optional
+
+import xmltodict
+
+import netconf_final
+
+POLL_INTERVAL = 10  # seconds between delta polls of interfaces-state
+RECONNECT_DELAY = 5  # seconds before retrying a failed subscription (doubles)
+MAX_RECONNECT_DELAY = 120
+STALE_AFTER = 3 * POLL_INTERVAL  # table data older than this is not trusted
+
+# RFC 5277: without it a subscribed session accepts no other RPCs
+INTERLEAVE_CAPABILITY = "urn:ietf:params:netconf:capability:interleave:1.0"
+
+# Only the leaves we need, so each poll stays small
+STATE_FILTER = """
+    <filter>
+        <interfaces-state xmlns="urn:ietf:params:xml:ns:yang:ietf-interfaces">
+            <interface>
+                <name/>
+                <admin-status/>
+                <oper-status/>
+            </interface>
+        </interfaces-state>
+    </filter>
+"""
+
+
+class InterfaceStateTable:
+    """In-memory admin/oper state of every interface, per router."""
+
+    def __init__(self, stale_after: float = STALE_AFTER):
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        self._routers = {}  # ip -> {"updated": ts, "interfaces": {name: {...}}}
+
+    def update(self, ip: str, interfaces: dict) -> list:
+        """Replace the table of `ip`; returns names whose state changed."""
+        with self._lock:
+            old = self._routers.get(ip, {}).get("interfaces", {})
+            self._routers[ip] = {"updated": time.monotonic(), "interfaces": interfaces}
+        return sorted(
+            name
+            for name in set(old) | set(interfaces)
+            if old.get(name) != interfaces.get(name)
+        )
+
+    def mark_stale(self, ip: str):
+        with self._lock:
+            self._routers.pop(ip, None)
+
+    def interfaces(self, ip: str) -> Optional[dict]:
+        """All interfaces of `ip`, or None when the router is not tracked or data is stale."""
+        with self._lock:
+            router = self._routers.get(ip)
+            if not router or time.monotonic() - router["updated"] > self.stale_after:
+                return None
+            return dict(router["interfaces"])
+
+    def lookup(self, ip: str, name: str):
+        """
+        (True, state) when the router is tracked and fresh, state being the
+        interface dict or None if the interface does not exist;
+        (False, None) when there is no usable data.
+        """
+        interfaces = self.interfaces(ip)
+        if interfaces is None:
+            return False, None
+        return True, interfaces.get(name)
+
+    def gigabit_summary(self, ip: str) -> Optional[str]:
+        """Same format as netmiko_final.gigabit_status, from local data."""
+        interfaces = self.interfaces(ip)
+        if interfaces is None:
+            return None
+
+        up = down = admin_down = 0
+        details = []
+        for name in sorted(interfaces):
+            if not name.startswith("GigabitEthernet"):
+                continue
+            state = interfaces[name]
+            if state.get("admin") == "down":
+                admin_down += 1
+                norm = "administratively down"
+            elif state.get("oper") == "up":
+                up += 1
+                norm = "up"
+            else:
+                down += 1
+                norm = "down"
+            details.append(f"{name} {norm}")
+
+        detail = ", ".join(details)
+        summary = f"-> {up} up, {down} down, {admin_down} administratively down"
+        return f"{detail} {summary}".strip()
+
+
+def _parse_state(xml: str) -> dict:
+    data = xmltodict.parse(xml).get("rpc-reply", {}).get("data") or {}
+    items = (data.get("interfaces-state") or {}).get("interface") or []
+    if isinstance(items, dict):
+        items = [items]
+    interfaces = {}
+    for item in items:
+        name = item.get("name")
+        if name:
+            interfaces[name] = {
+                "admin": item.get("admin-status"),
+                "oper": item.get("oper-status"),
+            }
+    return interfaces
+
+
+class InterfaceSubscriber(threading.Thread):
+    """
+    Keeps the state table of one router current.
+
+    Uses its own NETCONF session (notifications tie up the session, so it
+    cannot come from the shared pool). If the router accepts
+    <create-subscription>, every notification triggers a refresh; oper-state
+    changes are not always notified, so interfaces-state is also polled
+    every poll_interval seconds. Without notification support it simply
+    polls. Unless the router advertises :interleave, the polls go over a
+    pooled session, since the subscribed one takes no other RPCs.
+    """
+
+    def __init__(self, ip: str, table: InterfaceStateTable, poll_interval: float = POLL_INTERVAL):
+        super().__init__(name=f"netconf-subscriber-{ip}", daemon=True)
+        self.ip = ip
+        self.table = table
+        self.poll_interval = poll_interval
+        self.notifications = False
+        self._stop_event = threading.Event()
+        self._refresh_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def refresh_soon(self):
+        """Ask for a refresh, e.g. right after the bot changed an interface."""
+        self._refresh_event.set()
+
+    def _refresh(self, mgr):
+        if self.notifications and INTERLEAVE_CAPABILITY not in mgr.server_capabilities:
+            with netconf_final._pool.session(self.ip) as polling:
+                reply = polling.get(filter=STATE_FILTER)
+        else:
+            reply = mgr.get(filter=STATE_FILTER)
+        changed = self.table.update(self.ip, _parse_state(reply.xml))
+        if changed:
+            print(f"Interface state changed on {self.ip}: {', '.join(changed)}")
+
+    def _subscribe(self, mgr) -> bool:
+        try:
+            mgr.create_subscription(stream_name="NETCONF")
+            return True
+        except Exception as e:
+            print(f"No NETCONF notifications on {self.ip} ({e}); polling instead")
+            return False
+
+    def _serve(self, mgr):
+        self.notifications = False  # a new session starts unsubscribed
+        self._refresh(mgr)
+        self.notifications = self._subscribe(mgr)
+        last_refresh = time.monotonic()
+
+        while not self._stop_event.is_set():
+            due = time.monotonic() - last_refresh >= self.poll_interval
+            if self._refresh_event.is_set() or due:
+                self._refresh_event.clear()
+                self._refresh(mgr)
+                last_refresh = time.monotonic()
+                continue
+
+            if self.notifications:
+                notification = mgr.take_notification(block=True, timeout=1)
+                if notification is not None:
+                    self._refresh_event.set()
+            else:
+                self._refresh_event.wait(timeout=1)
+
+            if not mgr.connected:
+                raise ConnectionError("NETCONF session closed")
+
+    def run(self):
+        delay = RECONNECT_DELAY
+        while not self._stop_event.is_set():
+            mgr = None
+            try:
+                mgr = netconf_final._connect(self.ip)
+                delay = RECONNECT_DELAY
+                self._serve(mgr)
+            except Exception as e:
+                print(f"Subscriber for {self.ip} failed: {type(e).__name__}: {e}")
+                self.table.mark_stale(self.ip)
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+            finally:
+                if mgr is not None:
+                    netconf_final._close_quietly(mgr)
+        # Stopped: nobody keeps this router's entry current any more
+        self.table.mark_stale(self.ip)
@@ -1,5 +1,13 @@
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
 from typing import Optional, List
 from netmiko import ConnectHandler
+import bulk
+import metrics
+import tenants
 
 # Allowed router IPs
 ALLOWED_IPS = {
@@ -14,6 +22,19 @@ USERNAME = "admin"
 PASSWORD = "cisco"
 
 
+# Netmiko timing profiles; pick one with NETMIKO_TIMING_PROFILE
+TIMING_PROFILES = {
+    # Trust the prompt and skip the extra sleeps (default)
+    "fast": {"fast_cli": True, "global_delay_factor": 1, "conn_timeout": 10},
+    # Conservative delays for slow or overloaded routers
+    "safe": {"fast_cli": False, "global_delay_factor": 2, "conn_timeout": 20},
+}
+TIMING_PROFILE = os.environ.get("NETMIKO_TIMING_PROFILE", "fast")
+
+# Cached SSH sessions
+IDLE_TIMEOUT = 300  # seconds an unused CLI session is kept open
+
+
 def _require_ip(ip: Optional[str]):
     if not ip:
         return "Error: No IP specified"
@@ -22,14 +43,191 @@ def _require_ip(ip: Optional[str]):
     return None
 
 
-def _device_params(ip: str):
-    return {
+def _device_params(ip: str, profile: Optional[str] = None):
+    params = {
         "device_type": "cisco_ios",
         "ip": ip,
         "username": USERNAME,
         "password": PASSWORD,
-        "fast_cli": False,
     }
+    params.update(TIMING_PROFILES.get(profile or TIMING_PROFILE, TIMING_PROFILES["safe"]))
+    return params
+
+
+class _CachedConnection:
+    def __init__(self):
+        self.lock = threading.Lock()  # one command stream per SSH session
+        self.conn = None
+        self.last_used = 0.0
+
+
+_cache = {}  # ip -> _CachedConnection
+_cache_lock = threading.Lock()
+
+
+def _disconnect_quietly(conn):
+    try:
+        conn.disconnect()
+    except Exception:
+        pass
+
+
+def _open_connection(ip: str):
+    with metrics.stage("device_connect"):
+        conn = ConnectHandler(**_device_params(ip))
+        # Once per session instead of once per command
+        conn.send_command("terminal length 0", expect_string=r"#", strip_prompt=True)
+    return conn
+
+
+def _is_usable(conn) -> bool:
+    """Re-verify the session: transport alive and back at a privileged prompt."""
+    try:
+        return conn.is_alive() and conn.find_prompt().strip().endswith("#")
+    except Exception:
+        return False
+
+
+def _evict_idle():
+    cutoff = time.monotonic() - IDLE_TIMEOUT
+    with _cache_lock:
+        entries = list(_cache.values())
+    for entry in entries:
+        # Skip sessions that are busy right now
+        if entry.conn is not None and entry.lock.acquire(blocking=False):
+            try:
+                if entry.conn is not None and entry.last_used < cutoff:
+                    _disconnect_quietly(entry.conn)
+                    entry.conn = None
+            finally:
+                entry.lock.release()
+
+
+@contextmanager
+def _connection(ip: str, fresh: bool = False):
+    """Borrow the cached CLI session for `ip`, reconnecting if it went stale."""
+    _evict_idle()
+    with _cache_lock:
+        entry = _cache.setdefault(ip, _CachedConnection())
+
+    with entry.lock:
+        if entry.conn is not None and (fresh or not _is_usable(entry.conn)):
+            _disconnect_quietly(entry.conn)
+            entry.conn = None
+        if entry.conn is None:
+            entry.conn = _open_connection(ip)
+        try:
+            yield entry.conn
+        except Exception:
+            # Don't hand a half-broken session to the next caller
+            _disconnect_quietly(entry.conn)
+            entry.conn = None
+            raise
+        finally:
+            entry.last_used = time.monotonic()
+
+
+def _run(ip: str, fn):
+    """
+    Run fn(ssh) on the cached session. If the session fails mid-command,
+    reconnect once and retry (only used for read-only show commands).
+    """
+    try:
+        with _connection(ip) as ssh, metrics.stage("rpc"):
+            return fn(ssh)
+    except Exception as e:
+        print(f"CLI session to {ip} failed ({type(e).__name__}), reconnecting")
+    with _connection(ip, fresh=True) as ssh, metrics.stage("rpc"):
+        return fn(ssh)
+
+
+def close_connections():
+    with _cache_lock:
+        entries = list(_cache.values())
+    for entry in entries:
+        with entry.lock:
+            if entry.conn is not None:
+                _disconnect_quietly(entry.conn)
+                entry.conn = None
+
+
+atexit.register(close_connections)
+
+
+def _gigabit_summary(ssh) -> str:
+    up = 0
+    down = 0
+    admin_down = 0
+
+    result = ssh.send_command("show ip interface brief", use_textfsm=True)
+
+    # If TextFSM returned structured data (list of dicts)
+    if isinstance(result, list) and result and isinstance(result[0], dict):
+        details: List[str] = []
+        for entry in result:
+            iface = entry.get("intf", "") or entry.get("interface", "")
+            if not iface or not iface.startswith("GigabitEthernet"):
+                continue
+            # Netmiko templates typically expose 'status' and 'proto'
+            status_val = (entry.get("status") or "").strip().lower()
+            if status_val == "up":
+                up += 1
+                norm = "up"
+            elif status_val == "down":
+                down += 1
+                norm = "down"
+            elif status_val == "administratively down":
+                admin_down += 1
+                norm = "administratively down"
+            else:
+                # unknown -> count as down
+                down += 1
+                norm = "down"
+            details.append(f"{iface} {norm}")
+
+        detail = ", ".join(details)
+        summary = f"-> {up} up, {down} down, {admin_down} administratively down"
+        return f"{detail} {summary}".strip()
+
+    # Fallback: raw text parsing
+    raw = result if isinstance(result, str) else ssh.send_command(
+        "show ip interface brief"
+    )
+    details: List[str] = []
+    for line in raw.splitlines():
+        parts = line.split()
+        if not parts:
+            continue
+        iface = parts[0]
+        if not iface.startswith("GigabitEthernet"):
+            continue
+
+        # Determine status from the line preserving "administratively down"
+        status_str = ""
+        if "administratively down" in line:
+            status_str = "administratively down"
+        else:
+            # Try second-to-last token for "Status"
+            if len(parts) >= 2:
+                status_str = parts[-2].lower()
+                if status_str not in ("up", "down"):
+                    status_str = parts[-1].lower()
+
+        if status_str == "up":
+            up += 1
+            norm = "up"
+        elif status_str == "administratively down":
+            admin_down += 1
+            norm = "administratively down"
+        else:
+            down += 1
+            norm = "down"
+
+        details.append(f"{iface} {norm}")
+
+    detail = ", ".join(details)
+    summary = f"-> {up} up, {down} down, {admin_down} administratively down"
+    return f"{detail} {summary}".strip()
 
 
 def gigabit_status(ip: Optional[str] = None) -> str:
@@ -41,86 +239,8 @@ def gigabit_status(ip: Optional[str] = None) -> str:
     if err:
         return err
 
-    params = _device_params(ip)
-
     try:
-        with ConnectHandler(**params) as ssh:
-            ssh.send_command("terminal length 0", expect_string=r"#", strip_prompt=True)
-
-            up = 0
-            down = 0
-            admin_down = 0
-
-            result = ssh.send_command("show ip interface brief", use_textfsm=True)
-
-            # If TextFSM returned structured data (list of dicts)
-            if isinstance(result, list) and result and isinstance(result[0], dict):
-                details: List[str] = []
-                for entry in result:
-                    iface = entry.get("intf", "") or entry.get("interface", "")
-                    if not iface or not iface.startswith("GigabitEthernet"):
-                        continue
-                    # Netmiko templates typically expose 'status' and 'proto'
-                    status_val = (entry.get("status") or "").strip().lower()
-                    if status_val == "up":
-                        up += 1
-                        norm = "up"
-                    elif status_val == "down":
-                        down += 1
-                        norm = "down"
-                    elif status_val == "administratively down":
-                        admin_down += 1
-                        norm = "administratively down"
-                    else:
-                        # unknown -> count as down
-                        down += 1
-                        norm = "down"
-                    details.append(f"{iface} {norm}")
-
-                detail = ", ".join(details)
-                summary = f"-> {up} up, {down} down, {admin_down} administratively down"
-                return f"{detail} {summary}".strip()
-
-            # Fallback: raw text parsing
-            raw = result if isinstance(result, str) else ssh.send_command(
-                "show ip interface brief"
-            )
-            details: List[str] = []
-            for line in raw.splitlines():
-                parts = line.split()
-                if not parts:
-                    continue
-                iface = parts[0]
-                if not iface.startswith("GigabitEthernet"):
-                    continue
-
-                # Determine status from the line preserving "administratively down"
-                status_str = ""
-                if "administratively down" in line:
-                    status_str = "administratively down"
-                else:
-                    # Try second-to-last token for "Status"
-                    if len(parts) >= 2:
-                        status_str = parts[-2].lower()
-                        if status_str not in ("up", "down"):
-                            status_str = parts[-1].lower()
-
-                if status_str == "up":
-                    up += 1
-                    norm = "up"
-                elif status_str == "administratively down":
-                    admin_down += 1
-                    norm = "administratively down"
-                else:
-                    down += 1
-                    norm = "down"
-
-                details.append(f"{iface} {norm}")
-
-            detail = ", ".join(details)
-            summary = f"-> {up} up, {down} down, {admin_down} administratively down"
-            return f"{detail} {summary}".strip()
-
+        return _run(ip, _gigabit_summary)
     except Exception as e:
         return f"Error: {type(e).__name__}: {e}"
 
@@ -135,14 +255,175 @@ def motd_get(ip: Optional[str] = None) -> str:
         return err
 
     try:
-        with ConnectHandler(**_device_params(ip)) as ssh:
-            ssh.send_command("terminal length 0", expect_string=r"#", strip_prompt=True)
-            output = ssh.send_command(
+        output = _run(
+            ip,
+            lambda ssh: ssh.send_command(
                 "show banner motd", strip_prompt=True, strip_command=True
-            )
-            text = (output or "").strip()
-            if not text or "not configured" in text.lower():
-                return "Error: No MOTD Configured"
-            return text
+            ),
+        )
+        text = (output or "").strip()
+        if not text or "not configured" in text.lower():
+            return "Error: No MOTD Configured"
+        return text
     except Exception as e:
         return f"Error: {type(e).__name__}: {e}"
+
+
+# --------------------------------------------------------------
+# Loopback operations over the CLI (same replies as restconf/netconf)
+# --------------------------------------------------------------
+
+def _loopback_status(ssh) -> Optional[str]:
+    """'up', 'down', 'administratively down', or None if the interface is absent."""
+    name = tenants.loopback_name()
+    output = ssh.send_command(f"show ip interface brief {name}")
+    for line in output.splitlines():
+        if line.startswith(name):
+            if "administratively down" in line:
+                return "administratively down"
+            parts = line.split()
+            return parts[-2].lower() if len(parts) >= 2 else "down"
+    return None
+
+
+def _config_change(ip: str, check, commands: List[str], ok_msg: str, fail_msg: str) -> str:
+    """
+    Run `check(current_status)` and, when it passes, push `commands`.
+    Not retried on failure: configuration changes are not idempotent.
+    Connection and session errors are raised, not turned into `fail_msg`,
+    so they are reported as errors and count as failures for "auto".
+    """
+    with _connection(ip) as ssh, metrics.stage("rpc"):
+        if not check(_loopback_status(ssh)):
+            return fail_msg
+        output = ssh.send_config_set(commands)
+        if "Invalid input" in output or "% " in output:
+            print(output)
+            return fail_msg
+        return ok_msg
+
+
+def create(ip: Optional[str] = None) -> str:
+    err = _require_ip(ip)
+    if err:
+        return err
+    return _config_change(
+        ip,
+        lambda current: current is None,
+        [
+            f"interface {tenants.loopback_name()}",
+            f"description Created by {tenants.student_id()}",
+            "ip address 172.1.1.1 255.255.255.0",
+            "no shutdown",
+        ],
+        f"{tenants.interface_label()} is created successfully",
+        f"Cannot create: {tenants.interface_label()}",
+    )
+
+
+def delete(ip: Optional[str] = None) -> str:
+    err = _require_ip(ip)
+    if err:
+        return err
+    return _config_change(
+        ip,
+        lambda current: current is not None,
+        [f"no interface {tenants.loopback_name()}"],
+        f"{tenants.interface_label()} is deleted successfully",
+        f"Cannot delete: {tenants.interface_label()}",
+    )
+
+
+def enable(ip: Optional[str] = None) -> str:
+    err = _require_ip(ip)
+    if err:
+        return err
+    return _config_change(
+        ip,
+        lambda current: current == "administratively down",
+        [f"interface {tenants.loopback_name()}", "no shutdown"],
+        f"{tenants.interface_label()} is enabled successfully",
+        f"Cannot enable: {tenants.interface_label()}",
+    )
+
+
+def disable(ip: Optional[str] = None) -> str:
+    err = _require_ip(ip)
+    if err:
+        return err
+    return _config_change(
+        ip,
+        lambda current: current is not None and current != "administratively down",
+        [f"interface {tenants.loopback_name()}", "shutdown"],
+        f"{tenants.interface_label()} is shutdowned successfully",
+        f"Cannot shutdown: {tenants.interface_label()}",
+    )
+
+
+def status(ip: Optional[str] = None) -> str:
+    err = _require_ip(ip)
+    if err:
+        return err
+    try:
+        current = _run(ip, _loopback_status)
+    except Exception as e:
+        print("Error!", e)
+        return f"Cannot read status: {tenants.interface_label()}"
+    if current is None:
+        return f"No {tenants.interface_label()}"
+    if current == "up":
+        return f"{tenants.interface_label()} is enabled"
+    return f"{tenants.interface_label()} is disabled"
+
+
+# --------------------------------------------------------------
+# Bulk loopback operations: one read, then one send_config_set
+# --------------------------------------------------------------
+
+def _loopbacks(ssh) -> dict:
+    """name -> enabled for every loopback on the router."""
+    output = ssh.send_command("show ip interface brief | include ^Loopback")
+    current = {}
+    for line in output.splitlines():
+        parts = line.split()
+        if parts and parts[0].startswith("Loopback"):
+            current[parts[0]] = "administratively down" not in line
+    return current
+
+
+def _bulk_commands(action: str, names: List[str]) -> List[str]:
+    commands = []
+    for name in names:
+        if action == "delete":
+            commands.append(f"no interface {name}")
+        elif action == "create":
+            commands += [
+                f"interface {name}",
+                f"description Created by {tenants.student_id()}",
+                "no shutdown",
+            ]
+        else:
+            commands += [f"interface {name}", "no shutdown" if action == "enable" else "shutdown"]
+    return commands
+
+
+def bulk_apply(ip: Optional[str], action: str, names: List[str]) -> dict:
+    """Apply `action` to every loopback in `names`; returns name -> bulk outcome."""
+    err = _require_ip(ip)
+    if err:
+        raise ValueError(err)
+
+    changes, outcomes = list(names), {}
+    try:
+        with _connection(ip) as ssh, metrics.stage("rpc"):
+            changes, outcomes = bulk.plan(action, _loopbacks(ssh), names)
+            if not changes:
+                return outcomes
+            output = ssh.send_config_set(_bulk_commands(action, changes))
+            if "Invalid input" in output or "% " in output:
+                print(output)
+                return bulk.finish(outcomes, changes, False)
+            return bulk.finish(outcomes, changes, True)
+    except Exception as e:
+        print("Error!", e)
+    return bulk.finish(outcomes, changes, False)
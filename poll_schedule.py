@@ -0,0 +1,55 @@
+import random
+import time
+from typing import Optional
+
+MIN_INTERVAL = 1.0  # seconds between polls while the room is active
+MAX_INTERVAL = 10.0  # ceiling while the room is idle
+ACTIVE_WINDOW = 60.0  # the room counts as active this long after a message
+ERROR_MAX_INTERVAL = 60.0  # ceiling of the backoff after failed polls
+
+
+class PollSchedule:
+    """
+    Decides how long to sleep before the next poll of the messages API.
+
+    Polls stay MIN_INTERVAL apart while commands keep arriving (and for
+    ACTIVE_WINDOW seconds after the last one); once the room goes quiet the
+    interval doubles per empty poll up to MAX_INTERVAL. Failed polls back
+    off exponentially with full jitter up to ERROR_MAX_INTERVAL, or wait
+    for the server's Retry-After when it sent one.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = MIN_INTERVAL,
+        max_interval: float = MAX_INTERVAL,
+        active_window: float = ACTIVE_WINDOW,
+        error_max_interval: float = ERROR_MAX_INTERVAL,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.active_window = active_window
+        self.error_max_interval = max(error_max_interval, min_interval)
+        self.interval = min_interval
+        self.errors = 0
+        self._last_activity = None
+
+    def success(self, processed: int) -> float:
+        """Delay after a poll that went through and found `processed` messages."""
+        self.errors = 0
+        now = time.monotonic()
+        if processed:
+            self._last_activity = now
+        if self._last_activity is not None and now - self._last_activity < self.active_window:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * 2)
+        return self.interval
+
+    def failure(self, retry_after: Optional[float] = None) -> float:
+        """Delay after a failed poll."""
+        self.errors += 1
+        if retry_after is not None:
+            return max(retry_after, self.min_interval)
+        ceiling = min(self.error_max_interval, self.min_interval * 2 ** self.errors)
+        return random.uniform(self.min_interval, ceiling)
@@ -0,0 +1,154 @@
+import cProfile
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+SAMPLE_INTERVAL = 0.005  # seconds between stack samples in "sample" mode
+
+# "sample": a side thread records the command thread's stack every
+#           SAMPLE_INTERVAL and writes folded stacks (flamegraph.pl, speedscope,
+#           inferno); low overhead, statistical
+# "cprofile": deterministic cProfile, written as .pstats (snakeviz,
+#           gprof2dot, flameprof); exact call counts, higher overhead
+MODES = ("sample", "cprofile")
+
+
+class _StackSampler(threading.Thread):
+    """Counts the stacks one thread is in, sampled every `interval` seconds."""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_fold(frame)] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _fold(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        filename = os.path.basename(code.co_filename)
+        names.append(f"{code.co_name} ({filename}:{code.co_firstlineno})")
+        frame = frame.f_back
+    # Root first, as the folded format expects; ';' separates frames
+    return ";".join(reversed(names))
+
+
+def _safe(tag: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "-", tag or "none")
+
+
+class CommandProfiler:
+    """
+    Profiles a random `rate` fraction of commands and writes one file per
+    profiled command into `out_dir`, named
+    <time>_<command>_<method>_<n>.folded (or .pstats), so runs before and
+    after a change can be compared per command type.
+    """
+
+    def __init__(
+        self,
+        rate: float = 0.0,
+        out_dir: str = PROFILE_DIR,
+        mode: str = "sample",
+        interval: float = SAMPLE_INTERVAL,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode {mode} (use {' or '.join(MODES)})")
+        self.rate = rate
+        self.out_dir = out_dir
+        self.mode = mode
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._seq = 0
+        # Only one cProfile can be active per process on newer Pythons
+        self._cprofile_busy = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _path(self, command: str, method: str, ext: str) -> str:
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        name = f"{stamp}_{_safe(command)}_{_safe(method)}_{seq}.{ext}"
+        return os.path.join(self.out_dir, name)
+
+    @contextmanager
+    def profile(self, command: str, method: str = None):
+        """Profile the block for a `rate` fraction of calls; no-op otherwise."""
+        if not self.enabled or random.random() >= self.rate:
+            yield
+            return
+        if self.mode == "cprofile":
+            with self._cprofile(command, method):
+                yield
+        else:
+            with self._sample(command, method):
+                yield
+
+    @contextmanager
+    def _sample(self, command: str, method: str):
+        sampler = _StackSampler(threading.get_ident(), self.interval)
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            self._write_folded(self._path(command, method, "folded"), sampler.stacks)
+
+    @contextmanager
+    def _cprofile(self, command: str, method: str):
+        if not self._cprofile_busy.acquire(blocking=False):
+            # Another command is being profiled; skip rather than wait
+            yield
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+            self._write(profile.dump_stats, self._path(command, method, "pstats"))
+        finally:
+            self._cprofile_busy.release()
+
+    def _write_folded(self, path: str, stacks: Counter):
+        if not stacks:
+            return
+
+        def dump(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+
+        self._write(dump, path)
+
+    def _write(self, dump, path: str):
+        try:
+            os.makedirs(self.out_dir, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            dump(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print("Cannot write profile:", e)
@@ -1,5 +1,15 @@
+import atexit
 import json
+import threading
+import time
 import requests
+import bulk
+import metrics
+import tenants
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
 
 requests.packages.urllib3.disable_warnings()
 
@@ -20,8 +30,11 @@ headers = {
 }
 basicauth = ("admin", "cisco")
 
-IF_NAME = "Loopback66070101"
-IF_PATH = f"ietf-interfaces:interfaces/interface={IF_NAME}"
+# HTTP session tuning (one keep-alive session per router)
+POOL_MAXSIZE = 4  # pooled TCP/TLS connections kept per router
+CONNECT_TIMEOUT = 5  # seconds
+READ_TIMEOUT = 30  # seconds
+SESSION_MAX_AGE = 900  # seconds before a session is recycled
 
 
 def _require_ip(ip: str | None):
@@ -32,8 +45,243 @@ def _require_ip(ip: str | None):
     return None
 
 
+# --------------------------------------------------------------
+# Connection timing
+#   requests opens TCP/TLS connections lazily inside a request. These
+#   urllib3 classes time each new connection as the device_connect stage,
+#   and _request leaves that time out of the rpc stage, like the NETCONF
+#   and Netmiko pools do.
+# --------------------------------------------------------------
+_connect_time = threading.local()
+
+
+def _timed_connect(connect):
+    def timed(self):
+        start = time.perf_counter()
+        try:
+            with metrics.stage("device_connect"):
+                connect(self)
+        finally:
+            _connect_time.seconds = (
+                getattr(_connect_time, "seconds", 0.0) + time.perf_counter() - start
+            )
+
+    return timed
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    connect = _timed_connect(HTTPConnection.connect)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    connect = _timed_connect(HTTPSConnection.connect)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class RestconfSessionManager:
+    """
+    Keeps one requests.Session per router so consecutive RESTCONF calls
+    reuse the same TCP/TLS connection instead of handshaking every time.
+    Sessions are recycled after max_age seconds or on demand.
+    """
+
+    def __init__(
+        self,
+        pool_maxsize: int = POOL_MAXSIZE,
+        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+        max_age: float = SESSION_MAX_AGE,
+    ):
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._sessions = {}  # ip -> (session, created_at)
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        session.auth = basicauth
+        session.headers.update(headers)
+        session.verify = False
+        # Retry once when a pooled keep-alive connection was dropped by the router.
+        # Not PUT: if the first one was applied, the retry of a create gets a
+        # status other than 201 and the reply would say it failed
+        retries = Retry(
+            total=1,
+            connect=1,
+            read=1,
+            status=0,
+            allowed_methods=frozenset({"GET", "DELETE"}),
+            raise_on_status=False,
+        )
+        adapter = _TimedAdapter(
+            pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=retries
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def get(self, ip: str) -> requests.Session:
+        stale = None
+        with self._lock:
+            entry = self._sessions.get(ip)
+            if entry and time.monotonic() - entry[1] > self.max_age:
+                stale = entry[0]
+                entry = None
+            if entry is None:
+                entry = (self._new_session(), time.monotonic())
+                self._sessions[ip] = entry
+        if stale is not None:
+            stale.close()
+        return entry[0]
+
+    def request(self, ip: str, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        # Per request: REQUESTS_CA_BUNDLE in the environment overrides session.verify
+        kwargs.setdefault("verify", False)
+        try:
+            return self.get(ip).request(method, url, **kwargs)
+        except requests.exceptions.ConnectionError:
+            # Do not keep a broken pool around for the next command
+            self.recycle(ip)
+            raise
+
+    def recycle(self, ip: str):
+        """Close the session for `ip`; the next call opens a fresh one."""
+        with self._lock:
+            entry = self._sessions.pop(ip, None)
+        if entry:
+            entry[0].close()
+
+    def close(self):
+        with self._lock:
+            entries = list(self._sessions.values())
+            self._sessions.clear()
+        for session, _ in entries:
+            session.close()
+
+
+_sessions = RestconfSessionManager()
+atexit.register(_sessions.close)
+
+
+def _request(ip: str, method: str, url: str, **kwargs) -> requests.Response:
+    # A new TCP/TLS connection is timed as device_connect, the rest as rpc
+    _connect_time.seconds = 0.0
+    start = time.perf_counter()
+    try:
+        return _sessions.request(ip, method, url, **kwargs)
+    finally:
+        metrics.observe("rpc", time.perf_counter() - start - _connect_time.seconds)
+
+
+# Optional per-router address override, e.g. {"10.0.15.61": "127.0.0.1:8443"}
+# (used to point the bot at local stand-ins)
+ENDPOINTS = {}
+
+
+def _base_url(ip: str) -> str:
+    return f"https://{ENDPOINTS.get(ip, ip)}/restconf/data"
+
+
 def _api_url(ip: str) -> str:
-    return f"https://{ip}/restconf/data/{IF_PATH}"
+    return f"{_base_url(ip)}/ietf-interfaces:interfaces/interface={tenants.loopback_name()}"
+
+
+# --------------------------------------------------------------
+# Conditional writes
+#   Every response carrying ETag/Last-Modified refreshes a local hint of
+#   the interface state. enable/disable then send one PATCH guarded by
+#   If-Match (or If-Unmodified-Since) instead of GET + PATCH. A 412 means
+#   the hint went stale and we fall back to read-then-write.
+# --------------------------------------------------------------
+_hints = {}  # (ip, interface) -> {"enabled": bool, "etag": str|None, "last_modified": str|None}
+_hints_lock = threading.Lock()
+_no_conditional = set()  # routers that do not send validators
+_rejects_conditional = set()  # routers that refuse conditional PATCHes
+
+
+def _remember(ip: str, resp: requests.Response, enabled: bool | None):
+    etag = resp.headers.get("ETag")
+    last_modified = resp.headers.get("Last-Modified")
+    key = (ip, tenants.loopback_name())
+    with _hints_lock:
+        if enabled is None:
+            _hints.pop(key, None)
+            return
+        _hints[key] = {"enabled": enabled, "etag": etag, "last_modified": last_modified}
+
+
+def _remember_read(ip: str, resp: requests.Response, enabled: bool):
+    """Record a full GET of the interface; routers without validators are noted."""
+    if not resp.headers.get("ETag") and not resp.headers.get("Last-Modified"):
+        _no_conditional.add(ip)
+    else:
+        _no_conditional.discard(ip)
+    _remember(ip, resp, enabled)
+
+
+def _forget(ip: str, names=None):
+    with _hints_lock:
+        for name in [tenants.loopback_name()] if names is None else names:
+            _hints.pop((ip, name), None)
+
+
+def _get_hint(ip: str) -> dict | None:
+    if ip in _no_conditional or ip in _rejects_conditional:
+        return None
+    with _hints_lock:
+        hint = _hints.get((ip, tenants.loopback_name()))
+        if hint and (hint["etag"] or hint["last_modified"]):
+            return dict(hint)
+    return None
+
+
+def _if_match(hint: dict) -> dict:
+    # Last-Modified only has 1-second resolution: a change made in the same
+    # second as the read it was based on is not detected. ETags are exact.
+    if hint["etag"]:
+        return {"If-Match": hint["etag"]}
+    return {"If-Unmodified-Since": hint["last_modified"]}
+
+
+def _precondition(ip: str, resp: requests.Response) -> dict:
+    """If-Match headers that make a write fail if the interface changed since `resp`."""
+    etag = resp.headers.get("ETag")
+    last_modified = resp.headers.get("Last-Modified")
+    if ip in _rejects_conditional or not (etag or last_modified):
+        return {}
+    return _if_match({"etag": etag, "last_modified": last_modified})
+
+
+def _if_none_match(hint: dict) -> dict:
+    if hint["etag"]:
+        return {"If-None-Match": hint["etag"]}
+    return {"If-Modified-Since": hint["last_modified"]}
+
+
+def _read_enabled(resp: requests.Response) -> bool:
+    data = {}
+    try:
+        data = resp.json().get("ietf-interfaces:interface", {})
+    except Exception:
+        pass
+    return bool(data.get("enabled", False))
 
 
 def create(ip: str | None = None):
@@ -45,9 +293,9 @@ def create(ip: str | None = None):
 
     yangConfig = {
         "ietf-interfaces:interface": {
-            "name": IF_NAME,
+            "name": tenants.loopback_name(),
             "type": "iana-if-type:softwareLoopback",
-            "description": "Created by 66070101",
+            "description": f"Created by {tenants.student_id()}",
             "enabled": True,
             "ietf-ip:ipv4": {
                 "address": [{"ip": "172.1.1.1", "netmask": "255.255.255.0"}]
@@ -56,16 +304,15 @@ def create(ip: str | None = None):
         }
     }
 
-    resp = requests.put(
-        api_url, data=json.dumps(yangConfig), auth=basicauth, headers=headers, verify=False
-    )
+    resp = _request(ip, "PUT", api_url, data=json.dumps(yangConfig))
 
     if 200 <= resp.status_code <= 299:
         print("STATUS OK: {}".format(resp.status_code))
+        _remember(ip, resp, True)
         return (
-            "Interface loopback 66070101 is created successfully"
+            f"{tenants.interface_label()} is created successfully"
             if resp.status_code == 201
-            else "Cannot create: Interface loopback 66070101"
+            else f"Cannot create: {tenants.interface_label()}"
         )
     else:
         print("Error. Status Code: {}".format(resp.status_code))
@@ -73,7 +320,7 @@ def create(ip: str | None = None):
             print(resp.text)
         except Exception:
             pass
-        return "Cannot create: Interface loopback 66070101"
+        return f"Cannot create: {tenants.interface_label()}"
 
 
 def delete(ip: str | None = None):
@@ -83,123 +330,156 @@ def delete(ip: str | None = None):
 
     api_url = _api_url(ip)
 
-    resp = requests.delete(api_url, auth=basicauth, headers=headers, verify=False)
+    resp = _request(ip, "DELETE", api_url)
+    _forget(ip)
 
     if 200 <= resp.status_code <= 299:
         print("STATUS OK: {}".format(resp.status_code))
-        return "Interface loopback 66070101 is deleted successfully"
+        return f"{tenants.interface_label()} is deleted successfully"
     elif resp.status_code == 404:
         print("STATUS NOT FOUND: {}".format(resp.status_code))
-        return "Cannot delete: Interface loopback 66070101"
+        return f"Cannot delete: {tenants.interface_label()}"
     else:
         print("Error. Status Code: {}".format(resp.status_code))
         try:
             print(resp.text)
         except Exception:
             pass
-        return "Cannot delete: Interface loopback 66070101"
+        return f"Cannot delete: {tenants.interface_label()}"
 
 
-def enable(ip: str | None = None):
-    err = _require_ip(ip)
-    if err:
-        return err
+def _set_enabled_messages(want: bool) -> dict:
+    if want:
+        return {
+            "ok": f"{tenants.interface_label()} is enabled successfully",
+            "cannot": f"Cannot enable: {tenants.interface_label()}",
+            "not_found": f"Cannot enable: {tenants.interface_label()} not found",
+            "read_failed": "Cannot enable: failed to read current state",
+            "conflict": f"Cannot enable: {tenants.interface_label()} changed meanwhile, try again",
+        }
+    return {
+        "ok": f"{tenants.interface_label()} is shutdowned successfully",
+        "cannot": f"Cannot shutdown: {tenants.interface_label()}",
+        "not_found": f"Cannot disable: {tenants.interface_label()} not found",
+        "read_failed": "Cannot disable: failed to read current state",
+        "conflict": f"Cannot disable: {tenants.interface_label()} changed meanwhile, try again",
+    }
+
+
+def _patch_enabled(ip: str, api_url: str, want: bool, extra_headers=None):
+    yangConfig = {"ietf-interfaces:interface": {"enabled": want}}
+    return _request(
+        ip, "PATCH", api_url, data=json.dumps(yangConfig), headers=extra_headers
+    )
+
+
+def _set_enabled_conditional(ip: str, api_url: str, want: bool):
+    """
+    One round trip when the local hint is usable.
+    Returns (message, None) when done, or (None, state_resp) to fall back,
+    where state_resp is a fresh GET response if one was already made.
+    """
+    msgs = _set_enabled_messages(want)
+    hint = _get_hint(ip)
+    if hint is None:
+        return None, None
+
+    if hint["enabled"] == want:
+        # Hint says there is nothing to do; confirm with a conditional GET
+        resp = _request(ip, "GET", api_url, headers=_if_none_match(hint))
+        if resp.status_code == 304:
+            return msgs["cannot"], None
+        return None, resp
+
+    resp = _patch_enabled(ip, api_url, want, _if_match(hint))
+    if 200 <= resp.status_code <= 299:
+        print("STATUS OK (conditional): {}".format(resp.status_code))
+        _remember(ip, resp, want)
+        return msgs["ok"], None
+    if resp.status_code == 404:
+        print("STATUS NOT FOUND: 404")
+        _forget(ip)
+        return msgs["not_found"], None
+    if resp.status_code == 412:
+        print("STATUS PRECONDITION FAILED: 412, re-reading state")
+    else:
+        # Router does not accept conditional requests; stop trying
+        print("Conditional PATCH rejected ({}), using GET + PATCH".format(resp.status_code))
+        _rejects_conditional.add(ip)
+    _forget(ip)
+    return None, None
+
 
+def _set_enabled(ip: str, want: bool):
+    msgs = _set_enabled_messages(want)
     api_url = _api_url(ip)
 
-    # 1) Read current admin state
-    state_resp = requests.get(api_url, auth=basicauth, headers=headers, verify=False)
+    message, state_resp = _set_enabled_conditional(ip, api_url, want)
+    if message:
+        return message
+
+    # 1) Read current admin state (unless the conditional GET already did)
+    if state_resp is None:
+        state_resp = _request(ip, "GET", api_url)
 
     if state_resp.status_code == 404:
         print("STATUS NOT FOUND: 404")
-        return "Cannot enable: Interface loopback 66070101 not found"
+        _forget(ip)
+        return msgs["not_found"]
 
     if 200 <= state_resp.status_code <= 299:
-        data = {}
-        try:
-            data = state_resp.json().get("ietf-interfaces:interface", {})
-        except Exception:
-            pass
-        currently_enabled = bool(data.get("enabled", False))
-
-        # 2) If already enabled, report it
-        if currently_enabled:
-            return "Cannot enable: Interface loopback 66070101"
-
-        # 3) Otherwise, patch to enable
-        yangConfig = {"ietf-interfaces:interface": {"enabled": True}}
-        resp = requests.patch(
-            api_url, data=json.dumps(yangConfig), auth=basicauth, headers=headers, verify=False
-        )
+        currently_enabled = _read_enabled(state_resp)
+        _remember_read(ip, state_resp, currently_enabled)
+
+        # 2) If already in the requested state, report it
+        if currently_enabled == want:
+            return msgs["cannot"]
+
+        # 3) Otherwise, patch it, unless it changed since that read
+        precondition = _precondition(ip, state_resp)
+        resp = _patch_enabled(ip, api_url, want, precondition)
+        if resp.status_code == 412:
+            print("STATUS PRECONDITION FAILED: 412")
+            _forget(ip)
+            return msgs["conflict"]
+        if precondition and not 200 <= resp.status_code <= 299 and resp.status_code != 404:
+            print("Conditional PATCH rejected ({}), retrying without".format(resp.status_code))
+            _rejects_conditional.add(ip)
+            resp = _patch_enabled(ip, api_url, want)
 
         if 200 <= resp.status_code <= 299:
             print("STATUS OK: {}".format(resp.status_code))
-            return "Interface loopback 66070101 is enabled successfully"
+            _remember(ip, resp, want)
+            return msgs["ok"]
         else:
             print("Error. Status Code: {}".format(resp.status_code))
             try:
                 print(resp.text)
             except Exception:
                 pass
-            return "Cannot enable: Interface loopback 66070101"
+            _forget(ip)
+            return msgs["cannot"]
     else:
         print("Error. Status Code (GET): {}".format(state_resp.status_code))
         try:
             print(state_resp.text)
         except Exception:
             pass
-        return "Cannot enable: failed to read current state"
+        return msgs["read_failed"]
 
 
-def disable(ip: str | None = None):
+def enable(ip: str | None = None):
     err = _require_ip(ip)
     if err:
         return err
+    return _set_enabled(ip, True)
 
-    api_url = _api_url(ip)
-
-    # 1) Read current admin state
-    state_resp = requests.get(api_url, auth=basicauth, headers=headers, verify=False)
-
-    if state_resp.status_code == 404:
-        print("STATUS NOT FOUND: 404")
-        return "Cannot disable: Interface loopback 66070101 not found"
-
-    if 200 <= state_resp.status_code <= 299:
-        data = {}
-        try:
-            data = state_resp.json().get("ietf-interfaces:interface", {})
-        except Exception:
-            pass
-        currently_enabled = bool(data.get("enabled", False))
 
-        # 2) If already disabled, report it
-        if not currently_enabled:
-            return "Cannot shutdown: Interface loopback 66070101"
-
-        # 3) Otherwise, patch to disable
-        yangConfig = {"ietf-interfaces:interface": {"enabled": False}}
-        resp = requests.patch(
-            api_url, data=json.dumps(yangConfig), auth=basicauth, headers=headers, verify=False
-        )
-
-        if 200 <= resp.status_code <= 299:
-            print("STATUS OK: {}".format(resp.status_code))
-            return "Interface loopback 66070101 is shutdowned successfully"
-        else:
-            print("Error. Status Code: {}".format(resp.status_code))
-            try:
-                print(resp.text)
-            except Exception:
-                pass
-            return "Cannot shutdown: Interface loopback 66070101"
-    else:
-        print("Error. Status Code (GET): {}".format(state_resp.status_code))
-        try:
-            print(state_resp.text)
-        except Exception:
-            pass
-        return "Cannot disable: failed to read current state"
+def disable(ip: str | None = None):
+    err = _require_ip(ip)
+    if err:
+        return err
+    return _set_enabled(ip, False)
 
 
 def status(ip: str | None = None):
@@ -209,7 +489,7 @@ def status(ip: str | None = None):
 
     api_url_status = _api_url(ip)
 
-    resp = requests.get(api_url_status, auth=basicauth, headers=headers, verify=False)
+    resp = _request(ip, "GET", api_url_status)
 
     if 200 <= resp.status_code <= 299:
         print("STATUS OK: {}".format(resp.status_code))
@@ -219,34 +499,144 @@ def status(ip: str | None = None):
         except Exception:
             pass
 
+        _remember_read(ip, resp, bool(data.get("enabled")))
+
         # admin-status from 'enabled' (True -> up, False -> down)
         admin_status = "up" if data.get("enabled") else "down"
         oper_status = data.get("oper-status", "unknown")
 
         if admin_status == "up" and oper_status == "up":
-            return "Interface loopback 66070101 is enabled"
+            return f"{tenants.interface_label()} is enabled"
 
         if admin_status == "down" and oper_status == "down":
-            return "Interface loopback 66070101 is disabled"
+            return f"{tenants.interface_label()} is disabled"
 
         if admin_status == "up" and oper_status == "unknown":
-            return "Interface loopback 66070101 is enabled"
+            return f"{tenants.interface_label()} is enabled"
 
         if admin_status == "down" and oper_status == "unknown":
-            return "Interface loopback 66070101 is disabled"
+            return f"{tenants.interface_label()} is disabled"
 
         if admin_status == "down" or oper_status == "down":
-            return "Interface loopback 66070101 is disabled"
+            return f"{tenants.interface_label()} is disabled"
 
-        return "Interface loopback 66070101 is enabled"
+        return f"{tenants.interface_label()} is enabled"
 
     elif resp.status_code == 404:
         print("STATUS NOT FOUND: {}".format(resp.status_code))
-        return "No Interface loopback 66070101"
+        _forget(ip)
+        return f"No {tenants.interface_label()}"
     else:
         print("Error. Status Code: {}".format(resp.status_code))
         try:
             print(resp.text)
         except Exception:
             pass
-        return "Cannot read status: Interface loopback 66070101"
\ No newline at end of file
+        return f"Cannot read status: {tenants.interface_label()}"
+
+# --------------------------------------------------------------
+# Bulk loopback operations
+#   One GET of ietf-interfaces:interfaces decides what has to change, then
+#   a single PATCH on the collection carries every entry. Deletes go out as
+#   one YANG Patch (RFC 8072); routers that reject it get per-item DELETEs
+#   over the same keep-alive session.
+# --------------------------------------------------------------
+YANG_PATCH_TYPE = "application/yang-patch+json"
+
+
+def _interfaces_url(ip: str) -> str:
+    return f"{_base_url(ip)}/ietf-interfaces:interfaces"
+
+
+def _read_interfaces(ip: str) -> dict | None:
+    """name -> enabled for every interface of the router, None on failure."""
+    resp = _request(ip, "GET", _interfaces_url(ip))
+    if not 200 <= resp.status_code <= 299:
+        print("Error. Status Code (GET interfaces): {}".format(resp.status_code))
+        return None
+    items = resp.json().get("ietf-interfaces:interfaces", {}).get("interface", [])
+    return {item["name"]: bulk.enabled_value(item.get("enabled")) for item in items}
+
+
+def _patch_interfaces(ip: str, entries: list) -> bool:
+    body = {"ietf-interfaces:interfaces": {"interface": entries}}
+    resp = _request(ip, "PATCH", _interfaces_url(ip), data=json.dumps(body))
+    if 200 <= resp.status_code <= 299:
+        print("STATUS OK (bulk PATCH): {}".format(resp.status_code))
+        return True
+    print("Error. Status Code (bulk PATCH): {}".format(resp.status_code))
+    return False
+
+
+def _delete_interfaces(ip: str, names: list) -> dict:
+    """name -> True/False; one YANG Patch, or one DELETE each as a fallback."""
+    body = {
+        "ietf-yang-patch:yang-patch": {
+            "patch-id": "bulk-delete",
+            "edit": [
+                {"edit-id": str(i), "operation": "delete", "target": f"/interface={name}"}
+                for i, name in enumerate(names, 1)
+            ],
+        }
+    }
+    resp = _request(
+        ip,
+        "PATCH",
+        _interfaces_url(ip),
+        data=json.dumps(body),
+        headers={"Content-Type": YANG_PATCH_TYPE},
+    )
+    if 200 <= resp.status_code <= 299:
+        print("STATUS OK (YANG Patch): {}".format(resp.status_code))
+        return {name: True for name in names}
+    if resp.status_code not in (400, 405, 415, 501):
+        print("Error. Status Code (YANG Patch): {}".format(resp.status_code))
+        return {name: False for name in names}
+
+    print("YANG Patch not supported ({}), deleting one by one".format(resp.status_code))
+    results = {}
+    for name in names:
+        url = f"{_interfaces_url(ip)}/interface={name}"
+        results[name] = 200 <= _request(ip, "DELETE", url).status_code <= 299
+    return results
+
+
+def bulk_apply(ip: str | None, action: str, names: list) -> dict:
+    """Apply `action` to every loopback in `names`; returns name -> bulk outcome."""
+    err = _require_ip(ip)
+    if err:
+        raise ValueError(err)
+
+    changes, outcomes = list(names), {}
+    try:
+        current = _read_interfaces(ip)
+        if current is None:
+            return bulk.failed_all(names)
+        changes, outcomes = bulk.plan(action, current, names)
+        if not changes:
+            return outcomes
+
+        if action == "delete":
+            for name, ok in _delete_interfaces(ip, changes).items():
+                bulk.finish(outcomes, [name], ok)
+        elif action == "create":
+            entries = [
+                {
+                    "name": name,
+                    "type": "iana-if-type:softwareLoopback",
+                    "description": f"Created by {tenants.student_id()}",
+                    "enabled": True,
+                }
+                for name in changes
+            ]
+            bulk.finish(outcomes, changes, _patch_interfaces(ip, entries))
+        else:
+            want = action == "enable"
+            entries = [{"name": name, "enabled": want} for name in changes]
+            bulk.finish(outcomes, changes, _patch_interfaces(ip, entries))
+    except requests.exceptions.RequestException as e:
+        print("Error!", e)
+        return bulk.finish(outcomes, [n for n in changes if n not in outcomes], False)
+
+    _forget(ip, changes)
+    return outcomes
@@ -0,0 +1,66 @@
+import threading
+import time
+from typing import Optional, Tuple
+
+DEFAULT_TTL = 30  # seconds a known interface state is trusted
+
+# Interface states tracked by the cache
+ENABLED = "enabled"
+DISABLED = "disabled"
+ABSENT = "absent"
+
+
+class InterfaceStateCache:
+    """
+    Per-router, per-interface admin state with a TTL.
+
+    Our own successful create/delete/enable/disable calls write the new
+    state through, so a status right after a change does not need to go to
+    the router. Each entry remembers the backend that produced it, so a
+    cached reply can name the transport that actually saw that state.
+    Entries older than ttl seconds count as misses.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}  # (ip, ifname) -> (state, stored_at, source)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, ip: str, ifname: str) -> Optional[str]:
+        return self.lookup(ip, ifname)[0]
+
+    def lookup(self, ip: str, ifname: str) -> Tuple[Optional[str], Optional[str]]:
+        """(state, source backend) of a fresh entry, (None, None) on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((ip, ifname))
+            if entry and now - entry[1] <= self.ttl:
+                self.hits += 1
+                return entry[0], entry[2]
+            if entry:
+                del self._entries[(ip, ifname)]
+            self.misses += 1
+            return None, None
+
+    def put(self, ip: str, ifname: str, state: str, source: Optional[str] = None):
+        with self._lock:
+            self._entries[(ip, ifname)] = (state, time.monotonic(), source)
+
+    def invalidate(self, ip: str, ifname: Optional[str] = None):
+        with self._lock:
+            if ifname is not None:
+                self._entries.pop((ip, ifname), None)
+                return
+            for key in [k for k in self._entries if k[0] == ip]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "ttl": self.ttl,
+            }
@@ -0,0 +1,154 @@
+import contextvars
+import json
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Student served when no tenant is active (single-room setup, direct calls)
+DEFAULT_STUDENT_ID = "66070101"
+
+
+class Tenant:
+    """
+    One student in one Webex room: messages in `room_id` that start with
+    "/<student_id> " belong to it. `method`, `default_router` and `hedging`
+    are its session state; they change with the "<method>", "router <ip>"
+    and "hedge on|off" commands and start from the config.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        room_id: str,
+        student_id: str,
+        method: Optional[str] = None,
+        default_router: Optional[str] = None,
+        hedging: bool = False,
+    ):
+        self.name = name
+        self.room_id = room_id
+        self.student_id = student_id
+        self.method = method
+        self.default_router = default_router
+        self.hedging = hedging
+
+    @property
+    def prefix(self) -> str:
+        return f"/{self.student_id} "
+
+    @property
+    def loopback(self) -> str:
+        return f"Loopback{self.student_id}"
+
+    def __repr__(self):
+        return f"Tenant({self.name!r}, student {self.student_id})"
+
+
+class TenantRegistry:
+    """Tenants by room and message prefix; the first one is the default."""
+
+    def __init__(self, tenants: List[Tenant]):
+        if not tenants:
+            raise ValueError("At least one tenant is required")
+        self._tenants = list(tenants)
+        self._rooms = {}  # room_id -> [Tenant, ...]
+        seen = set()
+        for tenant in self._tenants:
+            key = (tenant.room_id, tenant.student_id)
+            if key in seen:
+                raise ValueError(
+                    f"Student {tenant.student_id} is configured twice for one room"
+                )
+            seen.add(key)
+            self._rooms.setdefault(tenant.room_id, []).append(tenant)
+
+    @property
+    def default(self) -> Tenant:
+        return self._tenants[0]
+
+    def __iter__(self):
+        return iter(self._tenants)
+
+    def __len__(self):
+        return len(self._tenants)
+
+    def rooms(self) -> Dict[str, List[Tenant]]:
+        return {room_id: list(tenants) for room_id, tenants in self._rooms.items()}
+
+    def get(self, room_id: str, student_id: str) -> Optional[Tenant]:
+        for tenant in self._rooms.get(room_id, ()):
+            if tenant.student_id == student_id:
+                return tenant
+        return None
+
+    def match(self, room_id: str, message: str) -> Tuple[Optional[Tenant], Optional[str]]:
+        """(tenant, command text after its prefix), or (None, None) if nobody's."""
+        for tenant in self._rooms.get(room_id, ()):
+            if message.startswith(tenant.prefix):
+                return tenant, message[len(tenant.prefix) :]
+        return None, None
+
+
+def load(path: Optional[str], default: Tenant) -> TenantRegistry:
+    """
+    Read tenants from a JSON file:
+      {"tenants": [{"name": "alice", "room_id": "...", "student_id": "66070101",
+                    "method": "restconf", "default_router": "10.0.15.61",
+                    "hedging": true}, ...]}
+    Without a path only `default` is served; "hedging" defaults to its setting.
+    """
+    if not path:
+        return TenantRegistry([default])
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    tenants = []
+    for i, entry in enumerate(config.get("tenants", [])):
+        missing = [key for key in ("room_id", "student_id") if not entry.get(key)]
+        if missing:
+            raise ValueError(f"Tenant {i + 1} in {path} has no {', '.join(missing)}")
+        tenants.append(
+            Tenant(
+                name=entry.get("name") or str(entry["student_id"]),
+                room_id=entry["room_id"],
+                student_id=str(entry["student_id"]),
+                method=entry.get("method"),
+                default_router=entry.get("default_router"),
+                hedging=bool(entry.get("hedging", default.hedging)),
+            )
+        )
+    return TenantRegistry(tenants)
+
+
+# ---------------------------------------
+# Active tenant of the running command
+#   Set around command execution and carried into worker threads like the
+#   metric labels, so the transports build the right interface names
+#   without every call passing them along.
+# ---------------------------------------
+_active = contextvars.ContextVar("tenant", default=None)
+
+
+@contextmanager
+def use(tenant: Optional[Tenant]):
+    token = _active.set(tenant)
+    try:
+        yield tenant
+    finally:
+        _active.reset(token)
+
+
+def current() -> Optional[Tenant]:
+    return _active.get()
+
+
+def student_id() -> str:
+    tenant = _active.get()
+    return tenant.student_id if tenant else DEFAULT_STUDENT_ID
+
+
+def loopback_name() -> str:
+    return f"Loopback{student_id()}"
+
+
+def interface_label() -> str:
+    """How replies name the active student's loopback."""
+    return f"Interface loopback {student_id()}"
@@ -0,0 +1,243 @@
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests_toolbelt.multipart.encoder import MultipartEncoder
+
+import metrics
+
+MAX_ATTEMPTS = 5  # per message, 429s included
+BACKOFF_BASE = 0.5  # seconds before the first retry, doubled every attempt
+BACKOFF_MAX = 30.0
+MAX_RETRY_AFTER = 300.0  # never sleep longer than this on one Retry-After
+TIMEOUT = (5, 30)  # connect, read seconds
+
+# Replies up to SHORT_REPLY characters that are queued for the same room at
+# the same time are joined into one message of at most MAX_MESSAGE characters
+# (Webex rejects markdown over ~7400 bytes)
+SHORT_REPLY = 1000
+MAX_MESSAGE = 7000
+
+# Answers worth retrying; other 4xx will fail the same way again
+TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class _Item:
+    def __init__(self, room_id: str, text: str, file=None):
+        self.room_id = room_id
+        self.text = text
+        self.file = file  # (filename, bytes) or None
+        self.future = Future()
+        self.queued_at = time.perf_counter()
+        # Metric labels of the command that produced the reply
+        self.context = contextvars.copy_context()
+
+    def joinable(self) -> bool:
+        return self.file is None and len(self.text) <= SHORT_REPLY
+
+
+def retry_after(response, default: float) -> float:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return default
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return default
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+def backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff for retry number `attempt` (1-based)."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1)))
+
+
+class WebexOutbox:
+    """
+    Posts replies to Webex from one background worker over one pooled
+    keep-alive session, so a slow or rate-limiting Webex never blocks the
+    threads doing device work.
+
+    Messages go out in the order they were queued. A 429 waits for its
+    Retry-After, connection errors and 5xx are retried with backoff, and
+    short text replies that pile up for the same room while a POST is in
+    flight are sent together as one message.
+
+    send_text/send_file return a Future with the final requests.Response
+    (raises if the message could not be delivered at all).
+    """
+
+    def __init__(self, api_url: str, token: str, coalesce: bool = True):
+        self.api_url = api_url
+        self.coalesce = coalesce
+        self._session = requests.Session()
+        self._session.headers["Authorization"] = f"Bearer {token}"
+        self._session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self._session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._closed = False
+        self._busy = False
+        self._counts = {"sent": 0, "coalesced": 0, "retries": 0, "rate_limited": 0, "failed": 0}
+        self._thread = threading.Thread(target=self._run, name="webex-outbox", daemon=True)
+        self._thread.start()
+
+    # ---------------------------------------
+    # Public API
+    # ---------------------------------------
+    def send_text(self, room_id: str, text: str) -> Future:
+        return self._put(_Item(room_id, text))
+
+    def send_file(self, room_id: str, filename: str, text: str, content: bytes) -> Future:
+        """Attach `content` as `filename`; the bytes are taken now, not at send time."""
+        return self._put(_Item(room_id, text, file=(filename, content)))
+
+    def flush(self, timeout: float = None) -> bool:
+        """Wait until everything queued so far was sent; False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._queue or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 10.0):
+        """Send what is queued (up to `timeout`), then stop the worker."""
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=1.0)
+        self._session.close()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return dict(self._counts, queue_depth=len(self._queue))
+
+    # ---------------------------------------
+    # Worker
+    # ---------------------------------------
+    def _put(self, item: _Item) -> Future:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Webex outbox is closed")
+            self._queue.append(item)
+            self._cond.notify_all()
+        return item.future
+
+    def _take(self) -> list:
+        """Next message to send: one item, or a run of short replies for one room."""
+        first = self._queue.popleft()
+        batch = [first]
+        if not (self.coalesce and first.joinable()):
+            return batch
+        size = len(first.text)
+        for item in list(self._queue):
+            if item.room_id != first.room_id:
+                continue
+            # Stop at the first reply of this room that cannot join, so the
+            # room still sees its messages in order
+            if not item.joinable() or size + 1 + len(item.text) > MAX_MESSAGE:
+                break
+            self._queue.remove(item)
+            batch.append(item)
+            size += 1 + len(item.text)
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                batch = self._take()
+                self._busy = True
+            try:
+                self._deliver(batch)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _deliver(self, batch: list):
+        now = time.perf_counter()
+        for item in batch:
+            item.context.run(metrics.observe, "webex_queue", now - item.queued_at)
+
+        try:
+            # Time the POST under the labels of the first reply in the batch
+            response = batch[0].context.run(self._post_with_retries, batch)
+        except Exception as e:
+            print("Webex POST failed:", type(e).__name__, e)
+            self._count("failed")
+            for item in batch:
+                item.future.set_exception(e)
+            return
+
+        if response.status_code != 200:
+            print("Webex POST failed:", response.status_code, response.text)
+            self._count("failed")
+        else:
+            self._count("sent")
+            if len(batch) > 1:
+                self._count("coalesced", len(batch) - 1)
+        for item in batch:
+            item.future.set_result(response)
+
+    def _post_with_retries(self, batch: list):
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                with metrics.stage("webex_post"):
+                    response = self._post(batch)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= MAX_ATTEMPTS:
+                    raise
+                delay = backoff(attempt)
+            else:
+                if response.status_code not in TRANSIENT_STATUS or attempt >= MAX_ATTEMPTS:
+                    return response
+                if response.status_code == 429:
+                    self._count("rate_limited")
+                delay = retry_after(response, backoff(attempt))
+            self._count("retries")
+            time.sleep(delay)
+
+    def _post(self, batch: list):
+        first = batch[0]
+        url = f"{self.api_url}/messages"
+        if first.file is None:
+            text = "\n".join(item.text for item in batch)
+            return self._session.post(
+                url, json={"roomId": first.room_id, "markdown": text}, timeout=TIMEOUT
+            )
+        # A fresh encoder per attempt: the previous one was consumed
+        filename, content = first.file
+        m = MultipartEncoder(
+            fields={
+                "roomId": first.room_id,
+                "text": first.text,
+                "files": (filename, content, "text/plain"),
+            }
+        )
+        return self._session.post(
+            url, data=m, headers={"Content-Type": m.content_type}, timeout=TIMEOUT
+        )
+
+    def _count(self, key: str, n: int = 1):
+        with self._cond:
+            self._counts[key] += n
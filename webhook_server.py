@@ -0,0 +1,102 @@
+import hashlib
+import hmac
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+WEBHOOK_PATH = "/webex/webhook"
+
+
+def verify_signature(secret: str, body: bytes, signature: Optional[str]) -> bool:
+    """Webex signs callbacks with HMAC-SHA1 of the raw body (X-Spark-Signature)."""
+    if not signature:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha1).hexdigest()
+    return hmac.compare_digest(expected, signature.strip().lower())
+
+
+class WebhookServer:
+    """
+    Embedded HTTP listener for Webex "messages/created" callbacks.
+
+    The callback only carries message metadata, so on_event(data) is called
+    with the "data" object of the payload (id, roomId, personEmail, ...) and is
+    responsible for fetching the message text. Requests are acknowledged with
+    204 before on_event runs so Webex never waits on device work.
+    """
+
+    def __init__(
+        self,
+        on_event: Callable[[dict], None],
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        secret: Optional[str] = None,
+        path: str = WEBHOOK_PATH,
+    ):
+        self.on_event = on_event
+        self.secret = secret
+        self.path = path
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._httpd.server_address
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path.split("?", 1)[0] != server.path:
+                    self.send_error(404)
+                    return
+
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length)
+
+                if server.secret and not verify_signature(
+                    server.secret, body, self.headers.get("X-Spark-Signature")
+                ):
+                    self.send_error(401, "Bad signature")
+                    return
+
+                try:
+                    payload = json.loads(body or b"{}")
+                except ValueError:
+                    self.send_error(400, "Invalid JSON")
+                    return
+
+                self.send_response(204)
+                self.end_headers()
+                self.wfile.flush()
+
+                if payload.get("resource") != "messages" or payload.get("event") != "created":
+                    return
+                data = payload.get("data") or {}
+                if not data.get("id"):
+                    return
+                try:
+                    server.on_event(data)
+                except Exception as e:
+                    print("Webhook handler failed:", type(e).__name__, e)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def start(self):
+        """Serve in a background thread (useful for local stand-in tests)."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def shutdown(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()